@@ -0,0 +1,84 @@
+"""Plan archive storage growth and write/read latency.
+
+Records plans built from a fixed set of distinct prompts, each with its
+own response, and reports the archive size per plan along with the
+record and history-page latency.
+
+Usage:
+    python benchmarks/archive_storage.py [--plans 10000] [--prompts 50]
+"""
+
+import argparse
+import random
+import string
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from plan_archive import PlanArchive  # noqa: E402
+
+WORDS = ['chicken', 'rice', 'soup', 'salad', 'pasta', 'tofu', 'curry', 'bread', 'beans', 'fish']
+
+
+def fake_prompt(rng: random.Random, size: int) -> str:
+    """A prompt of about size bytes: instructions and a food table."""
+    rows = []
+    while sum(len(row) for row in rows) < size:
+        rows.append('| ' + ' | '.join(rng.choice(WORDS) for _ in range(6)) + ' |\n')
+    return '# Meal plan instructions\n' + ''.join(rows)
+
+
+def fake_response(rng: random.Random, size: int) -> str:
+    """A markdown plan of about size bytes."""
+    lines = []
+    while sum(len(line) for line in lines) < size:
+        day = ''.join(rng.choices(string.ascii_lowercase, k=6))
+        lines.append(f"- **{day}**: {' '.join(rng.choice(WORDS) for _ in range(8))}\n")
+    return ''.join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--plans', type=int, default=10000, help='Plans to record (default: 10000)')
+    parser.add_argument('--prompts', type=int, default=50, help='Distinct prompts (default: 50)')
+    parser.add_argument('--prompt-bytes', type=int, default=13000, help='Size of each prompt (default: 13000)')
+    parser.add_argument('--response-bytes', type=int, default=2000, help='Size of each response (default: 2000)')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    prompts = [fake_prompt(rng, args.prompt_bytes) for _ in range(args.prompts)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = PlanArchive(Path(tmp) / 'plans.sqlite3')
+        empty = archive.stats()['bytes']
+
+        start = time.perf_counter()
+        for number in range(args.plans):
+            prompt = prompts[number % len(prompts)]
+            archive.record(prompt, fake_response(rng, args.response_bytes), 'md', model='gemini:bench',
+                           sheet_hash=str(number % len(prompts)))
+        record_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pages = 100
+        for _ in range(pages):
+            archive.history(limit=20, output_format='md')
+        history_seconds = time.perf_counter() - start
+
+        stats = archive.stats()
+        archive.close()
+
+    grown = stats['bytes'] - empty
+    print(f"plans:             {stats['plans']} ({stats['bodies']} distinct bodies)")
+    print(f"archive size:      {grown / 1e6:.1f} MB")
+    print(f"per plan:          {grown / args.plans / 1024:.2f} KB")
+    print(f"per 10k plans:     {grown / args.plans * 10000 / 1e6:.1f} MB")
+    print(f"record:            {record_seconds / args.plans * 1000:.3f} ms per plan")
+    print(f"history page:      {history_seconds / pages * 1000:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Client setup cost: a new client per request vs the ClientRegistry.
+
+Builds a SheetsClient (API service from the bundled discovery document,
+new Http and TCP connection) for every load, as before the registry, and
+compares it with loads through ClientRegistry.sheets(), which reuses the
+thread's client and keep-alive connection. Also times creating a
+genai.Client, which the registry does once per API key. The fake server
+speaks plain HTTP, so a real TLS handshake (tens of ms) comes on top of
+the per-request numbers.
+
+Usage:
+    python benchmarks/client_setup.py [--runs 50] [--latency 0.005]
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httplib2  # noqa: E402
+
+from clients import ClientRegistry  # noqa: E402
+from config import Config  # noqa: E402
+from sheets_client import SheetsClient  # noqa: E402
+from stubs import FakeSheetsServer, local_http, write_env  # noqa: E402
+
+
+def timed(func, runs: int) -> float:
+    """Median seconds per call."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=50, help='Loads per method (default: 50)')
+    parser.add_argument('--latency', type=float, default=0.005, help='Server latency per request (default: 0.005s)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            FakeSheetsServer(latency=args.latency) as server, local_http(server):
+        registry = ClientRegistry(Config(write_env(tmp, SHEETS_RATE_LIMIT='0')))
+
+        def fresh_client():
+            SheetsClient('benchmark-key', 'benchmark-sheet', http=httplib2.Http()).read_workbook()
+
+        def registry_client():
+            registry.sheets().read_workbook()
+
+        registry_client()
+        fresh = timed(fresh_client, args.runs)
+        reused = timed(registry_client, args.runs)
+        # googleapiclient builds a resource's methods on first access
+        build = timed(
+            lambda: SheetsClient('benchmark-key', 'benchmark-sheet', http=httplib2.Http()).service.spreadsheets(),
+            args.runs
+        )
+
+        from google import genai
+        genai_client = timed(lambda: genai.Client(api_key='benchmark-key'), args.runs)
+        registry.close()
+
+    print(f"server latency {args.latency * 1000:.0f} ms per request")
+    print(f"new client per load:   {fresh * 1000:7.2f} ms per workbook load")
+    print(f"registry client:       {reused * 1000:7.2f} ms per workbook load")
+    print(f"SheetsClient setup:    {build * 1000:7.2f} ms")
+    print(f"genai.Client creation: {genai_client * 1000:7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
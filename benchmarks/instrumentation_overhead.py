@@ -0,0 +1,120 @@
+"""Cost of the metrics instrumentation on the hot path.
+
+Times span() with and without a collect_timings() breakdown,
+Counter.inc() and Histogram.observe() against an empty context manager,
+then counts the spans one generation records (stub Sheets and LLM
+upstreams) to put the per-request overhead next to the request's own
+time.
+
+Usage:
+    python benchmarks/instrumentation_overhead.py [--iterations 200000]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from clients import ClientRegistry  # noqa: E402
+from config import Config  # noqa: E402
+from meal_plan_generator import MealPlanGenerator  # noqa: E402
+from metrics import REGISTRY, Counter, Histogram, collect_timings, span  # noqa: E402
+from stubs import FakeSheetsServer, StubLLM, local_http, write_env  # noqa: E402
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+
+class empty:
+    """The cheapest possible context manager, as a baseline."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+def per_call(statement, iterations: int) -> float:
+    """Best-of-five seconds per call of a statement."""
+    return min(timeit.repeat(statement, number=iterations, repeat=5)) / iterations
+
+
+def microbenchmarks(iterations: int) -> dict:
+    """Seconds per call of each instrumentation primitive."""
+    counter = Counter('benchmark_total', 'Benchmark counter', ('stage',))
+    histogram = Histogram('benchmark_seconds', 'Benchmark histogram', ('stage',))
+
+    def with_empty():
+        with empty():
+            pass
+
+    def with_span():
+        with span('benchmark'):
+            pass
+
+    def with_span_collected():
+        with collect_timings():
+            for _ in range(10):
+                with span('benchmark'):
+                    pass
+
+    return {
+        'empty context manager': per_call(with_empty, iterations),
+        'span': per_call(with_span, iterations),
+        'span in collect_timings': per_call(with_span_collected, iterations // 10) / 10,
+        'Counter.inc': per_call(lambda: counter.inc(labels=('benchmark',)), iterations),
+        'Histogram.observe': per_call(lambda: histogram.observe(0.01, ('benchmark',)), iterations),
+        'render /metrics': per_call(REGISTRY.render, 1000),
+    }
+
+
+def generation_spans(llm_latency: float) -> tuple:
+    """Spans recorded by one uncached generation, and its duration."""
+    llm = StubLLM(latency=llm_latency)
+    ClientRegistry.llm = lambda self, config=None, structured=False: llm
+
+    with tempfile.TemporaryDirectory() as tmp, FakeSheetsServer(latency=0.01) as server, local_http(server):
+        config = Config(write_env(tmp, SHEETS_RATE_LIMIT='0', PLAN_POOL_SIZE='0', JOB_WORKERS='0'))
+        registry = ClientRegistry(config)
+        generator = MealPlanGenerator(config, REPO_DIR, clients=registry)
+        generator.generate(no_cache=True)
+
+        start = time.perf_counter()
+        with collect_timings() as timings:
+            generator.generate(no_cache=True)
+        elapsed = time.perf_counter() - start
+        spans = sum(calls for _, _, calls in timings.stages.values())
+
+        generator.shared_cache.close()
+        if generator.archive:
+            generator.archive.close()
+        registry.close()
+
+    return spans, len(timings.stages), elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200000, help='Calls per microbenchmark (default: 200000)')
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='Stub LLM latency (default: 0.2s)')
+    args = parser.parse_args()
+
+    results = microbenchmarks(args.iterations)
+    for name, seconds in results.items():
+        print(f"{name:24} {seconds * 1e9:9.0f} ns")
+
+    spans, stages, elapsed = generation_spans(args.llm_latency)
+    # A span's cost includes its histogram update
+    overhead = spans * (results['span in collect_timings'] - results['empty context manager'])
+    print(f"\none generation: {spans} spans over {stages} stages in {elapsed * 1000:.1f} ms")
+    print(f"span overhead: {overhead * 1e6:.1f} us per generation ({overhead / elapsed:.4%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Many kitchens in one process: memory per idle kitchen and cold vs warm
+latency.
+
+Serves --kitchens kitchens, each with its own workbook on the fake Sheets
+server, through a TenantRegistry and a StubLLM that answers at once, so
+the numbers are the kitchen overhead alone. Reports:
+
+    cold          first request: workbook download, snapshot, prompt
+    warm          the kitchen's generator and snapshot are in memory
+    from disk     the kitchen was evicted; its snapshot is read from disk
+    memory        traced heap per idle kitchen kept in memory
+
+Usage:
+    python benchmarks/kitchens.py [--kitchens 200] [--rows 60]
+"""
+
+import argparse
+import gc
+import json
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from clients import ClientRegistry  # noqa: E402
+from config import ConfigStore  # noqa: E402
+from meal_plan_generator import MealPlanGenerator  # noqa: E402
+from stubs import FakeSheetsServer, StubLLM, fake_workbook, local_http, write_env  # noqa: E402
+from tenants import TenantRegistry, TenantStore  # noqa: E402
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+
+def timed_requests(registry: TenantRegistry, kitchens) -> list:
+    """Generate one uncached plan per kitchen and return the latencies."""
+    times = []
+    for kitchen in kitchens:
+        start = time.perf_counter()
+        registry.generator(kitchen).generate(no_cache=True, archive=False)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--kitchens', type=int, default=200, help='Kitchens to serve (default: 200)')
+    parser.add_argument('--rows', type=int, default=60, help='Rows per food sheet (default: 60)')
+    parser.add_argument('--latency', type=float, default=0.02, help='Server latency per request (default: 0.02s)')
+    args = parser.parse_args()
+
+    names = [f'kitchen-{index}' for index in range(args.kitchens)]
+    workbooks = {f'sheet-{name}': fake_workbook(food_sheets=3, rows=args.rows, seed=index)
+                 for index, name in enumerate(names)}
+    llm = StubLLM(latency=0)
+    ClientRegistry.llm = lambda self, config=None, structured=False: llm
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            FakeSheetsServer(workbooks, latency=args.latency) as server, local_http(server):
+        tenants_file = Path(tmp) / 'tenants.json'
+        tenants_file.write_text(json.dumps({name: {'spreadsheet_id': f'sheet-{name}'} for name in names}))
+        config_store = ConfigStore(write_env(tmp, SHEETS_RATE_LIMIT='0', RESPONSE_CACHE='false'))
+        clients = ClientRegistry(config_store.current)
+        generator = MealPlanGenerator(config_store.current, REPO_DIR, clients=clients, config_store=config_store)
+        registry = TenantRegistry(generator, TenantStore(tenants_file), max_tenants=args.kitchens)
+        # Load the shared clients and prompt files before measuring
+        generator.generate(no_cache=True, archive=False)
+
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        cold = timed_requests(registry, names)
+        gc.collect()
+        per_kitchen = (tracemalloc.get_traced_memory()[0] - before) / args.kitchens
+        tracemalloc.stop()
+
+        warm = timed_requests(registry, names)
+        stats = registry.stats()
+
+        # Keeping a tenth of the kitchens, every request in a round is one
+        # that was evicted and comes back from its snapshot on disk
+        small = TenantRegistry(generator, TenantStore(tenants_file), max_tenants=max(1, args.kitchens // 10))
+        timed_requests(small, names)
+        from_disk = timed_requests(small, names)
+        misses = small.misses
+        requests = server.requests
+
+        clients.close()
+
+    print(f"{args.kitchens} kitchens, {args.rows * 3} food rows each, "
+          f"{stats['snapshot_bytes'] / args.kitchens / 1024:.1f} KB snapshot each, "
+          f"{args.latency * 1000:.0f} ms Sheets latency")
+    for name, times in (('cold', cold), ('warm', warm), ('from disk', from_disk)):
+        print(f"{name:10} {statistics.median(times) * 1000:7.2f} ms median")
+    print(f"from disk: {misses} of {args.kitchens * 2} requests missed the kitchens in memory")
+    print(f"memory     {per_kitchen / 1024:7.1f} KB per idle kitchen")
+    print(f"Sheets requests: {requests} ({requests / args.kitchens:.1f} per kitchen)")
+
+
+if __name__ == '__main__':
+    main()
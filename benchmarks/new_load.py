@@ -0,0 +1,96 @@
+"""/new under concurrent load, with stub Sheets and LLM upstreams.
+
+Runs the FastAPI app in-process against the fake Sheets server and a
+StubLLM, sends batches of concurrent /new?no_cache=true requests and
+reports wall time, throughput and latency percentiles per concurrency
+level. While each batch runs, / is polled to check that the event loop
+stays responsive. With a non-blocking pipeline a batch takes about one
+LLM call, not one per request.
+
+Usage:
+    python benchmarks/new_load.py [--concurrency 1 10 50] [--llm-latency 0.5]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx  # noqa: E402
+
+from clients import ClientRegistry  # noqa: E402
+from stubs import FakeSheetsServer, StubLLM, local_http, percentile, write_env  # noqa: E402
+
+
+async def timed_get(client: httpx.AsyncClient, url: str) -> float:
+    """GET a URL and return its latency in seconds."""
+    start = time.perf_counter()
+    response = await client.get(url)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event) -> list:
+    """Poll / until stopped and collect its latencies."""
+    latencies = []
+    while not stop.is_set():
+        latencies.append(await timed_get(client, '/'))
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+async def run(concurrency_levels, llm: StubLLM) -> None:
+    from fastapi_app import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://benchmark', timeout=60) as client:
+            # Warm the sheet snapshot so every batch measures generation only
+            await timed_get(client, '/new?no_cache=true&format=md')
+
+            print(f"LLM latency {llm.latency * 1000:.0f} ms")
+            print(f"{'concurrency':>11} {'wall':>8} {'req/s':>7} {'p50':>8} {'p95':>8} {'/ p95':>8} {'LLM calls':>9}")
+            for concurrency in concurrency_levels:
+                calls = llm.calls
+                stop = asyncio.Event()
+                prober = asyncio.create_task(probe(client, stop))
+                start = time.perf_counter()
+                latencies = await asyncio.gather(*(
+                    timed_get(client, '/new?no_cache=true&format=md') for _ in range(concurrency)
+                ))
+                wall = time.perf_counter() - start
+                stop.set()
+                root = await prober
+
+                print(f"{concurrency:>11} {wall * 1000:6.0f}ms {concurrency / wall:7.1f} "
+                      f"{percentile(latencies, 0.5) * 1000:6.0f}ms {percentile(latencies, 0.95) * 1000:6.0f}ms "
+                      f"{percentile(root, 0.95) * 1000:6.1f}ms {llm.calls - calls:>9}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50],
+                        help='Concurrent requests per batch (default: 1 10 50)')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='Stub LLM latency (default: 0.5s)')
+    parser.add_argument('--sheets-latency', type=float, default=0.05,
+                        help='Fake Sheets latency per request (default: 0.05s)')
+    args = parser.parse_args()
+
+    llm = StubLLM(latency=args.llm_latency)
+    ClientRegistry.llm = lambda self, config=None, structured=False: llm
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            FakeSheetsServer(latency=args.sheets_latency) as server, local_http(server):
+        # The app reads .env from the working directory
+        write_env(tmp, SHEETS_RATE_LIMIT='0', GEMINI_RATE_LIMIT='0', PLAN_POOL_SIZE='0', JOB_WORKERS='0')
+        os.chdir(tmp)
+        asyncio.run(run(args.concurrency, llm))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Sustained Sheets throughput against a quota that answers with 429s.
+
+Worker threads load the workbook in a loop from a fake Sheets server that
+allows --quota requests per second and answers the rest with 429 and
+Retry-After: 1. Each policy runs for --duration seconds:
+
+    none          no Upstream, a 429 fails the load (the old behaviour)
+    retries       retries with backoff and the circuit breaker, no limiter
+    limit+retries the same plus a token bucket just under the quota
+
+Successful loads per second should match the quota with the limiter,
+instead of falling apart into 429s and open circuits.
+
+Usage:
+    python benchmarks/rate_limit_429.py [--quota 20] [--threads 8] [--duration 10]
+"""
+
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httplib2  # noqa: E402
+
+from resilience import Upstream  # noqa: E402
+from sheets_client import SheetsClient, SheetsClientError, classify_sheets_error  # noqa: E402
+from stubs import FakeSheetsServer, local_http  # noqa: E402
+
+
+def run(server: FakeSheetsServer, upstream, threads: int, duration: float) -> dict:
+    """Load the workbook from every thread until the duration is up."""
+    counts = {'ok': 0, 'failed': 0}
+    lock = threading.Lock()
+    end = time.monotonic() + duration
+
+    def worker():
+        client = SheetsClient('benchmark-key', 'benchmark-sheet', http=httplib2.Http(), upstream=upstream)
+        while time.monotonic() < end:
+            try:
+                client.read_workbook()
+                outcome = 'ok'
+            except SheetsClientError:
+                outcome = 'failed'
+            with lock:
+                counts[outcome] += 1
+
+    requests, throttled = server.requests, server.throttled
+    start = time.monotonic()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    return {
+        **counts,
+        'ok/s': counts['ok'] / elapsed,
+        'requests': server.requests - requests,
+        '429s': server.throttled - throttled
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quota', type=float, default=20, help='Server quota in requests/s (default: 20)')
+    parser.add_argument('--threads', type=int, default=8, help='Worker threads (default: 8)')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per policy (default: 10)')
+    parser.add_argument('--headroom', type=float, default=0.9,
+                        help='Rate limit as a fraction of the quota (default: 0.9)')
+    parser.add_argument('--latency', type=float, default=0.01, help='Server latency per request (default: 0.01s)')
+    args = parser.parse_args()
+
+    def upstream(rate_per_minute):
+        return Upstream('sheets', classify_sheets_error, rate_per_minute=rate_per_minute)
+
+    policies = (
+        ('none', lambda: None),
+        ('retries', lambda: upstream(None)),
+        ('limit+retries', lambda: upstream(args.quota * 60 * args.headroom))
+    )
+
+    print(f"quota {args.quota:.0f}/s, {args.threads} threads, {args.duration:.0f}s per policy")
+    print(f"{'policy':>14} {'ok/s':>7} {'ok':>6} {'failed':>7} {'requests':>9} {'429s':>6}")
+    with FakeSheetsServer(latency=args.latency, quota=args.quota) as server, local_http(server):
+        for name, policy in policies:
+            # Start each policy with a fresh quota window
+            time.sleep(1.0)
+            result = run(server, policy(), args.threads, args.duration)
+            print(f"{name:>14} {result['ok/s']:7.1f} {result['ok']:6} {result['failed']:7} "
+                  f"{result['requests']:9} {result['429s']:6}")
+
+
+if __name__ == '__main__':
+    main()
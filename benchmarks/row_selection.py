@@ -0,0 +1,79 @@
+"""Row selection on a large food sheet: index build and per-request cost.
+
+Builds a food sheet of --rows dishes from a small vocabulary over six
+styles, then reports how long the SheetIndex build takes (once per
+snapshot, in RowSelector.prepare), the latency of selecting
+max_rows_per_sheet rows for a range of requests, and how much of the
+sheet the prompt keeps.
+
+Usage:
+    python benchmarks/row_selection.py [--rows 50000] [--max-rows 200]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from row_selector import RowSelector  # noqa: E402
+from sheet_loader import SheetData  # noqa: E402
+from stubs import percentile  # noqa: E402
+
+STYLES = ['Thai', 'Italian', 'Mexican', 'Indian', 'Japanese', 'Greek']
+WORDS = ['chicken', 'rice', 'soup', 'salad', 'pasta', 'tofu', 'curry', 'bread', 'beans', 'fish',
+         'noodles', 'lentils', 'spicy', 'grilled', 'roasted', 'vegan', 'cheese', 'lamb', 'egg', 'mushroom']
+REQUESTS = ['something spicy with tofu', 'vegan lunches', 'grilled fish and rice', 'lamb curry',
+            'cheese pasta for the kids', 'mushroom soup', '', 'noodles with egg']
+
+
+def food_sheet(rows: int, rng: random.Random) -> list:
+    """A food sheet with header and rows of random dishes."""
+    return [['Name', 'Style', 'Details']] + [
+        [' '.join(rng.sample(WORDS, 3)).capitalize(), rng.choice(STYLES),
+         f"{' '.join(rng.sample(WORDS, 4))}, serves {rng.randint(1, 8)}"]
+        for _ in range(rows)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000, help='Rows in the food sheet (default: 50000)')
+    parser.add_argument('--max-rows', type=int, default=200, help='max_rows_per_sheet (default: 200)')
+    parser.add_argument('--rounds', type=int, default=50, help='Selections per request (default: 50)')
+    args = parser.parse_args()
+
+    data = food_sheet(args.rows, random.Random(0))
+    snapshot = SheetData(
+        config={'max_rows_per_sheet': str(args.max_rows)},
+        sheet_context={},
+        food_sheets=[('Mains', data)]
+    )
+    selector = RowSelector()
+
+    start = time.perf_counter()
+    selector.prepare(snapshot)
+    build = time.perf_counter() - start
+
+    times = []
+    for _ in range(args.rounds):
+        for request in REQUESTS:
+            config = {**snapshot.config, 'user_input': request}
+            start = time.perf_counter()
+            rows = selector.select(snapshot, config)[0][1]
+            times.append(time.perf_counter() - start)
+
+    full_size = sum(len(' | '.join(row)) for row in data)
+    kept_size = sum(len(' | '.join(row)) for row in rows)
+    print(f"{args.rows} rows, max_rows_per_sheet {args.max_rows}")
+    print(f"index build   {build * 1000:8.1f} ms (once per snapshot)")
+    print(f"select median {statistics.median(times) * 1000:8.2f} ms, "
+          f"p99 {percentile(times, 0.99) * 1000:.2f} ms")
+    print(f"prompt keeps  {len(rows) - 1} rows, {kept_size / 1024:.1f} KB of {full_size / 1024:.0f} KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Time to first byte of /new/stream compared with /new.
+
+Runs the FastAPI app in-process against the fake Sheets server and a
+StubLLM that streams its answer in --chunks pieces over --llm-latency
+seconds, like a model writing a plan. Each request is sent straight to
+the ASGI app, timing when the first body bytes are sent and when the
+response ends. /new answers once the whole plan is written; /new/stream
+should send its first bytes after about one chunk's worth of latency.
+
+Usage:
+    python benchmarks/stream_ttfb.py [--requests 20] [--llm-latency 1.0] [--chunks 20]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from clients import ClientRegistry  # noqa: E402
+from stubs import FakeSheetsServer, StubLLM, local_http, percentile, write_env  # noqa: E402
+
+
+async def timed_request(app, path: str, query: str) -> tuple:
+    """Send a GET to the ASGI app; returns (first byte, end) in seconds."""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '',
+        'query_string': query.encode(), 'headers': [(b'host', b'benchmark')],
+        'client': ('127.0.0.1', 0), 'server': ('benchmark', 80), 'app': app,
+    }
+    requested = asyncio.Event()
+    first_byte = None
+    status = None
+
+    async def receive():
+        # The client stays connected until the response ends
+        if requested.is_set():
+            await asyncio.Event().wait()
+        requested.set()
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        nonlocal first_byte, status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body' and message.get('body') and first_byte is None:
+            first_byte = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    if status != 200:
+        raise RuntimeError(f"{path}?{query} returned {status}")
+    return first_byte, time.perf_counter() - start
+
+
+async def run(requests: int, llm: StubLLM) -> None:
+    from fastapi_app import app
+
+    async with app.router.lifespan_context(app):
+        # Warm the sheet snapshot so only generation is measured
+        await timed_request(app, '/new', 'no_cache=true')
+
+        print(f"LLM latency {llm.latency * 1000:.0f} ms in {llm.chunks} chunks, {requests} requests each")
+        print(f"{'endpoint':12} {'TTFB p50':>9} {'TTFB p95':>9} {'total p50':>10}")
+        for path, query in (('/new', 'no_cache=true'), ('/new/stream', '')):
+            timings = [await timed_request(app, path, query) for _ in range(requests)]
+            first = [first_byte for first_byte, _ in timings]
+            total = [end for _, end in timings]
+            print(f"{path:12} {statistics.median(first) * 1000:7.0f}ms {percentile(first, 0.95) * 1000:7.0f}ms "
+                  f"{statistics.median(total) * 1000:8.0f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20, help='Requests per endpoint (default: 20)')
+    parser.add_argument('--llm-latency', type=float, default=1.0,
+                        help='Stub LLM time to write the whole plan (default: 1.0s)')
+    parser.add_argument('--chunks', type=int, default=20, help='Chunks the plan is streamed in (default: 20)')
+    args = parser.parse_args()
+
+    llm = StubLLM(latency=args.llm_latency, chunks=args.chunks)
+    ClientRegistry.llm = lambda self, config=None, structured=False: llm
+
+    with tempfile.TemporaryDirectory() as tmp, FakeSheetsServer(latency=0.05) as server, local_http(server):
+        # The app reads .env from the working directory
+        write_env(tmp, SHEETS_RATE_LIMIT='0', GEMINI_RATE_LIMIT='0', PLAN_POOL_SIZE='0', JOB_WORKERS='0')
+        os.chdir(tmp)
+        asyncio.run(run(args.requests, llm))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+"""Stub upstreams shared by the benchmarks.
+
+FakeSheetsServer is a local HTTP server answering the Sheets v4 and Drive
+v3 calls SheetsClient makes, with a fixed latency and an optional request
+quota. local_http() points googleapiclient at it through a real
+keep-alive connection, so client setup, request counts and retries are
+exercised as in production. StubLLM is an LLM provider that answers after
+a fixed latency, streaming the answer in chunks spread over it.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import httplib2
+
+GOOGLE_ROOTS = ('https://sheets.googleapis.com/', 'https://www.googleapis.com/')
+
+
+def fake_workbook(food_sheets: int = 5, rows: int = 100, seed: int = 0) -> Dict[str, List[List[str]]]:
+    """A workbook with the config and sheet-context sheets and food sheets."""
+    styles = ['Thai', 'Italian', 'Mexican', 'Indian', 'Japanese', 'Greek']
+    workbook = {
+        'config': [['Key', 'Value'], ['prompt_header', 'Plan a week of lunches.'], ['days', '5']],
+        'sheet-context': [['Sheet', 'Context'], ['Mains', 'Main dishes']],
+    }
+    for sheet in range(food_sheets):
+        workbook[f'Food {sheet + 1}'] = [['Name', 'Style', 'Details']] + [
+            [f'Dish {seed}-{sheet}-{row}', styles[(row + seed) % len(styles)], f'Serves {row % 8 + 1}, {row} kcal']
+            for row in range(rows)
+        ]
+    return workbook
+
+
+class FakeSheetsServer:
+    """Local stand-in for the Sheets and Drive APIs.
+
+    Serves one workbook (or one per spreadsheet ID) after ``latency``
+    seconds per request. With ``quota`` set, requests beyond that many per
+    second get a 429 with Retry-After, like the real per-minute quotas.
+    """
+
+    def __init__(
+        self,
+        workbooks: Optional[Dict[str, Dict[str, List[List[str]]]]] = None,
+        latency: float = 0.05,
+        quota: Optional[float] = None
+    ):
+        self.workbooks = workbooks or {}
+        self.default_workbook = fake_workbook()
+        self.latency = latency
+        self.quota = quota
+        self.requests = 0
+        self.throttled = 0
+        self.version = 1
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_requests = 0
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server."""
+        host, port = self._server.server_address
+        return f'http://{host}:{port}/'
+
+    def __enter__(self) -> 'FakeSheetsServer':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _admit(self) -> bool:
+        """Count a request; False if it is over the quota."""
+        with self._lock:
+            self.requests += 1
+            if self.quota is None:
+                return True
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._window_start, self._window_requests = now, 0
+            if self._window_requests >= self.quota:
+                self.throttled += 1
+                return False
+            self._window_requests += 1
+            return True
+
+    def _respond(self, path: str, query: Dict[str, List[str]]) -> Optional[Dict]:
+        """Build the JSON body for an API path, or None if unknown."""
+        parts = [unquote(part) for part in path.strip('/').split('/')]
+        if parts[:2] == ['drive', 'v3'] and len(parts) == 4:
+            return {'version': str(self.version), 'modifiedTime': '2026-01-01T00:00:00Z'}
+        if parts[:2] != ['v4', 'spreadsheets'] or len(parts) < 3:
+            return None
+
+        workbook = self.workbooks.get(parts[2], self.default_workbook)
+        if len(parts) == 5 and parts[3] == 'values':
+            return {'values': workbook.get(parts[4], [])}
+        if query.get('includeGridData') == ['true']:
+            return {'sheets': [
+                {
+                    'properties': {'title': title},
+                    'data': [{'rowData': [{'values': [{'formattedValue': cell} for cell in row]} for row in rows]}]
+                }
+                for title, rows in workbook.items()
+            ]}
+        return {'sheets': [{'properties': {'title': title}} for title in workbook]}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are written separately; don't let Nagle's
+            # algorithm and delayed ACKs add ~40 ms to every response
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                time.sleep(server.latency)
+                if not server._admit():
+                    self._send(429, {'error': {'code': 429, 'message': 'Quota exceeded'}}, {'Retry-After': '1'})
+                    return
+                url = urlsplit(self.path)
+                body = server._respond(url.path, parse_qs(url.query))
+                self._send(200 if body is not None else 404, body or {'error': {'code': 404}})
+
+            def _send(self, status: int, body: Dict, headers: Optional[Dict[str, str]] = None):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+@contextmanager
+def local_http(server: FakeSheetsServer) -> Iterator[None]:
+    """Make every httplib2.Http created in the body send Google API
+    requests to the fake server instead."""
+    original = httplib2.Http
+
+    class LocalHttp(original):
+        def request(self, uri, *args, **kwargs):
+            for root in GOOGLE_ROOTS:
+                if uri.startswith(root):
+                    uri = server.url + uri[len(root):]
+            return super().request(uri, *args, **kwargs)
+
+    httplib2.Http = LocalHttp
+    try:
+        yield
+    finally:
+        httplib2.Http = original
+
+
+class StubLLM:
+    """LLM provider that answers after a fixed latency.
+
+    Streaming yields the answer in ``chunks`` pieces spread evenly over the
+    latency, so the first chunk arrives after latency / chunks.
+    """
+
+    def __init__(self, latency: float = 0.2, name: str = 'stub:llm', chunks: int = 1):
+        self.latency = latency
+        self.name = name
+        self.chunks = chunks
+        self.calls = 0
+
+    def _response(self, prompt: str) -> str:
+        self.calls += 1
+        return f"# Meal plan\n\nBased on a {len(prompt)} character prompt.\n"
+
+    def _pieces(self, response: str) -> List[str]:
+        """Split a response into self.chunks pieces."""
+        bounds = [len(response) * number // self.chunks for number in range(self.chunks + 1)]
+        return [response[start:end] for start, end in zip(bounds, bounds[1:])]
+
+    def generate_meal_plan(self, prompt: str, prefix: Optional[str] = None) -> str:
+        time.sleep(self.latency)
+        return self._response(prompt)
+
+    async def agenerate_meal_plan(self, prompt: str, prefix: Optional[str] = None) -> str:
+        await asyncio.sleep(self.latency)
+        return self._response(prompt)
+
+    def stream_meal_plan(self, prompt: str, prefix: Optional[str] = None) -> Iterator[str]:
+        for piece in self._pieces(self._response(prompt)):
+            time.sleep(self.latency / self.chunks)
+            yield piece
+
+    async def astream_meal_plan(self, prompt: str, prefix: Optional[str] = None):
+        for piece in self._pieces(self._response(prompt)):
+            await asyncio.sleep(self.latency / self.chunks)
+            yield piece
+
+
+def write_env(directory, **values) -> str:
+    """Write a .env for the benchmarks with every cache under directory."""
+    settings = {
+        'GOOGLE_API_KEY': 'benchmark-key',
+        'SPREADSHEET_ID': 'benchmark-sheet',
+        'GEMINI_MODEL': 'gemini-benchmark',
+        'SHEET_CACHE_DIR': f'{directory}/cache',
+        'SHARED_CACHE_DB': f'{directory}/shared.sqlite3',
+        'PLAN_ARCHIVE_DB': f'{directory}/plans.sqlite3',
+        'JOB_DB': f'{directory}/jobs.sqlite3',
+        'TENANTS_FILE': f'{directory}/tenants.json',
+        **values
+    }
+    path = f'{directory}/.env'
+    with open(path, 'w') as f:
+        f.write(''.join(f'{key}={value}\n' for key, value in settings.items()))
+    return path
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """The given percentile of a list of values."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
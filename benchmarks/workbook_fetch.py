@@ -0,0 +1,56 @@
+"""Workbook fetch: one grid-data request vs one request per sheet.
+
+Loads the same workbook from a fake Sheets server, once with
+read_workbook() (a single spreadsheets.get with grid data) and once the
+old way: the sheet names, then values.get for every sheet.
+
+Usage:
+    python benchmarks/workbook_fetch.py [--sheets 8] [--rows 200] [--latency 0.08]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httplib2  # noqa: E402
+
+from sheets_client import SheetsClient  # noqa: E402
+from stubs import FakeSheetsServer, fake_workbook, local_http  # noqa: E402
+
+
+def per_sheet(client: SheetsClient):
+    """The old load: the sheet names, then one values.get per sheet."""
+    return [(name, client.read_sheet(name)) for name in client.get_all_sheet_names()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sheets', type=int, default=8, help='Food sheets in the workbook (default: 8)')
+    parser.add_argument('--rows', type=int, default=200, help='Rows per food sheet (default: 200)')
+    parser.add_argument('--latency', type=float, default=0.08, help='Server latency per request (default: 0.08s)')
+    parser.add_argument('--runs', type=int, default=10, help='Loads per method (default: 10)')
+    args = parser.parse_args()
+
+    workbook = fake_workbook(args.sheets, args.rows)
+    with FakeSheetsServer({'sheet': workbook}, latency=args.latency) as server, local_http(server):
+        client = SheetsClient('key', 'sheet', http=httplib2.Http())
+        assert per_sheet(client) == client.read_workbook()
+
+        print(f"{args.sheets} food sheets x {args.rows} rows, {args.latency * 1000:.0f} ms per request")
+        for name, load in (('per sheet', per_sheet), ('workbook', SheetsClient.read_workbook)):
+            requests = server.requests
+            times = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                load(client)
+                times.append(time.perf_counter() - start)
+            print(f"{name:10} {statistics.median(times) * 1000:8.1f} ms median, "
+                  f"{(server.requests - requests) / args.runs:.0f} requests per load")
+
+
+if __name__ == '__main__':
+    main()
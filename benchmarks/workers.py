@@ -0,0 +1,111 @@
+"""Worker processes sharing the SQLite cache and snapshot directory.
+
+Forks worker processes that each build their own generator from the same
+.env, like `run_server --workers N`, against the fake Sheets server and a
+StubLLM. First one worker generates a plan and every other worker asks
+for the same plan, to show what they reuse across processes. Then each
+worker count serves cached plans for --duration seconds, once with the
+in-process memory tier and once from the shared SQLite tier alone.
+
+Throughput can only scale up to the number of CPUs the machine has.
+
+Usage:
+    python benchmarks/workers.py [--workers 1 2 4] [--duration 5]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from clients import ClientRegistry  # noqa: E402
+from config import Config  # noqa: E402
+from meal_plan_generator import MealPlanGenerator  # noqa: E402
+from stubs import FakeSheetsServer, StubLLM, local_http, write_env  # noqa: E402
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+
+def worker(server, env_file, start, duration, results) -> None:
+    """Generate plans until the duration is up and report the counts."""
+    llm = StubLLM(latency=0.2)
+    ClientRegistry.llm = lambda self, config=None, structured=False: llm
+
+    with local_http(server):
+        config = Config(env_file)
+        clients = ClientRegistry(config)
+        generator = MealPlanGenerator(config, REPO_DIR, clients=clients)
+
+        start.wait()
+        served = 0
+        end = time.monotonic() + duration
+        while True:
+            generator.generate(archive=False)
+            served += 1
+            if time.monotonic() >= end:
+                break
+
+        generator.shared_cache.close()
+        clients.close()
+    results.put((served, llm.calls))
+
+
+def run(context, server, env_file, workers: int, duration: float):
+    """Run workers together; returns (plans served, LLM calls, seconds)."""
+    start = context.Barrier(workers + 1)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(server, env_file, start, duration, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    start.wait()
+    began = time.monotonic()
+    counts = [results.get() for _ in processes]
+    elapsed = time.monotonic() - began
+    for process in processes:
+        process.join()
+    return sum(served for served, _ in counts), sum(calls for _, calls in counts), elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4],
+                        help='Worker counts to measure (default: 1 2 4)')
+    parser.add_argument('--duration', type=float, default=5, help='Seconds per measurement (default: 5)')
+    args = parser.parse_args()
+
+    # Forked workers inherit the server object and module state
+    context = multiprocessing.get_context('fork')
+    with tempfile.TemporaryDirectory() as tmp, FakeSheetsServer(latency=0.05) as server:
+        env = {'SHEETS_RATE_LIMIT': '0', 'RESPONSE_CACHE': 'true', 'PLAN_POOL_SIZE': '0', 'JOB_WORKERS': '0'}
+        env_file = write_env(tmp, **env)
+        # A second cache directory, so this run starts cold too
+        os.makedirs(f'{tmp}/shared-only')
+        shared_only = write_env(f'{tmp}/shared-only', **env, RESPONSE_CACHE_MEMORY_ENTRIES='0')
+
+        print(f"{os.cpu_count()} CPUs")
+        for path in (env_file, shared_only):
+            requests = server.requests
+            _, calls, _ = run(context, server, path, 1, 0)
+            first = server.requests - requests
+            requests = server.requests
+            _, reused_calls, _ = run(context, server, path, 3, 0)
+            print(f"\n{'shared tier only' if path == shared_only else 'with memory tier'}")
+            print(f"first worker:  {calls} LLM calls, {first} Sheets requests")
+            print(f"3 more workers: {reused_calls} LLM calls, {server.requests - requests} Sheets requests")
+
+            print(f"{'workers':>7} {'plans/s':>9} {'per worker':>11} {'LLM calls':>10}")
+            for workers in args.workers:
+                served, calls, elapsed = run(context, server, path, workers, args.duration)
+                print(f"{workers:>7} {served / elapsed:9.0f} {served / elapsed / workers:11.0f} {calls:>10}")
+
+
+if __name__ == '__main__':
+    main()
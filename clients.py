@@ -0,0 +1,421 @@
+"""Long-lived API client registry for Lunch Lady."""
+
+import asyncio
+import contextvars
+import functools
+import threading
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
+
+from config import Config, ConfigError
+from sheets_client import SheetsClient, classify_sheets_error
+from gemini_client import GeminiClient, classify_gemini_error
+from context_cache import ContextCacheManager
+from llm_providers import HedgedProvider, LLMProvider, ProviderStats
+from plan_renderer import MEAL_PLAN_SCHEMA
+from resilience import Upstream
+
+if TYPE_CHECKING:
+    import httplib2
+    from google import genai
+
+
+@dataclass(eq=False)
+class _ThreadSheets:
+    """One thread's Sheets connection and clients, by API key and
+    spreadsheet ID."""
+    http: 'httplib2.Http'
+    clients: Dict[Tuple[str, str], SheetsClient] = field(default_factory=dict)
+    first_clients: Dict[str, SheetsClient] = field(default_factory=dict)  # By API key
+
+
+class ClientRegistry:
+    """Process-scoped registry of API clients.
+
+    Created once per process (at FastAPI startup, or once per CLI run) so
+    discovery, object setup and TLS handshakes are paid once instead of on
+    every generation.
+
+    Thread safety:
+        - The Gemini client is shared by all threads. genai.Client sits on
+          top of an httpx connection pool, which is safe for concurrent use.
+        - googleapiclient services and httplib2.Http are not thread-safe, so
+          each thread gets its own SheetsClient with its own keep-alive
+          connection, created on first use and reused for the lifetime of
+          the thread. Clients for further spreadsheets (other kitchens) on
+          the same thread share its API services and connection, as long as
+          they use the same API key. When a thread exits (e.g. a daemon
+          connection thread), its clients are dropped and its connection
+          closed.
+        - Blocking work started from async code runs on a bounded thread
+          pool (BLOCKING_WORKERS), so at most that many sets of Sheets API
+          services exist. Speculative generations run on a separate pool
+          of SPECULATION_WORKERS threads.
+
+    All Sheets clients share one Upstream, and all Gemini clients another,
+    so the rate limits and circuit breakers apply process-wide.
+
+    Clients are keyed on the API key of the config they are requested
+    for, so a kitchen that overrides GOOGLE_API_KEY or OPENAI_API_KEY
+    gets clients (and context caches) using its own key.
+
+    The Google and OpenAI SDKs are imported when their first client is
+    created, not when this module is, so the CLI starts (and reports
+    config errors) without loading them, and an unconfigured provider's
+    SDK is never loaded.
+    """
+
+    def __init__(self, config: Config):
+        """
+        Initialize the registry. Clients are created lazily on first use.
+
+        Args:
+            config: Configuration object
+        """
+        self.config = config
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Only the thread-local holds each thread's _ThreadSheets strongly
+        self._thread_sheets: 'weakref.WeakSet[_ThreadSheets]' = weakref.WeakSet()
+        self._genai_clients: Dict[str, 'genai.Client'] = {}
+        self._context_caches: Dict[str, ContextCacheManager] = {}
+        self._gemini_clients: Dict[Tuple, GeminiClient] = {}
+        self._openai_clients: Dict[Tuple, LLMProvider] = {}
+        self._hedged_providers: Dict[Tuple, HedgedProvider] = {}
+        self.provider_stats: Dict[str, ProviderStats] = {}
+        self.sheets_upstream = self._create_upstream('sheets', classify_sheets_error, config.sheets_rate_limit)
+        self.gemini_upstream = self._create_upstream('gemini', classify_gemini_error, config.gemini_rate_limit)
+        self.executor = ThreadPoolExecutor(
+            max_workers=config.blocking_workers,
+            thread_name_prefix='lunchlady-blocking'
+        )
+        self._speculation_executor = ThreadPoolExecutor(
+            max_workers=config.speculation_workers,
+            thread_name_prefix='lunchlady-speculation'
+        )
+        self._speculation_slots = threading.BoundedSemaphore(config.speculation_workers)
+
+    async def run_blocking(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking callable on the bounded executor without blocking the
+        event loop.
+
+        Args:
+            func: Callable to run
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            The callable's return value.
+        """
+        # Carry context variables (e.g. a metrics timing breakdown) over
+        # to the executor thread
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            functools.partial(context.run, func, *args, **kwargs)
+        )
+
+    def speculate(self, func: Callable[..., Any], *args, **kwargs) -> Optional[Future]:
+        """
+        Start a speculative call on its own bounded thread pool.
+
+        An abandoned speculative call still runs to the end, so these calls
+        don't take the blocking executor's threads, and none is started
+        while SPECULATION_WORKERS are busy.
+
+        Args:
+            func: Callable to run
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            The call's future, or None if every speculation worker is busy.
+        """
+        if not self._speculation_slots.acquire(blocking=False):
+            return None
+
+        # Carry the request deadline over to the pool thread
+        context = contextvars.copy_context()
+        try:
+            future = self._speculation_executor.submit(context.run, func, *args, **kwargs)
+        except BaseException:
+            # E.g. the pool was shut down; the call never took its slot
+            self._speculation_slots.release()
+            raise
+        future.add_done_callback(lambda _: self._speculation_slots.release())
+        return future
+
+    def sheets(self, spreadsheet_id: Optional[str] = None, api_key: Optional[str] = None) -> SheetsClient:
+        """
+        Get the calling thread's SheetsClient for a spreadsheet.
+
+        Args:
+            spreadsheet_id: Spreadsheet to read. Defaults to the configured one.
+            api_key: Google API key to read it with. Defaults to the
+                configured one.
+        """
+        spreadsheet_id = spreadsheet_id or self.config.spreadsheet_id
+        api_key = api_key or self.config.google_api_key
+        thread_sheets = getattr(self._local, 'sheets', None)
+        if thread_sheets is None:
+            import httplib2
+
+            thread_sheets = self._local.sheets = _ThreadSheets(http=httplib2.Http())
+            # Runs when the thread exits and its thread-local is cleared
+            weakref.finalize(thread_sheets, thread_sheets.http.close)
+            with self._lock:
+                self._thread_sheets.add(thread_sheets)
+
+        sheets_client = thread_sheets.clients.get((api_key, spreadsheet_id))
+        if sheets_client is None:
+            first_client = thread_sheets.first_clients.get(api_key)
+            if first_client is not None:
+                # Other spreadsheets reuse the thread's API services
+                sheets_client = first_client.for_spreadsheet(spreadsheet_id)
+            else:
+                sheets_client = SheetsClient(
+                    api_key=api_key,
+                    spreadsheet_id=spreadsheet_id,
+                    http=thread_sheets.http,
+                    upstream=self.sheets_upstream
+                )
+                thread_sheets.first_clients[api_key] = sheets_client
+            thread_sheets.clients[(api_key, spreadsheet_id)] = sheets_client
+
+        return sheets_client
+
+    def release_sheets(self, spreadsheet_id: str) -> None:
+        """
+        Drop every thread's SheetsClient for a spreadsheet no longer in use
+        (e.g. an evicted kitchen's). A thread that needs it again creates a
+        new one.
+
+        Args:
+            spreadsheet_id: Spreadsheet whose clients to drop
+        """
+        with self._lock:
+            for thread_sheets in list(self._thread_sheets):
+                for key in [key for key in thread_sheets.clients if key[1] == spreadsheet_id]:
+                    del thread_sheets.clients[key]
+
+    def gemini(self, config: Optional[Config] = None, structured: bool = False) -> GeminiClient:
+        """
+        Get a GeminiClient for the model settings of a config snapshot.
+
+        All GeminiClients with the same API key share one genai.Client and
+        its connection pools, and one ContextCacheManager when
+        GEMINI_CONTEXT_CACHE is on.
+
+        Args:
+            config: Config snapshot to take model settings from. Defaults
+                to the registry's config.
+            structured: Return JSON meal plans matching MEAL_PLAN_SCHEMA
+        """
+        config = config or self.config
+        api_key = config.google_api_key
+        settings = (
+            api_key,
+            config.gemini_model,
+            config.gemini_temperature,
+            config.gemini_max_tokens,
+            config.gemini_context_cache,
+            structured
+        )
+
+        with self._lock:
+            genai_client = self._genai_clients.get(api_key)
+            if genai_client is None:
+                genai_client = self._genai_clients[api_key] = self._create_genai_client(api_key)
+            context_cache = self._context_caches.get(api_key)
+            if context_cache is None and config.gemini_context_cache:
+                context_cache = self._context_caches[api_key] = ContextCacheManager(
+                    genai_client,
+                    ttl=config.gemini_context_cache_ttl,
+                    min_tokens=config.gemini_context_cache_min_tokens,
+                    max_entries=config.gemini_context_cache_max_entries,
+                    upstream=self.gemini_upstream
+                )
+
+            gemini_client = self._gemini_clients.get(settings)
+            if gemini_client is None:
+                gemini_client = GeminiClient(
+                    model=config.gemini_model,
+                    temperature=config.gemini_temperature,
+                    max_tokens=config.gemini_max_tokens,
+                    client=genai_client,
+                    upstream=self.gemini_upstream,
+                    context_cache=context_cache if config.gemini_context_cache else None,
+                    response_schema=MEAL_PLAN_SCHEMA if structured else None
+                )
+                self._gemini_clients[settings] = gemini_client
+
+            return gemini_client
+
+    def llm(self, config: Optional[Config] = None, structured: bool = False) -> LLMProvider:
+        """
+        Get the LLM provider for a config snapshot.
+
+        With a single provider in LLM_PROVIDERS, that client is returned
+        directly. With several, they are wrapped in a HedgedProvider that
+        hedges slow calls and fails over on errors; its latency and win/loss
+        stats are kept in provider_stats for the life of the registry.
+
+        Args:
+            config: Config snapshot to take provider settings from. Defaults
+                to the registry's config.
+            structured: Return JSON meal plans matching MEAL_PLAN_SCHEMA
+
+        Raises:
+            ConfigError: If an unknown provider is configured
+        """
+        config = config or self.config
+        providers = [self._provider(name, config, structured) for name in config.llm_providers]
+        if len(providers) == 1:
+            return providers[0]
+
+        settings = (
+            tuple(provider.name for provider in providers),
+            config.gemini_temperature,
+            config.gemini_max_tokens,
+            config.hedge_percentile,
+            config.hedge_initial_delay,
+            config.llm_timeout,
+            structured
+        )
+        with self._lock:
+            hedged = self._hedged_providers.get(settings)
+            if hedged is None:
+                hedged = HedgedProvider(
+                    providers,
+                    self.provider_stats,
+                    percentile=config.hedge_percentile,
+                    initial_delay=config.hedge_initial_delay,
+                    timeout=config.llm_timeout
+                )
+                self._hedged_providers[settings] = hedged
+
+            return hedged
+
+    def _provider(self, name: str, config: Config, structured: bool) -> LLMProvider:
+        """Get a single provider client by name."""
+        if name == 'gemini':
+            return self.gemini(config, structured)
+        if name == 'openai':
+            return self._openai(config, structured)
+
+        raise ConfigError(f"Unknown LLM provider: {name}")
+
+    def _openai(self, config: Config, structured: bool) -> LLMProvider:
+        """Get an OpenAIClient, importing the OpenAI SDK only when used."""
+        if not config.openai_api_key:
+            raise ConfigError("OPENAI_API_KEY is required when openai is an LLM provider")
+
+        settings = (
+            config.openai_api_key,
+            config.openai_model,
+            config.gemini_temperature,
+            config.gemini_max_tokens,
+            structured
+        )
+        with self._lock:
+            openai_client = self._openai_clients.get(settings)
+            if openai_client is None:
+                from openai_client import OpenAIClient
+
+                openai_client = OpenAIClient(
+                    api_key=config.openai_api_key,
+                    model=config.openai_model,
+                    temperature=config.gemini_temperature,
+                    max_tokens=config.gemini_max_tokens,
+                    response_schema=MEAL_PLAN_SCHEMA if structured else None
+                )
+                self._openai_clients[settings] = openai_client
+
+            return openai_client
+
+    def upstream_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Circuit breaker state of each upstream API."""
+        return {
+            upstream.name: {'circuit': upstream.breaker.state}
+            for upstream in (self.sheets_upstream, self.gemini_upstream)
+        }
+
+    def context_cache_stats(self) -> Optional[Dict[str, int]]:
+        """Context cache counters summed over API keys, or None if no
+        context cache is in use."""
+        with self._lock:
+            context_caches = list(self._context_caches.values())
+        if not context_caches:
+            return None
+
+        totals: Dict[str, int] = {}
+        for context_cache in context_caches:
+            for name, value in context_cache.stats().items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def _create_upstream(self, name: str, classify: Callable, rate_per_minute: Optional[float]) -> Upstream:
+        """Create the rate limit, retry and circuit breaker policy for an API."""
+        return Upstream(
+            name,
+            classify,
+            rate_per_minute=rate_per_minute,
+            max_attempts=self.config.retry_max_attempts,
+            base_delay=self.config.retry_base_delay,
+            max_delay=self.config.retry_max_delay,
+            failure_threshold=self.config.circuit_failure_threshold,
+            reset_timeout=self.config.circuit_reset_seconds
+        )
+
+    def _create_genai_client(self, api_key: str) -> 'genai.Client':
+        """Create a genai.Client with keep-alive connection pools."""
+        import httpx
+        from google import genai
+        from google.genai import types
+
+        limits = httpx.Limits(
+            max_connections=self.config.http_pool_size,
+            max_keepalive_connections=self.config.http_pool_size
+        )
+        return genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(
+                client_args={'limits': limits},
+                async_client_args={'limits': limits}
+            )
+        )
+
+    async def aclose(self) -> None:
+        """Close all pooled connections, including the async Gemini pool."""
+        with self._lock:
+            genai_clients = list(self._genai_clients.values())
+        for genai_client in genai_clients:
+            await genai_client.aio.aclose()
+        self.close()
+
+    def close(self) -> None:
+        """Close all pooled connections, the blocking and speculation
+        executors and the hedged providers' executors."""
+        self.executor.shutdown(wait=False)
+        self._speculation_executor.shutdown(wait=False)
+
+        with self._lock:
+            for thread_sheets in list(self._thread_sheets):
+                thread_sheets.http.close()
+            self._thread_sheets = weakref.WeakSet()
+
+            for genai_client in self._genai_clients.values():
+                genai_client.close()
+            self._genai_clients = {}
+            self._context_caches = {}
+            self._gemini_clients = {}
+            self._openai_clients = {}
+            for hedged in self._hedged_providers.values():
+                hedged.close()
+            self._hedged_providers = {}
+
+        self._local = threading.local()
@@ -1,9 +1,13 @@
 """Configuration management for Lunch Lady."""
 
+import copy
 import os
 import sys
 from pathlib import Path
-from typing import Optional
+from types import MappingProxyType
+from typing import Dict, List, Optional
+
+from snapshot_store import SnapshotStore, file_signature
 
 
 class ConfigError(Exception):
@@ -12,7 +16,12 @@ class ConfigError(Exception):
 
 
 class Config:
-    """Manages application configuration from environment variables."""
+    """Manages application configuration from environment variables.
+
+    Values from the .env file take precedence over the process environment.
+    A Config is an immutable snapshot: the .env file is read once, and the
+    process environment is never modified.
+    """
 
     REQUIRED_VARS = [
         'GOOGLE_API_KEY',
@@ -27,16 +36,18 @@ class Config:
         Args:
             env_file: Path to .env file. Defaults to '.env' in current directory.
         """
-        self._load_env_file(env_file or '.env')
+        self.env_file = env_file or '.env'
+        self._values = MappingProxyType(self._load_env_file(self.env_file))
         self._validate()
 
-    def _load_env_file(self, path: str) -> None:
+    def _load_env_file(self, path: str) -> Dict[str, str]:
         """Load environment variables from .env file."""
         env_path = Path(path)
 
         if not env_path.exists():
             raise ConfigError(f"Environment file not found: {path}")
 
+        values = {}
         with open(env_path, 'r') as f:
             for line in f:
                 line = line.strip()
@@ -56,13 +67,15 @@ class Config:
                     elif value.startswith("'") and value.endswith("'"):
                         value = value[1:-1]
 
-                    os.environ[key] = value
+                    values[key] = value
+
+        return values
 
     def _validate(self) -> None:
         """Validate that all required environment variables are set."""
         missing = []
         for var in self.REQUIRED_VARS:
-            if not os.environ.get(var):
+            if not self.get(var):
                 missing.append(var)
 
         if missing:
@@ -70,24 +83,51 @@ class Config:
                 f"Missing required environment variables: {', '.join(missing)}"
             )
 
+    def with_values(self, values: Dict[str, str]) -> 'Config':
+        """
+        Create a snapshot with some values replaced, e.g. for a tenant.
+
+        Args:
+            values: Variables that take precedence over this snapshot's
+
+        Returns:
+            A new Config; this one is unchanged.
+
+        Raises:
+            ConfigError: If the result is missing required variables
+        """
+        config = copy.copy(self)
+        config._values = MappingProxyType({**self._values, **values})
+        config._validate()
+        return config
+
     def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
         """Get configuration value."""
+        if key in self._values:
+            return self._values[key]
         return os.environ.get(key, default)
 
+    def get_bool(self, key: str, default: bool = False) -> bool:
+        """Get a boolean configuration value (true/yes/on/1)."""
+        value = self.get(key)
+        if not value:
+            return default
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
     @property
     def google_api_key(self) -> str:
         """Google API key (used for both Sheets and Gemini)."""
-        return os.environ['GOOGLE_API_KEY']
+        return self.get('GOOGLE_API_KEY')
 
     @property
     def spreadsheet_id(self) -> str:
         """Google Sheets spreadsheet ID."""
-        return os.environ['SPREADSHEET_ID']
+        return self.get('SPREADSHEET_ID')
 
     @property
     def gemini_model(self) -> str:
         """Gemini model name."""
-        return os.environ['GEMINI_MODEL']
+        return self.get('GEMINI_MODEL')
 
     @property
     def gemini_temperature(self) -> Optional[float]:
@@ -99,4 +139,297 @@ class Config:
     def gemini_max_tokens(self) -> Optional[int]:
         """Gemini max tokens parameter."""
         tokens = self.get('GEMINI_MAX_TOKENS')
-        return int(tokens) if tokens else None
\ No newline at end of file
+        return int(tokens) if tokens else None
+
+    @property
+    def sheet_cache_dir(self) -> Optional[str]:
+        """Directory for cached sheet snapshots (optional)."""
+        return self.get('SHEET_CACHE_DIR')
+
+    @property
+    def sheet_cache_ttl(self) -> float:
+        """Seconds a cached sheet snapshot is used without a revision check."""
+        ttl = self.get('SHEET_CACHE_TTL')
+        return float(ttl) if ttl else 300.0
+
+    @property
+    def speculative_generation(self) -> bool:
+        """Whether the LLM call starts on an expired sheet snapshot while
+        its revision is checked."""
+        return self.get_bool('SPECULATIVE_GENERATION')
+
+    @property
+    def speculation_workers(self) -> int:
+        """Maximum speculative LLM calls running at once in the sync path."""
+        workers = self.get('SPECULATION_WORKERS')
+        return int(workers) if workers else 4
+
+    @property
+    def http_pool_size(self) -> int:
+        """Maximum pooled keep-alive HTTP connections per API client."""
+        size = self.get('HTTP_POOL_SIZE')
+        return int(size) if size else 10
+
+    @property
+    def blocking_workers(self) -> int:
+        """Maximum threads used for blocking work in the async server path."""
+        workers = self.get('BLOCKING_WORKERS')
+        return int(workers) if workers else 8
+
+    @property
+    def response_cache_enabled(self) -> bool:
+        """Whether LLM responses are cached."""
+        return self.get_bool('RESPONSE_CACHE')
+
+    @property
+    def shared_cache_db(self) -> Optional[str]:
+        """SQLite file shared by all processes for responses and prompts (optional)."""
+        return self.get('SHARED_CACHE_DB')
+
+    @property
+    def response_cache_ttl(self) -> float:
+        """Seconds a cached response stays valid."""
+        ttl = self.get('RESPONSE_CACHE_TTL')
+        return float(ttl) if ttl else 86400.0
+
+    @property
+    def response_cache_max_bytes(self) -> int:
+        """Maximum size of the shared response cache tier."""
+        max_bytes = self.get('RESPONSE_CACHE_MAX_BYTES')
+        return int(max_bytes) if max_bytes else 50 * 1024 * 1024
+
+    @property
+    def response_cache_memory_entries(self) -> int:
+        """Maximum number of prompts held in the in-memory response cache."""
+        entries = self.get('RESPONSE_CACHE_MEMORY_ENTRIES')
+        return int(entries) if entries else 128
+
+    @property
+    def response_cache_variants(self) -> int:
+        """Number of distinct cached responses kept per prompt."""
+        variants = self.get('RESPONSE_CACHE_VARIANTS')
+        return int(variants) if variants else 1
+
+    @property
+    def plan_pool_size(self) -> int:
+        """Number of pre-generated plans kept ready per format (0 disables)."""
+        size = self.get('PLAN_POOL_SIZE')
+        return int(size) if size else 0
+
+    @property
+    def plan_pool_formats(self) -> List[str]:
+        """Output formats the web server keeps pre-generated plans for."""
+        formats = self.get('PLAN_POOL_FORMATS') or 'html'
+        return [fmt.strip() for fmt in formats.split(',') if fmt.strip()]
+
+    @property
+    def coalesce_generations(self) -> bool:
+        """Whether concurrent identical generations share one LLM call."""
+        return self.get_bool('COALESCE_GENERATIONS')
+
+    @property
+    def structured_output(self) -> bool:
+        """Whether md and html plans are rendered locally from one JSON plan."""
+        return self.get_bool('STRUCTURED_OUTPUT')
+
+    @property
+    def reload_interval(self) -> float:
+        """Seconds between checks for changed .env and prompt files."""
+        interval = self.get('RELOAD_INTERVAL')
+        return float(interval) if interval else 2.0
+
+    @property
+    def llm_providers(self) -> List[str]:
+        """LLM providers in priority order (gemini, openai)."""
+        providers = self.get('LLM_PROVIDERS') or 'gemini'
+        return [name.strip().lower() for name in providers.split(',') if name.strip()]
+
+    @property
+    def openai_api_key(self) -> Optional[str]:
+        """OpenAI API key (required when openai is a provider)."""
+        return self.get('OPENAI_API_KEY')
+
+    @property
+    def openai_model(self) -> str:
+        """OpenAI model name."""
+        return self.get('OPENAI_MODEL') or 'gpt-4o-mini'
+
+    @property
+    def hedge_percentile(self) -> float:
+        """Primary provider latency percentile used as the hedge delay."""
+        percentile = self.get('HEDGE_PERCENTILE')
+        return float(percentile) / 100 if percentile else 0.95
+
+    @property
+    def hedge_initial_delay(self) -> float:
+        """Hedge delay in seconds until enough latency samples exist."""
+        delay = self.get('HEDGE_INITIAL_DELAY')
+        return float(delay) if delay else 10.0
+
+    @property
+    def llm_timeout(self) -> Optional[float]:
+        """Seconds before giving up on all LLM providers (optional)."""
+        timeout = self.get('LLM_TIMEOUT')
+        return float(timeout) if timeout else None
+
+    @property
+    def request_deadline(self) -> Optional[float]:
+        """Default seconds a generation may take, None when set to 0."""
+        deadline = self.get('REQUEST_DEADLINE')
+        seconds = float(deadline) if deadline else 120.0
+        return seconds if seconds > 0 else None
+
+    @property
+    def gemini_fast_model(self) -> Optional[str]:
+        """Faster Gemini model to route to when time or prompt size calls for it (optional)."""
+        return self.get('GEMINI_FAST_MODEL')
+
+    @property
+    def fast_model_budget(self) -> float:
+        """Use GEMINI_FAST_MODEL when less than this many seconds are left."""
+        budget = self.get('FAST_MODEL_BUDGET')
+        return float(budget) if budget else 30.0
+
+    @property
+    def fast_model_prompt_tokens(self) -> Optional[int]:
+        """Use GEMINI_FAST_MODEL for prompts of more estimated tokens (optional)."""
+        tokens = self.get('FAST_MODEL_PROMPT_TOKENS')
+        return int(tokens) if tokens else None
+
+    @property
+    def gemini_context_cache(self) -> bool:
+        """Whether the static prompt prefix is cached server-side by Gemini."""
+        return self.get_bool('GEMINI_CONTEXT_CACHE')
+
+    @property
+    def gemini_context_cache_ttl(self) -> float:
+        """Seconds a Gemini context cache lives after creation or renewal."""
+        ttl = self.get('GEMINI_CONTEXT_CACHE_TTL')
+        return float(ttl) if ttl else 3600.0
+
+    @property
+    def gemini_context_cache_min_tokens(self) -> int:
+        """Smallest estimated prompt prefix worth a Gemini context cache."""
+        tokens = self.get('GEMINI_CONTEXT_CACHE_MIN_TOKENS')
+        return int(tokens) if tokens else 1024
+
+    @property
+    def gemini_context_cache_max_entries(self) -> int:
+        """Gemini context caches kept before the least recently used is
+        deleted. Defaults to four per kitchen kept in memory."""
+        entries = self.get('GEMINI_CONTEXT_CACHE_MAX_ENTRIES')
+        return int(entries) if entries else 4 * self.tenant_cache_size
+
+    @property
+    def sheets_rate_limit(self) -> Optional[float]:
+        """Maximum Sheets and Drive requests per minute (0 disables)."""
+        limit = self.get('SHEETS_RATE_LIMIT')
+        limit = float(limit) if limit else 60.0
+        return limit or None
+
+    @property
+    def gemini_rate_limit(self) -> Optional[float]:
+        """Maximum Gemini requests per minute (optional)."""
+        limit = self.get('GEMINI_RATE_LIMIT')
+        return float(limit) if limit else None
+
+    @property
+    def retry_max_attempts(self) -> int:
+        """Attempts per upstream call, including the first."""
+        attempts = self.get('RETRY_MAX_ATTEMPTS')
+        return int(attempts) if attempts else 4
+
+    @property
+    def retry_base_delay(self) -> float:
+        """Backoff delay in seconds before the first retry."""
+        delay = self.get('RETRY_BASE_DELAY')
+        return float(delay) if delay else 0.5
+
+    @property
+    def retry_max_delay(self) -> float:
+        """Maximum backoff delay in seconds between retries."""
+        delay = self.get('RETRY_MAX_DELAY')
+        return float(delay) if delay else 30.0
+
+    @property
+    def circuit_failure_threshold(self) -> int:
+        """Consecutive upstream failures before calls fail fast."""
+        threshold = self.get('CIRCUIT_FAILURE_THRESHOLD')
+        return int(threshold) if threshold else 5
+
+    @property
+    def circuit_reset_seconds(self) -> float:
+        """Seconds an upstream fails fast before it is tried again."""
+        seconds = self.get('CIRCUIT_RESET_SECONDS')
+        return float(seconds) if seconds else 30.0
+
+    @property
+    def plan_archive_enabled(self) -> bool:
+        """Whether every generated plan is kept in the plan archive."""
+        return self.get_bool('PLAN_ARCHIVE', default=True)
+
+    @property
+    def plan_archive_db(self) -> Optional[str]:
+        """SQLite file holding the plan archive (optional)."""
+        return self.get('PLAN_ARCHIVE_DB')
+
+    @property
+    def tenants_file(self) -> Optional[str]:
+        """JSON file of kitchens selectable with ?kitchen= or --kitchen (optional)."""
+        return self.get('TENANTS_FILE')
+
+    @property
+    def tenant_cache_size(self) -> int:
+        """Kitchens whose sheet snapshot and clients are kept in memory."""
+        size = self.get('TENANT_CACHE_SIZE')
+        return int(size) if size else 64
+
+    @property
+    def tenant_cache_bytes(self) -> int:
+        """Total sheet snapshot size of the kitchens kept in memory."""
+        max_bytes = self.get('TENANT_CACHE_BYTES')
+        return int(max_bytes) if max_bytes else 256 * 1024 * 1024
+
+    @property
+    def job_workers(self) -> int:
+        """Worker threads running queued /plans jobs (0 disables the job API)."""
+        workers = self.get('JOB_WORKERS')
+        return int(workers) if workers else 2
+
+    @property
+    def job_queue_size(self) -> int:
+        """Queued /plans jobs accepted before new ones are refused with 429."""
+        size = self.get('JOB_QUEUE_SIZE')
+        return int(size) if size else 100
+
+    @property
+    def job_db(self) -> Optional[str]:
+        """SQLite file holding /plans jobs and results (optional)."""
+        return self.get('JOB_DB')
+
+
+class ConfigStore(SnapshotStore[Config]):
+    """Current Config snapshot, reloaded when the .env file changes.
+
+    Settings used to build long-lived objects (API key, HTTP pool size,
+    cache locations and sizes) only take effect on restart. Everything read
+    per request, such as the spreadsheet ID and model parameters, follows
+    the latest snapshot.
+    """
+
+    def __init__(self, env_file: Optional[str] = None):
+        """
+        Initialize the store.
+
+        Args:
+            env_file: Path to .env file. Defaults to '.env' in current directory.
+
+        Raises:
+            ConfigError: If the initial configuration is invalid
+        """
+        env_file = env_file or '.env'
+        super().__init__(
+            loader=lambda: Config(env_file),
+            signature=lambda: file_signature([Path(env_file)])
+        )
+        self.poll_interval = self.current.reload_interval
@@ -0,0 +1,323 @@
+"""Gemini context caching for the static prompt prefix in Lunch Lady."""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from deadline import DeadlineExceededError, await_with_deadline, check_deadline, time_left
+from prompt_builder import estimate_tokens
+from resilience import Upstream
+from singleflight import AsyncSingleFlight, SingleFlight, SingleFlightTimeoutError
+
+if TYPE_CHECKING:
+    from google.genai import types
+
+
+@dataclass
+class CacheHandle:
+    """A server-side cached content entry for one prompt prefix."""
+    name: Optional[str]  # None records a failed creation
+    expires_at: float  # time.monotonic() deadline
+
+
+class ContextCacheManager:
+    """Creates, reuses and renews Gemini cached contents for prompt prefixes.
+
+    Handles are keyed by a hash of the model and the prefix text, so when
+    the sheets or prompt files change the new prefix gets a new handle and
+    the old one is never used again. The display name carries the same
+    hash, which lets another process (or a later CLI run) find and reuse a
+    handle that is still alive. Handles close to expiry are renewed; the
+    least recently used ones are deleted past ``max_entries``.
+
+    Failures never break generation: if a cache cannot be created, callers
+    get None and send the full prompt, and creation is not retried for
+    ``failure_backoff`` seconds. Cache calls go through the Gemini upstream
+    policy and stop at the request deadline; running out of time also
+    means sending the full prompt, without the backoff.
+    """
+
+    def __init__(
+        self,
+        client,
+        ttl: float = 3600.0,
+        min_tokens: int = 1024,
+        max_entries: int = 4,
+        failure_backoff: float = 300.0,
+        upstream: Optional[Upstream] = None
+    ):
+        """
+        Initialize the manager.
+
+        Args:
+            client: genai.Client (or a stub with the same caches API)
+            ttl: Seconds each cached content lives after creation or renewal
+            min_tokens: Smallest estimated prefix worth caching; Gemini
+                rejects caches below a model-specific minimum
+            max_entries: Handles kept before the least recently used is deleted
+            failure_backoff: Seconds to wait before retrying a failed creation
+            upstream: Optional rate limiter, retry policy and circuit
+                breaker for the caches calls
+        """
+        self.client = client
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self.max_entries = max_entries
+        self.failure_backoff = failure_backoff
+        self.upstream = upstream
+        self.renew_margin = min(60.0, ttl / 10)
+        self._handles: 'OrderedDict[str, CacheHandle]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._async_flight = AsyncSingleFlight()
+        self.hits = 0
+        self.creates = 0
+        self.renewals = 0
+        self.failures = 0
+
+    @staticmethod
+    def make_key(model: str, prefix: str) -> str:
+        """Build the handle key for a model and prompt prefix."""
+        return hashlib.sha256(f'{model}\0{prefix}'.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def display_name(key: str) -> str:
+        """Display name identifying a handle on the server."""
+        return f'lunchlady-{key[:32]}'
+
+    def get(self, model: str, prefix: str) -> Optional[str]:
+        """
+        Get a live cached content name for a prefix, creating or renewing
+        it if needed.
+
+        Args:
+            model: Model the cache is for
+            prefix: Static prompt prefix
+
+        Returns:
+            Cached content name, or None if the prefix should be sent inline.
+        """
+        if estimate_tokens(prefix) < self.min_tokens:
+            return None
+
+        key = self.make_key(model, prefix)
+        handle = self._fresh_handle(key)
+        if handle is not None:
+            return handle.name
+
+        try:
+            return self._flight.do(key, self._refresh, key, model, prefix, timeout=time_left())
+        except SingleFlightTimeoutError:
+            return None
+
+    async def aget(self, model: str, prefix: str) -> Optional[str]:
+        """Async version of get()."""
+        if estimate_tokens(prefix) < self.min_tokens:
+            return None
+
+        key = self.make_key(model, prefix)
+        handle = self._fresh_handle(key)
+        if handle is not None:
+            return handle.name
+
+        try:
+            return await await_with_deadline(
+                self._async_flight.do(key, self._arefresh, key, model, prefix),
+                'gemini.context_cache'
+            )
+        except DeadlineExceededError:
+            return None
+
+    def invalidate(self, model: str, prefix: str) -> None:
+        """
+        Forget the handle for a prefix, e.g. after the server reported it
+        missing. The next get() creates a new one.
+        """
+        with self._lock:
+            self._handles.pop(self.make_key(model, prefix), None)
+
+    def stats(self) -> Dict:
+        """Get handle counts and hit/create/renew/failure counters."""
+        with self._lock:
+            live = sum(1 for handle in self._handles.values() if handle.name)
+
+        return {
+            'handles': live,
+            'hits': self.hits,
+            'creates': self.creates,
+            'renewals': self.renewals,
+            'failures': self.failures
+        }
+
+    def _fresh_handle(self, key: str) -> Optional[CacheHandle]:
+        """Get a handle that needs no renewal, marking it recently used."""
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is None or handle.expires_at - time.monotonic() <= self.renew_margin:
+                return None
+
+            self._handles.move_to_end(key)
+            if handle.name:
+                self.hits += 1
+            return handle
+
+    def _refresh(self, key: str, model: str, prefix: str) -> Optional[str]:
+        """Renew, find or create the handle for a prefix."""
+        with self._lock:
+            handle = self._handles.get(key)
+
+        if handle is not None and handle.name:
+            try:
+                self._call(self.client.caches.update, name=handle.name, config=self._update_config())
+                self.renewals += 1
+                self._delete(self._store(key, handle.name, self.ttl))
+                return handle.name
+            except DeadlineExceededError:
+                return None
+            except Exception:
+                # Expired or deleted server-side; look for or make another
+                pass
+
+        try:
+            existing = self._find_existing(key, self._call(lambda: list(self.client.caches.list())))
+            if existing:
+                name, seconds_left = existing
+            else:
+                cached = self._call(self.client.caches.create, model=model, config=self._create_config(key, prefix))
+                self.creates += 1
+                name, seconds_left = cached.name, self.ttl
+        except DeadlineExceededError:
+            return None
+        except Exception:
+            self.failures += 1
+            self._delete(self._store(key, None, self.failure_backoff))
+            return None
+
+        self._delete(self._store(key, name, seconds_left))
+        return name
+
+    async def _arefresh(self, key: str, model: str, prefix: str) -> Optional[str]:
+        """Async version of _refresh()."""
+        with self._lock:
+            handle = self._handles.get(key)
+
+        if handle is not None and handle.name:
+            try:
+                await self._acall(self.client.aio.caches.update, name=handle.name, config=self._update_config())
+                self.renewals += 1
+                await self._adelete(self._store(key, handle.name, self.ttl))
+                return handle.name
+            except DeadlineExceededError:
+                return None
+            except Exception:
+                # Expired or deleted server-side; look for or make another
+                pass
+
+        try:
+            existing = self._find_existing(key, await self._acall(self._alist))
+            if existing:
+                name, seconds_left = existing
+            else:
+                cached = await self._acall(
+                    self.client.aio.caches.create, model=model, config=self._create_config(key, prefix)
+                )
+                self.creates += 1
+                name, seconds_left = cached.name, self.ttl
+        except DeadlineExceededError:
+            return None
+        except Exception:
+            self.failures += 1
+            await self._adelete(self._store(key, None, self.failure_backoff))
+            return None
+
+        await self._adelete(self._store(key, name, seconds_left))
+        return name
+
+    def _call(self, func: Callable[..., Any], **kwargs) -> Any:
+        """Make a caches call through the upstream policy, if any."""
+        if self.upstream is not None:
+            return self.upstream.call(func, **kwargs)
+        check_deadline('gemini.context_cache')
+        return func(**kwargs)
+
+    async def _acall(self, func: Callable[..., Awaitable[Any]], **kwargs) -> Any:
+        """Async version of _call()."""
+        if self.upstream is not None:
+            return await self.upstream.acall(func, **kwargs)
+        return await await_with_deadline(func(**kwargs), 'gemini.context_cache')
+
+    async def _alist(self) -> List:
+        """List the cached contents on the server, across all pages."""
+        return [entry async for entry in await self.client.aio.caches.list()]
+
+    def _find_existing(self, key: str, entries) -> Optional[Tuple[str, float]]:
+        """
+        Find a live server-side cache created for this key by any process.
+
+        Returns:
+            Tuple of (name, seconds_left), or None if there is none worth reusing.
+        """
+        display_name = self.display_name(key)
+        for entry in entries:
+            if entry.display_name != display_name or entry.expire_time is None:
+                continue
+
+            seconds_left = (entry.expire_time - datetime.now(timezone.utc)).total_seconds()
+            if seconds_left > self.renew_margin:
+                return entry.name, seconds_left
+
+        return None
+
+    def _store(self, key: str, name: Optional[str], seconds: float) -> List[str]:
+        """
+        Record a handle, evicting the least recently used past max_entries.
+
+        Returns:
+            Names of evicted cached contents, to be deleted by the caller.
+        """
+        evicted = []
+        with self._lock:
+            self._handles[key] = CacheHandle(name, time.monotonic() + seconds)
+            self._handles.move_to_end(key)
+            while len(self._handles) > self.max_entries:
+                _, old = self._handles.popitem(last=False)
+                if old.name:
+                    evicted.append(old.name)
+
+        return evicted
+
+    def _delete(self, names: List[str]) -> None:
+        """Delete evicted cached contents; they expire anyway if this fails."""
+        for name in names:
+            try:
+                self._call(self.client.caches.delete, name=name)
+            except Exception:
+                pass
+
+    async def _adelete(self, names: List[str]) -> None:
+        """Async version of _delete()."""
+        for name in names:
+            try:
+                await self._acall(self.client.aio.caches.delete, name=name)
+            except Exception:
+                pass
+
+    def _create_config(self, key: str, prefix: str) -> 'types.CreateCachedContentConfig':
+        """Build the request config for a new cached content."""
+        from google.genai import types
+
+        return types.CreateCachedContentConfig(
+            contents=[prefix],
+            ttl=f'{int(self.ttl)}s',
+            display_name=self.display_name(key)
+        )
+
+    def _update_config(self) -> 'types.UpdateCachedContentConfig':
+        """Build the request config extending a cached content's TTL."""
+        from google.genai import types
+
+        return types.UpdateCachedContentConfig(ttl=f'{int(self.ttl)}s')
@@ -0,0 +1,359 @@
+"""Warm background daemon for the Lunch Lady CLI.
+
+``lunchlady daemon`` keeps one generator process running, with its sheet
+snapshot, prompt files and API connections already loaded, and serves CLI
+runs over a Unix domain socket. The ``lunchlady`` command connects to it
+when it is running and falls back to generating in-process otherwise.
+
+Each connection carries one request: the client sends a JSON line with
+its options, and the daemon answers with JSON lines (``accepted``, then
+``prompt``/``chunk``/``done`` for streams or ``result``, or ``error``).
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+from dataclasses import asdict
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterator, Optional
+
+from config import ConfigError, ConfigStore
+from deadline import DeadlineExceededError, request_deadline
+from gemini_client import GeminiClientError
+from llm_providers import LLMProviderError
+from metrics import collect_timings
+from openai_client import OpenAIClientError
+from plan_renderer import PlanRenderError
+from sheets_client import SheetsClientError
+from tenants import TenantError, TenantRegistry, TenantStore
+
+if TYPE_CHECKING:
+    from meal_plan_generator import MealPlanGenerator
+
+
+class DaemonError(Exception):
+    """Raised when the daemon can't be started or answers unexpectedly."""
+    pass
+
+
+# Errors re-raised in the client under their own type, so the CLI reports
+# them exactly as it would for an in-process run
+REMOTE_ERRORS = {
+    error.__name__: error
+    for error in (
+        ConfigError, SheetsClientError, GeminiClientError, OpenAIClientError, LLMProviderError, PlanRenderError,
+        TenantError, DeadlineExceededError, ValueError
+    )
+}
+
+
+def default_socket_path(script_dir: Path) -> Path:
+    """Socket path from LUNCHLADY_SOCKET, or .cache/daemon.sock in the app directory."""
+    return Path(os.environ.get('LUNCHLADY_SOCKET') or script_dir / '.cache' / 'daemon.sock')
+
+
+def _send(stream, message: Dict) -> None:
+    """Write one JSON line and flush it."""
+    stream.write(json.dumps(message).encode('utf-8') + b'\n')
+    stream.flush()
+
+
+class DaemonClient:
+    """Client side of the daemon protocol, used by the lunchlady CLI."""
+
+    def __init__(self, socket_path: Path, timeout: Optional[float] = None):
+        """
+        Initialize the client.
+
+        Args:
+            socket_path: Path of the daemon's Unix socket
+            timeout: Seconds to wait for each message, or None to wait
+                as long as generation takes
+        """
+        self.socket_path = Path(socket_path)
+        self.timeout = timeout
+
+    def connect(self) -> Optional[socket.socket]:
+        """
+        Connect to the daemon.
+
+        Returns:
+            A connected socket, or None if no daemon is listening.
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(str(self.socket_path))
+        except (FileNotFoundError, ConnectionRefusedError):
+            sock.close()
+            return None
+        sock.settimeout(self.timeout)
+        return sock
+
+    def request(self, sock: socket.socket, options: Dict) -> Iterator[Dict]:
+        """
+        Send a request and yield the daemon's messages as they arrive.
+
+        Error messages are raised as the original exception type when it
+        is one the CLI handles, and as DaemonError otherwise.
+
+        Args:
+            sock: Socket from connect()
+            options: Request options (see LunchLadyDaemon)
+
+        Yields:
+            Message dictionaries, in order.
+
+        Raises:
+            DaemonError: If the connection drops before the reply is complete
+        """
+        with sock, sock.makefile('rwb') as stream:
+            _send(stream, options)
+            for line in stream:
+                message = json.loads(line)
+                if message['type'] == 'error':
+                    error = REMOTE_ERRORS.get(message['error'])
+                    if error is None:
+                        raise DaemonError(f"{message['error']}: {message['message']}")
+                    raise error(message['message'])
+                yield message
+                if message['type'] in ('result', 'done', 'unsupported'):
+                    return
+
+        raise DaemonError("Daemon closed the connection before finishing")
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Serves one CLI request per connection."""
+
+    def handle(self):
+        daemon = self.server.daemon
+        try:
+            line = self.rfile.readline()
+            if not line:
+                # A probe, such as another daemon checking the socket is in use
+                return
+            daemon.serve(json.loads(line), self.wfile)
+        except (BrokenPipeError, ConnectionResetError):
+            # The CLI was interrupted; nothing left to answer
+            pass
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class LunchLadyDaemon:
+    """A warm MealPlanGenerator served over a Unix domain socket.
+
+    The generator, its API clients and its caches live for the whole
+    process, so repeat runs skip SDK imports, discovery, TLS handshakes and
+    (while the sheets are unchanged) the sheet download. The .env and
+    prompt files are watched and reloaded as in the web server.
+
+    Requests name the .env file the CLI was pointed at; requests for any
+    other file are answered ``unsupported`` and the CLI runs in-process.
+    Batch runs are never sent here.
+    """
+
+    def __init__(self, env_file: str, socket_path: Path, script_dir: Path):
+        """
+        Initialize the daemon and its generator.
+
+        Args:
+            env_file: Path to the .env file
+            socket_path: Path to listen on
+            script_dir: Directory containing prompt files
+
+        Raises:
+            ConfigError: If the configuration is invalid
+        """
+        # Imported here so the CLI's client path doesn't pay for them
+        from clients import ClientRegistry
+        from meal_plan_generator import MealPlanGenerator
+
+        self.env_file = Path(env_file).resolve()
+        self.socket_path = Path(socket_path)
+        self.config_store = ConfigStore(str(self.env_file))
+        config = self.config_store.current
+        self.clients = ClientRegistry(config)
+        self.generator = MealPlanGenerator(config, script_dir, clients=self.clients, config_store=self.config_store)
+        self.tenants = TenantRegistry(
+            self.generator,
+            TenantStore(Path(config.tenants_file or script_dir / 'tenants.json'), config.reload_interval),
+            config.tenant_cache_size,
+            config.tenant_cache_bytes
+        )
+        self._server: Optional[_UnixServer] = None
+
+    def warm_up(self) -> None:
+        """
+        Load the sheets and prompt files and create the LLM clients, so the
+        first request is as fast as later ones.
+
+        Raises:
+            Exception: Whatever loading the sheets or creating clients raised
+        """
+        prompt = self.generator.build_prompt()
+        self.clients.llm(self.generator.config, structured=prompt.output_format == 'json')
+
+    def serve_forever(self) -> None:
+        """
+        Listen on the socket until shutdown() is called.
+
+        Raises:
+            DaemonError: If another daemon is already listening on the socket
+        """
+        if DaemonClient(self.socket_path).connect() is not None:
+            raise DaemonError(f"A daemon is already listening on {self.socket_path}")
+
+        # A leftover socket file from a daemon that didn't exit cleanly
+        self.socket_path.unlink(missing_ok=True)
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Only the owner may connect
+        umask = os.umask(0o177)
+        try:
+            self._server = _UnixServer(str(self.socket_path), _RequestHandler)
+        finally:
+            os.umask(umask)
+        self._server.daemon = self
+
+        self.generator.start_watching()
+        self.tenants.start()
+        try:
+            self._server.serve_forever()
+        finally:
+            self.tenants.stop()
+            self.generator.stop_watching()
+            self._server.server_close()
+            self.socket_path.unlink(missing_ok=True)
+            self.clients.close()
+
+    def shutdown(self) -> None:
+        """Stop serve_forever() from another thread."""
+        if self._server is not None:
+            self._server.shutdown()
+
+    def serve(self, options: Dict, stream) -> None:
+        """
+        Answer one request.
+
+        Args:
+            options: Request with env_file, kitchen, output, refresh_sheets,
+                no_cache, stream and deadline
+            stream: Binary file to write JSON line messages to
+        """
+        if Path(options.get('env_file') or '.env').resolve() != self.env_file:
+            _send(stream, {'type': 'unsupported', 'reason': f'daemon serves {self.env_file}'})
+            return
+
+        try:
+            generator = self.tenants.generator(options.get('kitchen'))
+            config = generator.config
+        except (TenantError, ConfigError) as e:
+            _send(stream, {'type': 'error', 'error': type(e).__name__, 'message': str(e)})
+            return
+
+        _send(stream, {'type': 'accepted', 'model': config.gemini_model, 'providers': config.llm_providers})
+
+        with collect_timings() as timings:
+            try:
+                if options.get('stream'):
+                    self._stream(generator, options, stream)
+                    _send(stream, {'type': 'done', 'timings': timings.format()})
+                    return
+
+                result = generator.generate(
+                    output_format=options.get('output') or 'md',
+                    refresh_sheets=bool(options.get('refresh_sheets')),
+                    no_cache=bool(options.get('no_cache')),
+                    deadline=options.get('deadline')
+                )
+            except (BrokenPipeError, ConnectionResetError):
+                raise
+            except Exception as e:
+                _send(stream, {'type': 'error', 'error': type(e).__name__, 'message': str(e)})
+                return
+
+        response_cache = generator.response_cache
+        _send(stream, {
+            'type': 'result',
+            'result': result.to_dict(),
+            'cache_stats': response_cache.stats() if response_cache else None,
+            'timings': timings.format()
+        })
+
+    def _stream(self, generator: 'MealPlanGenerator', options: Dict, stream) -> None:
+        """Send the prompt, then each response chunk as it arrives."""
+        with request_deadline(generator.budget(options.get('deadline'))):
+            prompt = generator.build_prompt(
+                options.get('output') or 'md',
+                bool(options.get('refresh_sheets')),
+                structured=False
+            )
+            _send(stream, {
+                'type': 'prompt',
+                'text': prompt.text,
+                'token_report': asdict(prompt.token_report) if prompt.token_report else None
+            })
+            for chunk in generator.stream(prompt):
+                _send(stream, {'type': 'chunk', 'text': chunk})
+
+
+def run_daemon(argv, script_dir: Path) -> None:
+    """
+    Run ``lunchlady daemon`` in the foreground until interrupted.
+
+    Args:
+        argv: Command line arguments after 'daemon'
+        script_dir: Directory containing prompt files
+    """
+    parser = argparse.ArgumentParser(
+        prog='lunchlady daemon',
+        description='Keep a warm meal plan generator running for the lunchlady CLI'
+    )
+    parser.add_argument(
+        '--env-file',
+        default='.env',
+        help='Path to .env file (default: .env)'
+    )
+    parser.add_argument(
+        '--socket',
+        default=str(default_socket_path(script_dir)),
+        help='Unix socket to listen on (default: $LUNCHLADY_SOCKET or .cache/daemon.sock)'
+    )
+    args = parser.parse_args(argv)
+
+    def log(msg):
+        print(msg, file=sys.stderr)
+
+    try:
+        daemon = LunchLadyDaemon(args.env_file, Path(args.socket), script_dir)
+    except ConfigError as e:
+        log(f"❌ Configuration error: {e}")
+        sys.exit(1)
+
+    log("🔥 Warming up...")
+    try:
+        daemon.warm_up()
+        log("✓ Sheets, prompts and API clients loaded")
+    except Exception as e:
+        # Not fatal: the same error will be reported to the first request
+        log(f"⚠️  Warm-up failed: {e}")
+
+    # Let SIGTERM stop the server like Ctrl-C does
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=daemon.shutdown).start())
+
+    log(f"✓ Listening on {args.socket} (Ctrl-C to stop)")
+    try:
+        daemon.serve_forever()
+    except DaemonError as e:
+        log(f"❌ {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        log("\n🛑 Daemon stopped")
@@ -0,0 +1,152 @@
+"""Per-request deadlines for Lunch Lady."""
+
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator, Optional, Tuple, TypeVar
+
+from metrics import DEADLINES_EXCEEDED
+
+T = TypeVar('T')
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a request can't finish before its deadline."""
+    pass
+
+
+# (monotonic time the request must finish by, its budget in seconds), or
+# None outside a request deadline. Context variables follow the request
+# into tasks and, via ClientRegistry.run_blocking(), executor threads.
+_deadline: contextvars.ContextVar[Optional[Tuple[float, float]]] = contextvars.ContextVar(
+    'lunchlady_deadline', default=None
+)
+
+
+@contextmanager
+def request_deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Give the calls made in the body a time budget.
+
+    A deadline inside another one can only shorten it.
+
+    Args:
+        seconds: Budget from now, or None (or 0) for no new limit
+    """
+    if not seconds:
+        yield
+        return
+
+    at = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None and outer[0] <= at:
+        at, seconds = outer
+    token = _deadline.set((at, seconds))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def detached_deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Give the body a budget of its own, ignoring any outer deadline.
+
+    For work shared by callers with different deadlines: it runs under
+    this budget, and each caller bounds its own wait.
+
+    Args:
+        seconds: Budget from now, or None for no limit
+    """
+    token = _deadline.set((time.monotonic() + seconds, seconds) if seconds else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+async def run_detached(seconds: Optional[float], func: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+    """
+    Await func(*args, **kwargs) under detached_deadline(seconds).
+
+    Meant to run as a task of its own (e.g. the shared task of an
+    AsyncSingleFlight), so the caller's context is left untouched.
+    """
+    with detached_deadline(seconds):
+        return await func(*args, **kwargs)
+
+
+def deadline_at() -> Optional[float]:
+    """Monotonic time of the current deadline, or None without one."""
+    current = _deadline.get()
+    return current[0] if current else None
+
+
+def time_left() -> Optional[float]:
+    """Seconds left before the current deadline (at least 0), or None
+    without one."""
+    at = deadline_at()
+    if at is None:
+        return None
+    return max(0.0, at - time.monotonic())
+
+
+def deadline_passed() -> bool:
+    """Whether the current deadline has passed."""
+    return time_left() == 0.0
+
+
+def deadline_error(what: str) -> DeadlineExceededError:
+    """
+    Count a missed deadline and create the error to raise for it.
+
+    Args:
+        what: The upstream or stage that could not finish in time
+
+    Returns:
+        The error, naming what ran out of time and the budget.
+    """
+    DEADLINES_EXCEEDED.inc(labels=(what,))
+    current = _deadline.get()
+    budget = f" of {current[1]:g}s" if current else ''
+    return DeadlineExceededError(f"Request deadline{budget} exceeded waiting for {what}")
+
+
+def check_deadline(what: str) -> None:
+    """
+    Fail fast if the current deadline has passed.
+
+    Args:
+        what: The upstream or stage about to be called
+
+    Raises:
+        DeadlineExceededError: If no time is left
+    """
+    if deadline_passed():
+        raise deadline_error(what)
+
+
+async def await_with_deadline(awaitable: Awaitable[T], what: str) -> T:
+    """
+    Await something, cancelling it when the current deadline passes.
+
+    Args:
+        awaitable: Coroutine or future to await
+        what: The upstream or stage being awaited
+
+    Returns:
+        The awaitable's result.
+
+    Raises:
+        DeadlineExceededError: If the deadline passed first
+    """
+    timeout = time_left()
+    if timeout is None:
+        return await awaitable
+
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise deadline_error(what) from None
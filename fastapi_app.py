@@ -1,50 +1,413 @@
 """FastAPI web interface for Lunch Lady."""
 
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response, StreamingResponse
 
-from config import Config, ConfigError
+from config import ConfigError, ConfigStore
+from clients import ClientRegistry
+from deadline import DeadlineExceededError, await_with_deadline, request_deadline
 from sheets_client import SheetsClientError
 from gemini_client import GeminiClientError
+from llm_providers import LLMProviderError
+from openai_client import OpenAIClientError
+from job_queue import CANCELLED, FINISHED_STATES, JobQueue, JobQueueFullError, JobStore
 from meal_plan_generator import MealPlanGenerator
+from metrics import REGISTRY
+from plan_archive import PlanArchive, parse_time
+from plan_pool import PlanPool
+from plan_renderer import PlanRenderError
+from tenants import TenantError, TenantRegistry, TenantStore
 
 
 # Get script directory
 SCRIPT_DIR = Path(__file__).parent
 
-app = FastAPI(title="Lunch Lady", description="Meal Planning Service")
+MEDIA_TYPES = {
+    'html': 'text/html',
+    'md': 'text/markdown',
+    'json': 'application/json'
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create configuration and API clients once for the whole process."""
+    # Load configuration from default .env file, reloaded when it changes
+    config_store = ConfigStore()
+    config = config_store.current
+    clients = ClientRegistry(config)
+    generator = MealPlanGenerator(config, SCRIPT_DIR, clients=clients, config_store=config_store)
+    generator.start_watching()
+    app.state.generator = generator
+
+    app.state.tenants = TenantRegistry(
+        generator,
+        TenantStore(Path(config.tenants_file or SCRIPT_DIR / 'tenants.json'), config.reload_interval),
+        config.tenant_cache_size,
+        config.tenant_cache_bytes
+    )
+    app.state.tenants.start()
+
+    app.state.plan_pool = None
+    if config.plan_pool_size > 0:
+        app.state.plan_pool = PlanPool(generator, config.plan_pool_formats, config.plan_pool_size)
+        app.state.plan_pool.start()
+
+    app.state.job_queue = None
+    if config.job_workers > 0:
+        store = JobStore(Path(config.job_db or SCRIPT_DIR / '.cache' / 'jobs.sqlite3'))
+        app.state.job_queue = JobQueue(generator, store, config.job_workers, config.job_queue_size)
+        app.state.job_queue.start()
+
+    yield
+
+    if app.state.plan_pool:
+        await app.state.plan_pool.stop()
+    if app.state.job_queue:
+        # Jobs still running are requeued when the server starts again. A
+        # worker that didn't stop in time may still use the store.
+        if await clients.run_blocking(app.state.job_queue.stop, 5.0):
+            app.state.job_queue.store.close()
+    app.state.tenants.stop()
+    generator.stop_watching()
+    if generator.archive:
+        generator.archive.close()
+    generator.shared_cache.close()
+    await clients.aclose()
+
+
+app = FastAPI(title="Lunch Lady", description="Meal Planning Service", lifespan=lifespan)
+
+
+def _generator(request: Request, kitchen: Optional[str]) -> MealPlanGenerator:
+    """Get the generator for a kitchen, or fail with 404 if it is unknown."""
+    try:
+        return request.app.state.tenants.generator(kitchen)
+    except TenantError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+def _deadline(request: Request, generator: MealPlanGenerator, deadline: Optional[float]) -> Optional[float]:
+    """
+    Get a request's time budget in seconds: the deadline query parameter
+    or X-Request-Deadline header, capped at REQUEST_DEADLINE.
+
+    Returns:
+        The budget, or None to use REQUEST_DEADLINE.
+    """
+    if deadline is None:
+        header = request.headers.get('x-request-deadline')
+        if header is None:
+            return None
+        try:
+            deadline = float(header)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid X-Request-Deadline: {header}")
+
+    if deadline <= 0:
+        raise HTTPException(status_code=400, detail="deadline must be a positive number of seconds")
+
+    limit = generator.config.request_deadline
+    return min(deadline, limit) if limit else deadline
+
+
+def _check_format(generator: MealPlanGenerator, output_format: str) -> None:
+    """Fail with 400 if plans can't be generated in an output format."""
+    if not generator.supports_format(output_format):
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {output_format}")
 
 
 @app.get("/new", response_class=HTMLResponse)
-async def generate_meal_plan():
+async def generate_meal_plan(
+    request: Request,
+    no_cache: bool = False,
+    format: str = 'html',
+    kitchen: Optional[str] = None,
+    deadline: Optional[float] = None
+):
     """
-    Generate a new meal plan in HTML format.
+    Generate a new meal plan, in HTML format by default.
+
+    Args:
+        no_cache: Always call the model instead of reusing a cached or
+            pre-generated plan
+        format: Output format (html, md, or json with STRUCTURED_OUTPUT)
+        kitchen: Kitchen from the tenants file whose spreadsheet to use
+        deadline: Seconds to give up after (or X-Request-Deadline), up to
+            REQUEST_DEADLINE; a late plan fails with 504
 
     Returns:
-        HTML response with the generated meal plan
+        Response with the generated meal plan
     """
+    generator = _generator(request, kitchen)
+    budget = _deadline(request, generator, deadline)
+    _check_format(generator, format)
     try:
-        # Load configuration from default .env file
-        config = Config()
+        media_type = MEDIA_TYPES.get(format, 'text/plain')
+
+        with request_deadline(generator.budget(budget)):
+            # Serve a pre-generated plan when one is ready (default kitchen only)
+            plan_pool = request.app.state.plan_pool
+            if plan_pool and not no_cache and not kitchen:
+                result = await plan_pool.take(format)
+                if result:
+                    return Response(result.response, media_type=media_type)
 
-        # Generate meal plan with HTML output
-        generator = MealPlanGenerator(config, SCRIPT_DIR)
-        result = generator.generate(output_format='html')
+            result = await generator.agenerate(output_format=format, no_cache=no_cache, deadline=budget)
 
-        return result.response
+        return Response(result.response, media_type=media_type)
 
+    except DeadlineExceededError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except ConfigError as e:
         raise HTTPException(status_code=500, detail=f"Configuration error: {e}")
     except SheetsClientError as e:
         raise HTTPException(status_code=500, detail=f"Google Sheets error: {e}")
     except GeminiClientError as e:
         raise HTTPException(status_code=500, detail=f"Gemini API error: {e}")
+    except OpenAIClientError as e:
+        raise HTTPException(status_code=500, detail=f"OpenAI API error: {e}")
+    except LLMProviderError as e:
+        raise HTTPException(status_code=500, detail=f"LLM error: {e}")
+    except PlanRenderError as e:
+        raise HTTPException(status_code=500, detail=f"Meal plan error: {e}")
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {e}")
+
+
+@app.get("/new/stream", response_class=StreamingResponse)
+async def stream_meal_plan(request: Request, kitchen: Optional[str] = None, deadline: Optional[float] = None):
+    """
+    Generate a new meal plan in HTML format, streaming it as chunked HTML
+    while the model produces it.
+
+    The time to the first model token is reported in the Server-Timing
+    header as ``ttfb``.
+
+    Args:
+        kitchen: Kitchen from the tenants file whose spreadsheet to use
+        deadline: Seconds to wait for the first chunk (or
+            X-Request-Deadline), up to REQUEST_DEADLINE; fails with 504
+
+    Returns:
+        Streaming HTML response with the generated meal plan
+    """
+    start = time.perf_counter()
+    generator = _generator(request, kitchen)
+    budget = _deadline(request, generator, deadline)
+
+    try:
+        with request_deadline(generator.budget(budget)):
+            prompt = await generator.abuild_prompt(output_format='html', structured=False)
+
+            # Wait for the first chunk so upstream errors still map to a 500
+            chunks = generator.astream(prompt)
+            first_chunk = await await_with_deadline(anext(chunks, ''), 'llm')
+
+    except DeadlineExceededError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except SheetsClientError as e:
+        raise HTTPException(status_code=500, detail=f"Google Sheets error: {e}")
+    except GeminiClientError as e:
+        raise HTTPException(status_code=500, detail=f"Gemini API error: {e}")
+    except OpenAIClientError as e:
+        raise HTTPException(status_code=500, detail=f"OpenAI API error: {e}")
+    except LLMProviderError as e:
+        raise HTTPException(status_code=500, detail=f"LLM error: {e}")
     except ValueError as e:
         raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {e}")
 
+    ttfb_ms = (time.perf_counter() - start) * 1000
+
+    async def body():
+        yield first_chunk
+        async for chunk in chunks:
+            yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type='text/html',
+        headers={'Server-Timing': f'ttfb;dur={ttfb_ms:.1f}'}
+    )
+
+
+def _job_queue(request: Request) -> JobQueue:
+    """Get the job queue, or fail with 404 if the job API is disabled."""
+    job_queue = request.app.state.job_queue
+    if job_queue is None:
+        raise HTTPException(status_code=404, detail="Job API is disabled (JOB_WORKERS=0)")
+    return job_queue
+
+
+@app.post("/plans", status_code=202)
+async def create_plan_job(request: Request, format: str = 'html', no_cache: bool = False):
+    """
+    Queue a meal plan generation and return at once.
+
+    Args:
+        format: Output format (html, md, or json with STRUCTURED_OUTPUT)
+        no_cache: Always call the model instead of reusing a cached plan
+
+    Returns:
+        The job's ID, status and URL to poll
+    """
+    job_queue = _job_queue(request)
+    _check_format(request.app.state.generator, format)
+    try:
+        job = await request.app.state.generator.clients.run_blocking(job_queue.submit, format, no_cache)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={'Retry-After': '30'})
+
+    return {"id": job.id, "status": job.status, "url": f"/plans/{job.id}"}
+
+
+def _archive(request: Request) -> PlanArchive:
+    """Get the plan archive, or fail with 404 if it is disabled."""
+    archive = request.app.state.generator.archive
+    if archive is None:
+        raise HTTPException(status_code=404, detail="Plan archive is disabled (PLAN_ARCHIVE=false)")
+    return archive
+
+
+@app.get("/plans/history")
+async def plan_history(
+    request: Request,
+    limit: int = 20,
+    before: Optional[int] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    format: Optional[str] = None,
+    hash: Optional[str] = None
+):
+    """
+    List archived plans, newest first, without their bodies.
+
+    Args:
+        limit: Plans per page (1-200)
+        before: Only plans older than this ID; pass the previous page's
+            next_before to get the next page
+        since: Only plans created at or after this time (ISO date/time or
+            Unix time)
+        until: Only plans created before this time
+        format: Only plans in this output format
+        hash: Only plans whose prompt or sheet hash starts with this
+
+    Returns:
+        The page of plans and the cursor for the next page (null at the end)
+    """
+    archive = _archive(request)
+    try:
+        since_time = parse_time(since) if since else None
+        until_time = parse_time(until) if until else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    limit = max(1, min(limit, 200))
+    plans = await request.app.state.generator.clients.run_blocking(
+        archive.history, limit, before, since_time, until_time, format, hash
+    )
+    return {
+        "plans": [plan.to_dict() for plan in plans],
+        "next_before": plans[-1].id if len(plans) == limit else None
+    }
+
+
+@app.get("/plans/history/{plan_id}")
+async def get_archived_plan(request: Request, plan_id: int, include_prompt: bool = False):
+    """
+    Get an archived plan with its response.
+
+    Args:
+        plan_id: ID from GET /plans/history
+        include_prompt: Include the prompt the plan was generated from
+
+    Returns:
+        The archived plan
+    """
+    archive = _archive(request)
+    plan = await request.app.state.generator.clients.run_blocking(archive.get, plan_id, include_prompt)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Archived plan not found")
+    return plan.to_dict()
+
+
+@app.get("/plans/{job_id}")
+async def get_plan_job(request: Request, job_id: str, include_prompt: bool = False):
+    """
+    Get a job's status, and its result once done.
+
+    Args:
+        job_id: ID returned by POST /plans
+        include_prompt: Include the prompt the plan was generated from
+
+    Returns:
+        The job, with response, timings and any error
+    """
+    job_queue = _job_queue(request)
+    job = await request.app.state.generator.clients.run_blocking(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict(include_prompt=include_prompt)
+
+
+@app.delete("/plans/{job_id}")
+async def cancel_plan_job(request: Request, job_id: str):
+    """
+    Cancel a queued or running job. A running generation is left to finish,
+    but its result is discarded.
+
+    Args:
+        job_id: ID returned by POST /plans
+
+    Returns:
+        The cancelled job
+    """
+    job_queue = _job_queue(request)
+    job = await request.app.state.generator.clients.run_blocking(job_queue.cancel, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status in FINISHED_STATES and job.status != CANCELLED:
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    return job.to_dict()
+
+
+@app.get("/stats")
+async def stats(request: Request):
+    """Cache, plan pool, LLM provider, job, plan archive and kitchen statistics."""
+    generator = request.app.state.generator
+    response_cache = generator.response_cache
+    plan_pool = request.app.state.plan_pool
+    provider_stats = generator.clients.provider_stats
+    job_queue = request.app.state.job_queue
+    archive = generator.archive
+    return {
+        "response_cache": response_cache.stats() if response_cache else None,
+        "prompt_cache": generator.prompt_cache.stats(),
+        "speculation": generator.speculation_stats() if generator.config.speculative_generation else None,
+        "shared_cache": await generator.clients.run_blocking(generator.shared_cache.stats),
+        "plan_pool": plan_pool.stats() if plan_pool else None,
+        "llm_providers": {name: stats.to_dict() for name, stats in provider_stats.items()},
+        "upstreams": generator.clients.upstream_stats(),
+        "context_cache": generator.clients.context_cache_stats(),
+        "jobs": job_queue.stats() if job_queue else None,
+        "plan_archive": await generator.clients.run_blocking(archive.stats) if archive else None,
+        "kitchens": request.app.state.tenants.stats()
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage latency histograms and counters in Prometheus text format."""
+    return PlainTextResponse(REGISTRY.render(), media_type='text/plain; version=0.0.4')
+
 
 @app.get("/")
 async def root():
@@ -53,6 +416,11 @@ async def root():
         "name": "Lunch Lady",
         "description": "Meal Planning Service",
         "endpoints": {
-            "/new": "Generate a new meal plan (HTML)"
+            "/new": "Generate a new meal plan (HTML, or ?format=md|json; ?kitchen= picks a kitchen; ?deadline= in seconds)",
+            "/new/stream": "Generate a new meal plan, streamed as it is written (HTML)",
+            "/plans": "POST to queue a meal plan job; GET or DELETE /plans/{id} to poll or cancel it",
+            "/plans/history": "Archived plans, newest first (GET /plans/history/{id} for one plan)",
+            "/stats": "Cache, plan pool, LLM provider and upstream statistics",
+            "/metrics": "Stage latencies and counters in Prometheus text format"
         }
     }
@@ -1,8 +1,16 @@
 """Gemini client for Lunch Lady."""
 
-from typing import Optional
-from google import genai
-from google.genai import types
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, ContextManager, Dict, Iterator, Optional, Tuple
+
+from context_cache import ContextCacheManager
+from deadline import DeadlineExceededError, time_left
+from metrics import RESPONSE_TOKENS, span
+from resilience import RETRYABLE_STATUSES, Upstream, parse_retry_after
+
+if TYPE_CHECKING:
+    from google import genai
+    from google.genai import types
 
 
 class GeminiClientError(Exception):
@@ -10,14 +18,44 @@ class GeminiClientError(Exception):
     pass
 
 
+def classify_gemini_error(error: Exception) -> Tuple[bool, Optional[float]]:
+    """
+    Decide whether a Gemini API error is worth retrying.
+
+    Returns:
+        Tuple of (retryable, retry_after_seconds).
+    """
+    import httpx
+    from google.genai import errors
+
+    if isinstance(error, errors.APIError):
+        headers = getattr(error.response, 'headers', None) or {}
+        retry_after = parse_retry_after(headers.get('retry-after'))
+        return error.code in RETRYABLE_STATUSES, retry_after
+
+    if isinstance(error, (httpx.TransportError, OSError)):
+        # Connection resets, timeouts and similar network failures
+        return True, None
+
+    return False, None
+
+
 class GeminiClient:
-    """Client for generating meal plans using Google Gemini."""
+    """Client for generating meal plans using Google Gemini.
+
+    The google-genai SDK is imported when it is first needed, so importing
+    this module stays cheap.
+    """
 
     def __init__(
         self,
         model: str,
         temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        client: Optional['genai.Client'] = None,
+        upstream: Optional[Upstream] = None,
+        context_cache: Optional[ContextCacheManager] = None,
+        response_schema: Optional[Dict[str, Any]] = None
     ):
         """
         Initialize the Gemini client.
@@ -26,18 +64,193 @@ class GeminiClient:
             model: Model name (e.g., "gemini-2.0-flash-exp", "gemini-1.5-pro")
             temperature: Sampling temperature (optional)
             max_tokens: Maximum tokens in response (optional)
+            client: Existing genai.Client to share (optional). A shared
+                client reuses its HTTP connection pool across calls.
+            upstream: Optional rate limiter, retry policy and circuit
+                breaker applied to every request
+            context_cache: Optional manager of server-side cached prompt
+                prefixes. Without one, the whole prompt is always sent.
+            response_schema: Optional JSON schema; responses are then JSON
+                objects matching it
         """
-        self.client = genai.Client()
+        if client is None:
+            from google import genai
+
+            client = genai.Client()
+        self.client = client
+        self.name = f'gemini:{model}'
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.upstream = upstream
+        self.context_cache = context_cache
+        self.response_schema = response_schema
+
+    def _call(self, func: Callable[..., Any], **kwargs) -> Any:
+        """Make a generate call through the upstream policy, if any."""
+        with span('gemini.generate'):
+            if self.upstream is None:
+                response = self._with_timeout(func)(**kwargs)
+            else:
+                response = self.upstream.call(self._with_timeout(func), **kwargs)
+
+        self._record_usage(response)
+        return response
+
+    async def _acall(self, func: Callable[..., Any], **kwargs) -> Any:
+        """Async version of _call()."""
+        with span('gemini.generate'):
+            if self.upstream is None:
+                response = await self._with_timeout(func)(**kwargs)
+            else:
+                response = await self.upstream.acall(self._with_timeout(func), **kwargs)
+
+        self._record_usage(response)
+        return response
+
+    @staticmethod
+    def _with_timeout(func: Callable[..., Any]) -> Callable[..., Any]:
+        """Wrap a generate call so each attempt times out when the request
+        deadline passes, instead of waiting on the API indefinitely."""
+        def call(**kwargs):
+            return func(**{**kwargs, 'config': GeminiClient._timeout_config(kwargs.get('config'))})
+
+        return call
+
+    @staticmethod
+    def _timeout_config(
+        config: Optional['types.GenerateContentConfig']
+    ) -> Optional['types.GenerateContentConfig']:
+        """Add the time left before the request deadline to a generation
+        config as its HTTP timeout."""
+        timeout = time_left()
+        if timeout is None:
+            return config
+
+        from google.genai import types
+
+        http_options = types.HttpOptions(timeout=max(1, int(timeout * 1000)))
+        if config is None:
+            return types.GenerateContentConfig(http_options=http_options)
+        return config.model_copy(update={'http_options': http_options})
+
+    def _record_usage(self, response) -> None:
+        """Count the response tokens Gemini reports for a call."""
+        usage = getattr(response, 'usage_metadata', None)
+        tokens = getattr(usage, 'candidates_token_count', None)
+        if tokens:
+            RESPONSE_TOKENS.inc(tokens, ('gemini',))
+
+    def _cache_name(self, prompt: str, prefix: Optional[str]) -> Optional[str]:
+        """Get the cached content name for a prompt's prefix, if it can be cached."""
+        if not self._can_cache(prompt, prefix):
+            return None
 
-    def generate_meal_plan(self, prompt: str) -> str:
+        with span('gemini.context_cache'):
+            return self.context_cache.get(self.model, prefix)
+
+    async def _acache_name(self, prompt: str, prefix: Optional[str]) -> Optional[str]:
+        """Async version of _cache_name()."""
+        if not self._can_cache(prompt, prefix):
+            return None
+
+        with span('gemini.context_cache'):
+            return await self.context_cache.aget(self.model, prefix)
+
+    def _admitted(self) -> ContextManager[None]:
+        """Apply the upstream rate limit and circuit breaker to a stream,
+        recording its outcome when it ends."""
+        if self.upstream is None:
+            return nullcontext()
+        return self.upstream.admitted()
+
+    def _build_generation_config(
+        self,
+        cached_content: Optional[str] = None
+    ) -> Optional['types.GenerateContentConfig']:
+        """Build the generation config from the optional parameters."""
+        from google.genai import types
+
+        config = {}
+        if self.temperature is not None:
+            config['temperature'] = self.temperature
+        if self.max_tokens is not None:
+            config['max_output_tokens'] = self.max_tokens
+        if cached_content is not None:
+            config['cached_content'] = cached_content
+        if self.response_schema is not None:
+            config['response_mime_type'] = 'application/json'
+            config['response_json_schema'] = self.response_schema
+
+        return types.GenerateContentConfig(**config) if config else None
+
+    def _can_cache(self, prompt: str, prefix: Optional[str]) -> bool:
+        """Check whether a prompt's prefix can be served from a context cache."""
+        return (
+            self.context_cache is not None
+            and bool(prefix)
+            and prompt.startswith(prefix)
+            and bool(prompt[len(prefix):].strip())
+        )
+
+    def _request(self, prompt: str, prefix: Optional[str], cached_content: Optional[str]) -> Dict[str, Any]:
+        """Build generate_content arguments, sending only the suffix when
+        the prefix is cached."""
+        return {
+            'model': self.model,
+            'contents': prompt[len(prefix):] if cached_content else prompt,
+            'config': self._build_generation_config(cached_content)
+        }
+
+    @staticmethod
+    def _is_cache_miss(error: Exception) -> bool:
+        """Check whether an error means the cached content no longer exists."""
+        from google.genai import errors
+
+        return isinstance(error, errors.ClientError) and error.code in (403, 404)
+
+    def generate_meal_plan(self, prompt: str, prefix: Optional[str] = None) -> str:
         """
         Generate a meal plan using the Gemini API.
 
         Args:
             prompt: The prompt text to send to Gemini
+            prefix: Static start of the prompt to serve from a context
+                cache, if context caching is enabled
+
+        Returns:
+            The generated meal plan text.
+
+        Raises:
+            GeminiClientError: If the API call fails
+        """
+        try:
+            cached_content = self._cache_name(prompt, prefix)
+            try:
+                response = self._call(self.client.models.generate_content, **self._request(prompt, prefix, cached_content))
+            except Exception as e:
+                if not cached_content or not self._is_cache_miss(e):
+                    raise
+                # The cache expired or was deleted; send the whole prompt
+                self.context_cache.invalidate(self.model, prefix)
+                response = self._call(self.client.models.generate_content, **self._request(prompt, prefix, None))
+
+            # Extract response text
+            return response.text
+
+        except DeadlineExceededError:
+            raise
+        except Exception as e:
+            raise GeminiClientError(f"Gemini API error: {e}")
+
+    async def agenerate_meal_plan(self, prompt: str, prefix: Optional[str] = None) -> str:
+        """
+        Generate a meal plan using the async Gemini API.
+
+        Args:
+            prompt: The prompt text to send to Gemini
+            prefix: Static start of the prompt to serve from a context
+                cache, if context caching is enabled
 
         Returns:
             The generated meal plan text.
@@ -46,24 +259,121 @@ class GeminiClient:
             GeminiClientError: If the API call fails
         """
         try:
-            # Build config parameters
-            config = {}
-            if self.temperature is not None:
-                config['temperature'] = self.temperature
-            if self.max_tokens is not None:
-                config['max_output_tokens'] = self.max_tokens
-
-            generation_config = types.GenerateContentConfig(**config) if config else None
-
-            # Make API call
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=prompt,
-                config=generation_config
-            )
+            cached_content = await self._acache_name(prompt, prefix)
+            try:
+                response = await self._acall(
+                    self.client.aio.models.generate_content,
+                    **self._request(prompt, prefix, cached_content)
+                )
+            except Exception as e:
+                if not cached_content or not self._is_cache_miss(e):
+                    raise
+                # The cache expired or was deleted; send the whole prompt
+                self.context_cache.invalidate(self.model, prefix)
+                response = await self._acall(
+                    self.client.aio.models.generate_content,
+                    **self._request(prompt, prefix, None)
+                )
 
             # Extract response text
             return response.text
 
+        except DeadlineExceededError:
+            raise
+        except Exception as e:
+            raise GeminiClientError(f"Gemini API error: {e}")
+
+    def stream_meal_plan(self, prompt: str, prefix: Optional[str] = None) -> Iterator[str]:
+        """
+        Generate a meal plan, yielding text chunks as they arrive.
+
+        Args:
+            prompt: The prompt text to send to Gemini
+            prefix: Static start of the prompt to serve from a context
+                cache, if context caching is enabled
+
+        Yields:
+            Chunks of the generated meal plan text.
+
+        Raises:
+            GeminiClientError: If the API call fails
+        """
+        try:
+            cached_content = self._cache_name(prompt, prefix)
+            started = False
+            try:
+                with self._admitted():
+                    stream = self._with_timeout(self.client.models.generate_content_stream)(
+                        **self._request(prompt, prefix, cached_content)
+                    )
+                    for chunk in stream:
+                        started = True
+                        if chunk.text:
+                            yield chunk.text
+                return
+            except Exception as e:
+                if started or not cached_content or not self._is_cache_miss(e):
+                    raise
+                # The cache expired or was deleted; send the whole prompt
+                self.context_cache.invalidate(self.model, prefix)
+
+            with self._admitted():
+                stream = self._with_timeout(self.client.models.generate_content_stream)(
+                    **self._request(prompt, prefix, None)
+                )
+                for chunk in stream:
+                    if chunk.text:
+                        yield chunk.text
+
+        except DeadlineExceededError:
+            raise
+        except Exception as e:
+            raise GeminiClientError(f"Gemini API error: {e}")
+
+    async def astream_meal_plan(self, prompt: str, prefix: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Generate a meal plan with the async API, yielding text chunks as
+        they arrive.
+
+        Args:
+            prompt: The prompt text to send to Gemini
+            prefix: Static start of the prompt to serve from a context
+                cache, if context caching is enabled
+
+        Yields:
+            Chunks of the generated meal plan text.
+
+        Raises:
+            GeminiClientError: If the API call fails
+        """
+        try:
+            cached_content = await self._acache_name(prompt, prefix)
+            started = False
+            try:
+                with self._admitted():
+                    stream = await self._with_timeout(self.client.aio.models.generate_content_stream)(
+                        **self._request(prompt, prefix, cached_content)
+                    )
+                    async for chunk in stream:
+                        started = True
+                        if chunk.text:
+                            yield chunk.text
+                return
+            except Exception as e:
+                if started or not cached_content or not self._is_cache_miss(e):
+                    raise
+                # The cache expired or was deleted; send the whole prompt
+                self.context_cache.invalidate(self.model, prefix)
+
+            with self._admitted():
+                stream = await self._with_timeout(self.client.aio.models.generate_content_stream)(
+                    **self._request(prompt, prefix, None)
+                )
+                async for chunk in stream:
+                    if chunk.text:
+                        yield chunk.text
+
+        except DeadlineExceededError:
+            raise
         except Exception as e:
             raise GeminiClientError(f"Gemini API error: {e}")
@@ -0,0 +1,440 @@
+"""Durable background job queue for meal plan generation in Lunch Lady."""
+
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from meal_plan_generator import MealPlanGenerator
+from metrics import collect_timings
+
+
+class JobQueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+    pass
+
+
+# Job states. Jobs move queued -> running -> done/failed; queued and running
+# jobs can be cancelled.
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    output_format TEXT NOT NULL,
+    no_cache INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    owner TEXT,
+    prompt TEXT,
+    response TEXT,
+    plan_json TEXT,
+    cached INTEGER,
+    error TEXT,
+    timings TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+'''
+
+
+@dataclass
+class Job:
+    """A queued, running or finished meal plan generation."""
+    id: str
+    status: str
+    output_format: str
+    no_cache: bool
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    owner: Optional[str] = None  # host:pid of the process running it
+    prompt: Optional[str] = None
+    response: Optional[str] = None
+    plan_json: Optional[str] = None
+    cached: Optional[bool] = None
+    error: Optional[str] = None
+    timings: Optional[Dict[str, float]] = None  # Seconds per generation stage
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> 'Job':
+        """Create a Job from a jobs table row."""
+        data = dict(row)
+        data['no_cache'] = bool(data['no_cache'])
+        if data['cached'] is not None:
+            data['cached'] = bool(data['cached'])
+        if data['timings']:
+            data['timings'] = json.loads(data['timings'])
+        return cls(**data)
+
+    def to_dict(self, include_prompt: bool = False) -> Dict:
+        """
+        Convert to a JSON-serializable dictionary for API responses.
+
+        Args:
+            include_prompt: Include the (large) prompt text
+        """
+        data = asdict(self)
+        if not include_prompt:
+            data.pop('prompt')
+        data.pop('owner')
+        data['queue_seconds'] = self.started_at - self.created_at if self.started_at else None
+        data['run_seconds'] = self.finished_at - self.started_at if self.finished_at and self.started_at else None
+        return data
+
+
+class JobStore:
+    """SQLite table of jobs, shared safely by threads and processes.
+
+    Claiming a job is a single conditional UPDATE, so several worker
+    threads (or server processes on the same file) never run the same job
+    twice. Results are only written while the job is still ``running``, so
+    a job cancelled mid-generation stays cancelled.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Open or create the job database.
+
+        Args:
+            path: SQLite file to use
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._db.close()
+
+    def create(self, output_format: str, no_cache: bool, max_queued: int) -> Job:
+        """
+        Add a queued job.
+
+        Args:
+            output_format: Output format to generate
+            no_cache: Skip the response cache lookup
+            max_queued: Queued jobs allowed before refusing new ones
+
+        Returns:
+            The new job.
+
+        Raises:
+            JobQueueFullError: If max_queued jobs are already waiting
+        """
+        job = Job(uuid.uuid4().hex, QUEUED, output_format, no_cache, time.time())
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                queued = self._db.execute('SELECT COUNT(*) FROM jobs WHERE status = ?', (QUEUED,)).fetchone()[0]
+                if queued >= max_queued:
+                    raise JobQueueFullError(f"Job queue is full ({queued} jobs waiting)")
+                self._db.execute(
+                    'INSERT INTO jobs (id, status, output_format, no_cache, created_at) VALUES (?, ?, ?, ?, ?)',
+                    (job.id, job.status, job.output_format, int(job.no_cache), job.created_at)
+                )
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Get a job by ID, or None if there is none."""
+        with self._lock:
+            row = self._db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+    def claim(self, owner: str) -> Optional[Job]:
+        """
+        Mark the oldest queued job as running.
+
+        Args:
+            owner: host:pid of the claiming process
+
+        Returns:
+            The claimed job, or None if the queue is empty.
+        """
+        with self._lock:
+            row = self._db.execute(
+                'UPDATE jobs SET status = ?, started_at = ?, owner = ? '
+                'WHERE id = (SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1) AND status = ? '
+                'RETURNING *',
+                (RUNNING, time.time(), owner, QUEUED, QUEUED)
+            ).fetchone()
+        return Job.from_row(row) if row else None
+
+    def finish(
+        self,
+        job_id: str,
+        response: Optional[str] = None,
+        prompt: Optional[str] = None,
+        plan_json: Optional[str] = None,
+        cached: Optional[bool] = None,
+        error: Optional[str] = None,
+        timings: Optional[Dict[str, float]] = None
+    ) -> bool:
+        """
+        Record the outcome of a running job.
+
+        Returns:
+            False if the job was cancelled (or otherwise finished) meanwhile.
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                'UPDATE jobs SET status = ?, finished_at = ?, response = ?, prompt = ?, plan_json = ?, '
+                'cached = ?, error = ?, timings = ? WHERE id = ? AND status = ?',
+                (
+                    FAILED if error is not None else DONE,
+                    time.time(),
+                    response,
+                    prompt,
+                    plan_json,
+                    None if cached is None else int(cached),
+                    error,
+                    json.dumps(timings) if timings else None,
+                    job_id,
+                    RUNNING
+                )
+            )
+        return cursor.rowcount == 1
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancel a queued or running job. A running generation still
+        finishes, but its result is discarded.
+
+        Returns:
+            The job after the attempt (unchanged if it had already
+            finished), or None if there is no such job.
+        """
+        with self._lock:
+            self._db.execute(
+                'UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)',
+                (CANCELLED, time.time(), job_id, QUEUED, RUNNING)
+            )
+        return self.get(job_id)
+
+    def requeue_orphans(self, is_alive) -> int:
+        """
+        Put running jobs whose owning process is gone back in the queue.
+
+        Args:
+            is_alive: Callable taking an owner string, True if that process
+                is still running
+
+        Returns:
+            Number of jobs requeued.
+        """
+        with self._lock:
+            rows = self._db.execute('SELECT id, owner FROM jobs WHERE status = ?', (RUNNING,)).fetchall()
+            orphans = [row['id'] for row in rows if not is_alive(row['owner'])]
+            for job_id in orphans:
+                self._db.execute(
+                    'UPDATE jobs SET status = ?, started_at = NULL, owner = NULL WHERE id = ? AND status = ?',
+                    (QUEUED, job_id, RUNNING)
+                )
+        return len(orphans)
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs in each state."""
+        with self._lock:
+            rows = self._db.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return {status: count for status, count in rows}
+
+
+def _process_alive(owner: Optional[str]) -> bool:
+    """Check whether the host:pid owner of a running job is still alive."""
+    if not owner:
+        return False
+
+    host, _, pid = owner.rpartition(':')
+    if host != socket.gethostname():
+        # Can't check another host's processes; assume it is still working
+        return True
+
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        return True
+    return True
+
+
+class JobQueue:
+    """Runs queued meal plan jobs on a pool of worker threads.
+
+    Jobs live in a JobStore, so they survive restarts: on start, jobs left
+    ``running`` by a process that no longer exists are queued again. The
+    pool is separate from the web server's workers and the blocking
+    executor, so long generations never tie up request handling. Workers
+    are woken by submit() and also poll the store, which picks up jobs
+    submitted by other processes sharing the database.
+    """
+
+    def __init__(
+        self,
+        generator: MealPlanGenerator,
+        store: JobStore,
+        workers: int = 2,
+        max_queued: int = 100,
+        poll_interval: float = 1.0
+    ):
+        """
+        Initialize the queue.
+
+        Args:
+            generator: Generator used to run jobs
+            store: Job storage
+            workers: Number of worker threads
+            max_queued: Waiting jobs allowed before submit() refuses more
+            poll_interval: Seconds idle workers wait between store checks
+        """
+        self.generator = generator
+        self.store = store
+        self.workers = workers
+        self.max_queued = max_queued
+        self.poll_interval = poll_interval
+        self.owner = f'{socket.gethostname()}:{os.getpid()}'
+        self._wake = threading.Condition()
+        self._stopping = False
+        # Set when stop() gave up waiting; late workers then leave their
+        # jobs running, to be requeued, instead of writing to the store
+        self._abandoned = False
+        self._threads: List[threading.Thread] = []
+        self.last_error: Optional[str] = None
+
+    def start(self) -> None:
+        """Requeue orphaned jobs and start the worker threads."""
+        self.store.requeue_orphans(_process_alive)
+        self._stopping = False
+        self._abandoned = False
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'lunchlady-job-{number}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        """
+        Stop the workers after their current jobs.
+
+        Args:
+            timeout: Seconds to wait for the workers. Jobs still running
+                afterwards are left unfinished in the store and requeued on
+                the next start.
+
+        Returns:
+            True if every worker exited; only then may the store and the
+            generator's resources be closed.
+        """
+        with self._wake:
+            self._stopping = True
+            self._wake.notify_all()
+
+        end = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if end is None else max(0.0, end - time.monotonic()))
+        stopped = not any(thread.is_alive() for thread in self._threads)
+        if not stopped:
+            self._abandoned = True
+        self._threads = []
+        return stopped
+
+    def submit(self, output_format: str, no_cache: bool = False) -> Job:
+        """
+        Queue a generation job.
+
+        Args:
+            output_format: Output format to generate
+            no_cache: Skip the response cache lookup
+
+        Returns:
+            The queued job.
+
+        Raises:
+            JobQueueFullError: If the queue is at capacity
+        """
+        job = self.store.create(output_format, no_cache, self.max_queued)
+        with self._wake:
+            self._wake.notify()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Get a job by ID, or None if there is none."""
+        return self.store.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a job; see JobStore.cancel()."""
+        return self.store.cancel(job_id)
+
+    def stats(self) -> Dict:
+        """Get job counts by state and the pool size."""
+        return {
+            'workers': self.workers,
+            'max_queued': self.max_queued,
+            'jobs': self.store.counts(),
+            'last_error': self.last_error
+        }
+
+    def _work(self) -> None:
+        """Worker loop: claim and run jobs until stopped."""
+        while not self._stopping:
+            job = self.store.claim(self.owner)
+            if job is None:
+                with self._wake:
+                    if not self._stopping:
+                        self._wake.wait(self.poll_interval)
+                continue
+
+            try:
+                self._run(job)
+            except Exception as e:
+                # The job stays running and is requeued on the next start
+                self.last_error = f"Job {job.id}: {type(e).__name__}: {e}"
+                print(f"Could not record the outcome of job {job.id}: {e}", file=sys.stderr)
+
+    def _run(self, job: Job) -> None:
+        """Run one job and store its outcome."""
+        with collect_timings() as timings:
+            try:
+                result = self.generator.generate(output_format=job.output_format, no_cache=job.no_cache)
+            except Exception as e:
+                self._finish(job, error=f'{type(e).__name__}: {e}', timings=timings.totals())
+                return
+
+        self._finish(
+            job,
+            response=result.response,
+            prompt=result.prompt,
+            plan_json=result.plan_json,
+            cached=result.cached,
+            timings=timings.totals()
+        )
+
+    def _finish(self, job: Job, **outcome) -> None:
+        """Store a job's outcome, unless stop() gave up on this worker:
+        the store or the generator may be closed by then, so the outcome
+        can't be trusted and the job is left to be requeued."""
+        if not self._abandoned:
+            self.store.finish(job.id, **outcome)
@@ -0,0 +1,400 @@
+"""LLM provider layer with hedged requests and failover for Lunch Lady."""
+
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Protocol
+
+from deadline import DeadlineExceededError, deadline_at, deadline_error, deadline_passed
+
+
+class LLMProviderError(Exception):
+    """Raised when every configured LLM provider failed."""
+    pass
+
+
+class LLMProvider(Protocol):
+    """Interface shared by GeminiClient, OpenAIClient and test fakes.
+
+    ``prefix``, when given, is the static start of ``prompt`` that repeats
+    across requests; providers may cache it server-side.
+    """
+
+    name: str
+
+    def generate_meal_plan(self, prompt: str, prefix: Optional[str] = None) -> str:
+        ...
+
+    async def agenerate_meal_plan(self, prompt: str, prefix: Optional[str] = None) -> str:
+        ...
+
+    def stream_meal_plan(self, prompt: str, prefix: Optional[str] = None) -> Iterator[str]:
+        ...
+
+    def astream_meal_plan(self, prompt: str, prefix: Optional[str] = None) -> AsyncIterator[str]:
+        ...
+
+
+class ProviderStats:
+    """Latency histogram and win/loss counts for one provider.
+
+    Latencies of the most recent successful calls are kept in a bounded
+    window, which both feeds the hedge delay and is reported as bucketed
+    counts.
+    """
+
+    BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+    def __init__(self, window: int = 200):
+        """
+        Initialize empty stats.
+
+        Args:
+            window: Number of recent latencies kept for percentiles
+        """
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.buckets = [0] * (len(self.BUCKETS) + 1)
+        self.calls = 0
+        self.wins = 0
+        self.losses = 0
+        self.errors = 0
+
+    def record_latency(self, seconds: float) -> None:
+        """Record the latency of a successful call."""
+        with self._lock:
+            self._latencies.append(seconds)
+            self.calls += 1
+            for index, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    self.buckets[index] += 1
+                    break
+            else:
+                self.buckets[-1] += 1
+
+    def record_error(self) -> None:
+        """Record a failed call."""
+        with self._lock:
+            self.errors += 1
+
+    def record_win(self) -> None:
+        """Record a hedged race won by this provider."""
+        with self._lock:
+            self.wins += 1
+
+    def record_loss(self) -> None:
+        """Record a hedged race lost (or abandoned) by this provider."""
+        with self._lock:
+            self.losses += 1
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """
+        Get a latency percentile over the recent window.
+
+        Args:
+            fraction: Percentile as a fraction (e.g. 0.95)
+
+        Returns:
+            Latency in seconds, or None if there are no samples yet.
+        """
+        with self._lock:
+            samples = sorted(self._latencies)
+
+        if not samples:
+            return None
+
+        index = min(len(samples) - 1, int(fraction * len(samples)))
+        return samples[index]
+
+    def to_dict(self) -> Dict:
+        """Summarize the stats."""
+        labels = [f'le_{bound}' for bound in self.BUCKETS] + ['le_inf']
+        return {
+            'calls': self.calls,
+            'wins': self.wins,
+            'losses': self.losses,
+            'errors': self.errors,
+            'p50_seconds': self.percentile(0.5),
+            'p95_seconds': self.percentile(0.95),
+            'histogram': dict(zip(labels, self.buckets))
+        }
+
+
+class HedgedProvider:
+    """Runs a prompt against an ordered list of providers.
+
+    The first provider is the primary. If it hasn't answered within the
+    hedge delay (its recent latency percentile, or ``initial_delay`` until
+    enough samples exist), the next provider is started as well and
+    whichever finishes first wins. If a provider fails, the next one is
+    started immediately. Streams fail over only before the first chunk.
+
+    Calls give up at ``timeout`` or the request deadline, whichever comes
+    first.
+    """
+
+    MIN_SAMPLES = 20
+
+    def __init__(
+        self,
+        providers: List[LLMProvider],
+        stats: Dict[str, ProviderStats],
+        percentile: float = 0.95,
+        initial_delay: float = 10.0,
+        timeout: Optional[float] = None,
+        executor: Optional[ThreadPoolExecutor] = None
+    ):
+        """
+        Initialize the hedged provider.
+
+        Args:
+            providers: Providers in priority order
+            stats: Shared stats by provider name; missing entries are added
+            percentile: Primary latency percentile used as hedge delay
+            initial_delay: Hedge delay used until enough samples exist
+            timeout: Give up on all providers after this many seconds
+            executor: Thread pool for sync calls. One is created if not
+                given, and shut down by close().
+        """
+        self.providers = providers
+        self.stats = stats
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.timeout = timeout
+        self._owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(thread_name_prefix='lunchlady-hedge')
+        for provider in providers:
+            stats.setdefault(provider.name, ProviderStats())
+
+    def close(self) -> None:
+        """Shut down the thread pool if this provider created it. Losing
+        calls still running finish in the background."""
+        if self._owns_executor:
+            self.executor.shutdown(wait=False)
+
+    @property
+    def name(self) -> str:
+        """Name listing the providers in priority order."""
+        return '+'.join(provider.name for provider in self.providers)
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the primary before starting a backup."""
+        primary = self.stats[self.providers[0].name]
+        if primary.calls < self.MIN_SAMPLES:
+            return self.initial_delay
+
+        return primary.percentile(self.percentile)
+
+    def generate_meal_plan(self, prompt: str, prefix: Optional[str] = None) -> str:
+        """
+        Generate a meal plan with hedging and failover.
+
+        Raises:
+            LLMProviderError: If every provider failed or the timeout passed
+            DeadlineExceededError: If the request deadline passed
+        """
+        deadline = self._deadline()
+        queue = list(self.providers)
+        pending = {}
+        errors = []
+
+        def launch():
+            provider = queue.pop(0)
+            # Carry the request deadline over to the pool thread
+            context = contextvars.copy_context()
+            future = self.executor.submit(context.run, self._timed_call, provider, prompt, prefix)
+            pending[future] = provider
+
+        launch()
+        while pending:
+            wait_for = self._next_wait(bool(queue), deadline)
+            done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            if not done:
+                if deadline and time.monotonic() >= deadline:
+                    break
+                if queue:
+                    launch()
+                continue
+
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    errors.append(f"{provider.name}: {e}")
+                    if queue:
+                        launch()
+                    continue
+
+                self._record_win(provider, pending.values())
+                return response
+
+        self._record_losses(pending.values())
+        if deadline_passed():
+            raise deadline_error('llm')
+        raise LLMProviderError(self._failure_message(errors, deadline))
+
+    async def agenerate_meal_plan(self, prompt: str, prefix: Optional[str] = None) -> str:
+        """
+        Async version of generate_meal_plan(). Losing requests are cancelled.
+
+        Raises:
+            LLMProviderError: If every provider failed or the timeout passed
+            DeadlineExceededError: If the request deadline passed
+        """
+        deadline = self._deadline()
+        queue = list(self.providers)
+        pending = {}
+        errors = []
+
+        def launch():
+            provider = queue.pop(0)
+            task = asyncio.ensure_future(self._atimed_call(provider, prompt, prefix))
+            pending[task] = provider
+
+        launch()
+        try:
+            while pending:
+                wait_for = self._next_wait(bool(queue), deadline)
+                done, _ = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    if deadline and time.monotonic() >= deadline:
+                        break
+                    if queue:
+                        launch()
+                    continue
+
+                for task in done:
+                    provider = pending.pop(task)
+                    try:
+                        response = task.result()
+                    except Exception as e:
+                        errors.append(f"{provider.name}: {e}")
+                        if queue:
+                            launch()
+                        continue
+
+                    self._record_win(provider, pending.values())
+                    return response
+
+            self._record_losses(pending.values())
+            if deadline_passed():
+                raise deadline_error('llm')
+            raise LLMProviderError(self._failure_message(errors, deadline))
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stream_meal_plan(self, prompt: str, prefix: Optional[str] = None) -> Iterator[str]:
+        """
+        Stream from the first provider that produces a chunk.
+
+        Raises:
+            LLMProviderError: If every provider failed before streaming
+        """
+        errors = []
+        for provider in self.providers:
+            chunks = provider.stream_meal_plan(prompt, prefix=prefix)
+            try:
+                first_chunk = next(chunks, '')
+            except Exception as e:
+                self.stats[provider.name].record_error()
+                errors.append(f"{provider.name}: {e}")
+                continue
+
+            yield first_chunk
+            yield from chunks
+            return
+
+        raise LLMProviderError(self._failure_message(errors, None))
+
+    async def astream_meal_plan(self, prompt: str, prefix: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Async version of stream_meal_plan().
+
+        Raises:
+            LLMProviderError: If every provider failed before streaming
+        """
+        errors = []
+        for provider in self.providers:
+            chunks = provider.astream_meal_plan(prompt, prefix=prefix)
+            try:
+                first_chunk = await anext(chunks, '')
+            except Exception as e:
+                self.stats[provider.name].record_error()
+                errors.append(f"{provider.name}: {e}")
+                continue
+
+            yield first_chunk
+            async for chunk in chunks:
+                yield chunk
+            return
+
+        raise LLMProviderError(self._failure_message(errors, None))
+
+    def _deadline(self) -> Optional[float]:
+        """Monotonic time to give up at, from the timeout and the request
+        deadline, or None for no limit."""
+        limits = [limit for limit in (deadline_at(),) if limit is not None]
+        if self.timeout:
+            limits.append(time.monotonic() + self.timeout)
+        return min(limits) if limits else None
+
+    def _next_wait(self, can_hedge: bool, deadline: Optional[float]) -> Optional[float]:
+        """Seconds to wait before hedging or giving up, None for no limit."""
+        waits = []
+        if can_hedge:
+            waits.append(self.hedge_delay())
+        if deadline:
+            waits.append(max(0.0, deadline - time.monotonic()))
+
+        return min(waits) if waits else None
+
+    def _timed_call(self, provider: LLMProvider, prompt: str, prefix: Optional[str]) -> str:
+        """Call a provider, recording its latency or error."""
+        start = time.perf_counter()
+        try:
+            response = provider.generate_meal_plan(prompt, prefix=prefix)
+        except DeadlineExceededError:
+            raise
+        except Exception:
+            self.stats[provider.name].record_error()
+            raise
+
+        self.stats[provider.name].record_latency(time.perf_counter() - start)
+        return response
+
+    async def _atimed_call(self, provider: LLMProvider, prompt: str, prefix: Optional[str]) -> str:
+        """Async version of _timed_call()."""
+        start = time.perf_counter()
+        try:
+            response = await provider.agenerate_meal_plan(prompt, prefix=prefix)
+        except (asyncio.CancelledError, DeadlineExceededError):
+            raise
+        except Exception:
+            self.stats[provider.name].record_error()
+            raise
+
+        self.stats[provider.name].record_latency(time.perf_counter() - start)
+        return response
+
+    def _record_win(self, winner: LLMProvider, losers) -> None:
+        """Count a win for the provider that answered first."""
+        self.stats[winner.name].record_win()
+        self._record_losses(losers)
+
+    def _record_losses(self, losers) -> None:
+        """Count a loss for providers that were still running."""
+        for provider in losers:
+            self.stats[provider.name].record_loss()
+
+    def _failure_message(self, errors: List[str], deadline: Optional[float]) -> str:
+        """Describe why no provider produced a response."""
+        if deadline and time.monotonic() >= deadline:
+            errors = errors + [f"timed out after {self.timeout}s"]
+        return "All LLM providers failed: " + '; '.join(errors)
@@ -2,13 +2,29 @@
 """Lunch Lady - Meal Planning CLI App."""
 
 import argparse
+import contextvars
+import json
+import statistics
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Dict, Iterable, List, Optional
 
+from clients import ClientRegistry
 from config import Config, ConfigError
 from sheets_client import SheetsClientError
 from gemini_client import GeminiClientError
-from meal_plan_generator import MealPlanGenerator
+from llm_providers import LLMProviderError
+from openai_client import OpenAIClientError
+from deadline import DeadlineExceededError, request_deadline
+from daemon import DaemonClient, DaemonError, default_socket_path, run_daemon
+from meal_plan_generator import GenerationResult, MealPlanGenerator
+from metrics import StageTimings, collect_timings
+from plan_archive import PlanArchive, parse_time
+from plan_renderer import PlanRenderError
+from prompt_builder import BuiltPrompt, TokenReport
+from tenants import TenantError, TenantStore
 
 
 # Get script directory
@@ -53,11 +69,408 @@ def log(msg):
     print(msg, file=sys.stderr)
 
 
+def positive_int(value: str) -> int:
+    """Parse a command line value that must be a whole number above zero."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def write_prompt(path: Path, prompt: str, token_report: Optional[TokenReport] = None) -> None:
+    """Write a prompt to a file, with its token report appended as an HTML
+    comment."""
+    if token_report:
+        prompt = f"{prompt}\n<!--\n{token_report.format()}\n-->\n"
+    path.write_text(prompt)
+
+
+def save_prompt(prompt: str, token_report: Optional[TokenReport] = None) -> None:
+    """Save the assembled prompt and its token report to last-prompt.md."""
+    write_prompt(SCRIPT_DIR / 'last-prompt.md', prompt, token_report)
+    log("✓ Saved to last-prompt.md")
+
+
+def save_response(response: str, output_format: str) -> None:
+    """Save the response to last-response.{format}."""
+    response_file = SCRIPT_DIR / f'last-response.{output_format}'
+    response_file.write_text(response)
+    log(f"✓ Saved to last-response.{output_format}\n")
+
+
+def log_config(model: str, providers: List[str]) -> None:
+    """Print the model and LLM providers in use."""
+    log(f"✓ Using model: {model}")
+    if len(providers) > 1:
+        log(f"✓ LLM providers: {', '.join(providers)}")
+    log("")
+
+
+def stream_meal_plan(
+    generator: MealPlanGenerator,
+    output_format: str,
+    refresh_sheets: bool,
+    deadline: Optional[float] = None
+) -> None:
+    """Generate a meal plan, writing tokens to stdout as they arrive."""
+    with request_deadline(generator.budget(deadline)):
+        prompt = generator.build_prompt(output_format, refresh_sheets, structured=False)
+        write_stream(prompt.text, prompt.token_report, generator.stream(prompt), output_format)
+
+
+def write_stream(
+    prompt: str,
+    token_report: Optional[TokenReport],
+    chunks: Iterable[str],
+    output_format: str
+) -> None:
+    """Save the prompt, then write response chunks to stdout as they arrive."""
+    log(f"✓ Prompt assembled ({len(prompt)} characters, {token_report.summary()})")
+    save_prompt(prompt, token_report)
+
+    log("\n🤖 Streaming response...")
+    log("=" * 60 + "\n")
+
+    start = time.perf_counter()
+    first_token = None
+    received = []
+
+    for chunk in chunks:
+        if first_token is None:
+            first_token = time.perf_counter() - start
+        received.append(chunk)
+        sys.stdout.write(chunk)
+        sys.stdout.flush()
+
+    print()
+    total = time.perf_counter() - start
+
+    log("\n" + "=" * 60)
+    if first_token is not None:
+        log(f"✓ First token after {first_token:.2f}s, complete after {total:.2f}s")
+    save_response(''.join(received), output_format)
+
+
+def report_result(result: GenerationResult, cache_stats: Optional[Dict]) -> None:
+    """Save the prompt and response of a generation and print the response."""
+    log(f"✓ Prompt assembled ({len(result.prompt)} characters, {result.token_report.summary()})")
+
+    # Save prompt to file
+    save_prompt(result.prompt, result.token_report)
+
+    if result.cached:
+        log("\n♻️  Response served from cache")
+    else:
+        log(f"\n🤖 Response received")
+
+    if cache_stats:
+        log(f"✓ Response cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+
+    # Save response to file, and the structured plan it came from
+    save_response(result.response, result.output_format)
+    if result.plan_json and result.output_format != 'json':
+        save_response(result.plan_json, 'json')
+
+    if result.archive_id is not None:
+        log(f"✓ Archived as plan #{result.archive_id} (lunchlady history --show {result.archive_id})")
+
+    log("=" * 60 + "\n")
+
+    # Print response to stdout
+    print(result.response)
+
+
+def run_with_daemon(args) -> bool:
+    """
+    Hand a single or streamed run to the warm daemon, if one is running.
+
+    Returns:
+        True if the daemon handled the run, False to run in-process.
+
+    Raises:
+        Exception: Errors raised by the daemon, re-raised under their own type
+    """
+    client = DaemonClient(Path(args.socket))
+    sock = client.connect()
+    if sock is None:
+        return False
+
+    messages = client.request(sock, {
+        'env_file': str(Path(args.env_file).resolve()),
+        'kitchen': args.kitchen,
+        'output': args.output,
+        'refresh_sheets': args.refresh_sheets,
+        'no_cache': args.no_cache,
+        'stream': args.stream,
+        'deadline': args.deadline
+    })
+
+    accepted = next(messages)
+    if accepted['type'] != 'accepted':
+        log(f"⚠️  Daemon not used ({accepted.get('reason', accepted['type'])}); running in-process\n")
+        return False
+
+    log(f"⚡ Using warm daemon at {args.socket}")
+    if args.kitchen:
+        log(f"✓ Kitchen: {args.kitchen}")
+    log_config(accepted['model'], accepted['providers'])
+    log("🔨 Generating meal plan...")
+
+    if args.stream:
+        prompt = next(messages)
+        report = prompt['token_report']
+        token_report = TokenReport.from_dict(report) if report else None
+        # Keep the closing message, which carries the daemon's timings
+        final = {}
+
+        def chunks():
+            for message in messages:
+                if message['type'] == 'chunk':
+                    yield message['text']
+                else:
+                    final.update(message)
+
+        write_stream(prompt['text'], token_report, chunks(), args.output)
+    else:
+        final = next(messages)
+        report_result(GenerationResult.from_dict(final['result']), final['cache_stats'])
+
+    if args.timings and final.get('timings'):
+        log("\n⏱️  Timings (daemon):")
+        log(final['timings'])
+
+    return True
+
+
+def print_timings(timings: StageTimings) -> None:
+    """Print the per-stage time breakdown collected for --timings."""
+    log("\n⏱️  Timings:")
+    log(timings.format() or "(no stages recorded)")
+
+
+def read_user_inputs(path: str) -> list:
+    """Read user_input overrides, one per non-empty line."""
+    lines = Path(path).read_text().splitlines()
+    return [line.strip() for line in lines if line.strip()]
+
+
+def run_batch(generator: MealPlanGenerator, args) -> bool:
+    """
+    Generate many meal plans with bounded concurrency.
+
+    The sheets are loaded and each prompt is built once; then --count plans
+    per prompt are generated with up to --concurrency LLM calls in flight.
+
+    Returns:
+        True if every generation succeeded.
+    """
+    user_inputs = read_user_inputs(args.inputs) if args.inputs else [None]
+    prompts = generator.build_prompts(args.output, user_inputs, args.refresh_sheets)
+
+    if len(prompts) == 1:
+        save_prompt(prompts[0].text, prompts[0].token_report)
+    else:
+        for number, prompt in enumerate(prompts, 1):
+            write_prompt(SCRIPT_DIR / f'last-prompt-{number}.md', prompt.text, prompt.token_report)
+        log(f"✓ Saved {len(prompts)} prompts to last-prompt-*.md")
+
+    jobs = [
+        (user_input, prompt)
+        for user_input, prompt in zip(user_inputs, prompts)
+        for _ in range(args.count)
+    ]
+    log(f"\n🤖 Generating {len(jobs)} meal plans, {args.concurrency} at a time...")
+
+    def run_job(prompt: BuiltPrompt):
+        start = time.perf_counter()
+        result = generator.complete(prompt, args.output, no_cache=args.no_cache, deadline=args.deadline)
+        return result, time.perf_counter() - start
+
+    results = [None] * len(jobs)
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        # Each job runs in a copy of this context so --timings sees its stages
+        futures = {
+            executor.submit(contextvars.copy_context().run, run_job, prompt): index
+            for index, (_, prompt) in enumerate(jobs)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                result, latency = future.result()
+                results[index] = {'result': result, 'latency': latency}
+                log(f"✓ Plan {index + 1} done in {latency:.2f}s")
+            except Exception as e:
+                results[index] = {'error': str(e)}
+                log(f"❌ Plan {index + 1} failed: {e}")
+
+    elapsed = time.perf_counter() - start
+
+    if args.results:
+        with open(args.results, 'w') as f:
+            for index, ((user_input, _), outcome) in enumerate(zip(jobs, results), 1):
+                record = {'index': index, 'user_input': user_input}
+                if 'error' in outcome:
+                    record['error'] = outcome['error']
+                else:
+                    record['latency_seconds'] = round(outcome['latency'], 3)
+                    record['cached'] = outcome['result'].cached
+                    record['response'] = outcome['result'].response
+                f.write(json.dumps(record) + '\n')
+        log(f"✓ Saved results to {args.results}")
+    else:
+        for index, outcome in enumerate(results, 1):
+            if 'result' in outcome:
+                response_file = SCRIPT_DIR / f'last-response-{index}.{args.output}'
+                response_file.write_text(outcome['result'].response)
+        log(f"✓ Saved responses to last-response-*.{args.output}")
+
+    latencies = sorted(outcome['latency'] for outcome in results if 'latency' in outcome)
+    failures = len(results) - len(latencies)
+
+    log("\n" + "=" * 60)
+    log(f"Plans: {len(latencies)} succeeded, {failures} failed in {elapsed:.2f}s")
+    log(f"Throughput: {len(latencies) / elapsed * 60:.1f} plans/minute")
+    if latencies:
+        p95 = latencies[max(0, int(len(latencies) * 0.95 + 0.5) - 1)]
+        log(
+            f"Latency: min {latencies[0]:.2f}s, median {statistics.median(latencies):.2f}s, "
+            f"p95 {p95:.2f}s, max {latencies[-1]:.2f}s"
+        )
+
+    return failures == 0
+
+
+def run_history(argv) -> None:
+    """
+    Run ``lunchlady history``: list archived plans, or print one.
+
+    Args:
+        argv: Command line arguments after 'history'
+    """
+    parser = argparse.ArgumentParser(
+        prog='lunchlady history',
+        description='List archived meal plans, newest first, or print one of them'
+    )
+    parser.add_argument(
+        '--env-file',
+        default='.env',
+        help='Path to .env file (default: .env)'
+    )
+    parser.add_argument(
+        '--show',
+        type=int,
+        metavar='ID',
+        help='Print the archived plan with this ID to stdout'
+    )
+    parser.add_argument(
+        '--prompt',
+        action='store_true',
+        help='With --show, print the prompt instead of the plan'
+    )
+    parser.add_argument(
+        '--limit',
+        type=int,
+        default=20,
+        help='Number of plans to list (default: 20)'
+    )
+    parser.add_argument(
+        '--before',
+        type=int,
+        metavar='ID',
+        help='Only list plans older than this ID (for paging)'
+    )
+    parser.add_argument(
+        '--since',
+        help='Only list plans created at or after this time (ISO date/time or Unix time)'
+    )
+    parser.add_argument(
+        '--until',
+        help='Only list plans created before this time (ISO date/time or Unix time)'
+    )
+    parser.add_argument(
+        '--format',
+        help='Only list plans in this output format'
+    )
+    parser.add_argument(
+        '--hash',
+        help='Only list plans whose prompt or sheet snapshot hash starts with this'
+    )
+    parser.add_argument(
+        '--json',
+        action='store_true',
+        help='List plans as JSON lines'
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        config = Config(env_file=args.env_file)
+        since = parse_time(args.since) if args.since else None
+        until = parse_time(args.until) if args.until else None
+    except (ConfigError, ValueError) as e:
+        log(f"❌ {e}")
+        sys.exit(1)
+
+    archive = PlanArchive(Path(config.plan_archive_db or SCRIPT_DIR / '.cache' / 'plans.sqlite3'))
+    try:
+        if args.show is not None:
+            plan = archive.get(args.show, include_prompt=args.prompt)
+            if plan is None:
+                log(f"❌ No archived plan #{args.show}")
+                sys.exit(1)
+            print(plan.prompt if args.prompt else plan.response)
+            return
+
+        plans = archive.history(
+            limit=args.limit,
+            before_id=args.before,
+            since=since,
+            until=until,
+            output_format=args.format,
+            hash_prefix=args.hash
+        )
+    finally:
+        archive.close()
+
+    if args.json:
+        for plan in plans:
+            print(json.dumps(plan.to_dict()))
+        return
+
+    if not plans:
+        log("No archived plans match")
+        return
+
+    print(f"{'ID':>6}  {'Created':19}  {'Format':6}  {'Model':28}  {'Prompt':12}  Sheet")
+    for plan in plans:
+        created = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(plan.created_at))
+        print(
+            f"{plan.id:>6}  {created:19}  {plan.output_format:6}  {(plan.model or '-')[:28]:28}  "
+            f"{plan.prompt_hash[:12]:12}  {(plan.sheet_hash or '-')[:12]}"
+            f"{'  (cached)' if plan.cached else ''}"
+        )
+    if len(plans) == args.limit:
+        log(f"\nOlder plans: lunchlady history --before {plans[-1].id}")
+
+
 def main():
     """Main entry point for the CLI."""
 
+    # History output is meant for piping, so it skips the banner
+    if sys.argv[1:2] == ['history']:
+        run_history(sys.argv[2:])
+        return
+
     print_banner()
 
+    if sys.argv[1:2] == ['daemon']:
+        run_daemon(sys.argv[2:], SCRIPT_DIR)
+        return
+
     # Parse command line arguments
     parser = argparse.ArgumentParser(
         description='Generate meal plans using Google Sheets and Gemini'
@@ -67,43 +480,127 @@ def main():
         default='.env',
         help='Path to .env file (default: .env)'
     )
+    parser.add_argument(
+        '--kitchen',
+        help='Kitchen from the tenants file whose spreadsheet to use'
+    )
     parser.add_argument(
         '--output',
         default='md',
-        help='Output format (default: md). Maps to prompt-output-{format}.md'
+        help='Output format (default: md). Maps to prompt-output-{format}.md, '
+             'or is rendered from a JSON plan with STRUCTURED_OUTPUT=true'
+    )
+    parser.add_argument(
+        '--refresh-sheets',
+        action='store_true',
+        help='Ignore the cached sheet snapshot and download the workbook again'
+    )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Write the response to stdout as it is generated'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Always call the model instead of reusing a cached response'
+    )
+    parser.add_argument(
+        '--deadline',
+        type=float,
+        help='Give up on a meal plan after this many seconds (default: REQUEST_DEADLINE)'
+    )
+    parser.add_argument(
+        '--count',
+        type=positive_int,
+        default=1,
+        help='Number of meal plans to generate per user input (default: 1)'
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=positive_int,
+        default=4,
+        help='Maximum concurrent LLM calls in batch mode (default: 4)'
+    )
+    parser.add_argument(
+        '--inputs',
+        help='File of user_input overrides, one per line; each gets --count plans'
+    )
+    parser.add_argument(
+        '--results',
+        help='Write batch results to this JSONL file instead of last-response-*.{format}'
+    )
+    parser.add_argument(
+        '--timings',
+        action='store_true',
+        help='Print how long each stage (sheets, prompt, model call, ...) took'
+    )
+    parser.add_argument(
+        '--socket',
+        default=str(default_socket_path(SCRIPT_DIR)),
+        help='Unix socket of a running "lunchlady daemon" '
+             '(default: $LUNCHLADY_SOCKET or .cache/daemon.sock)'
+    )
+    parser.add_argument(
+        '--no-daemon',
+        action='store_true',
+        help='Generate in this process even if a daemon is running'
     )
     args = parser.parse_args()
 
+    with collect_timings() as timings:
+        try:
+            run(args)
+        finally:
+            if args.timings and timings.stages:
+                print_timings(timings)
+
+
+def run(args) -> None:
+    """Generate meal plans as requested on the command line."""
     try:
+        # Batch runs are long enough that a warm process doesn't matter
+        batch = args.count > 1 or args.inputs
+        if not args.no_daemon and not batch and run_with_daemon(args):
+            return
+
         # Load configuration
         log("📋 Loading configuration...")
         config = Config(env_file=args.env_file)
-        log(f"✓ Using model: {config.gemini_model}\n")
+        if args.kitchen:
+            tenants = TenantStore(Path(config.tenants_file or SCRIPT_DIR / 'tenants.json'))
+            config = tenants.get(args.kitchen).apply(config)
+            log(f"✓ Kitchen: {args.kitchen}")
+        log_config(config.gemini_model, config.llm_providers)
 
         log("🔨 Generating meal plan...")
 
         # Generate meal plan using shared generator
-        generator = MealPlanGenerator(config, SCRIPT_DIR)
-        result = generator.generate(output_format=args.output)
-
-        log(f"✓ Prompt assembled ({len(result.prompt)} characters)")
+        clients = ClientRegistry(config)
+        generator = MealPlanGenerator(config, SCRIPT_DIR, clients=clients)
+        try:
+            if args.stream:
+                stream_meal_plan(generator, args.output, args.refresh_sheets, args.deadline)
+                return
 
-        # Save prompt to file
-        prompt_file = SCRIPT_DIR / 'last-prompt.md'
-        prompt_file.write_text(result.prompt)
-        log("✓ Saved to last-prompt.md")
-
-        log(f"\n🤖 Response received")
+            if batch:
+                if not run_batch(generator, args):
+                    sys.exit(1)
+                return
 
-        # Save response to file
-        response_file = SCRIPT_DIR / f'last-response.{result.output_format}'
-        response_file.write_text(result.response)
-        log(f"✓ Saved to last-response.{result.output_format}\n")
-
-        log("=" * 60 + "\n")
-
-        # Print response to stdout
-        print(result.response)
+            result = generator.generate(
+                output_format=args.output,
+                refresh_sheets=args.refresh_sheets,
+                no_cache=args.no_cache,
+                deadline=args.deadline
+            )
+            response_cache = generator.response_cache
+            report_result(result, response_cache.stats() if response_cache else None)
+        finally:
+            if generator.archive:
+                generator.archive.close()
+            generator.shared_cache.close()
+            clients.close()
 
     except ConfigError as e:
         log(f"❌ Configuration error: {e}")
@@ -114,6 +611,24 @@ def main():
     except GeminiClientError as e:
         log(f"❌ Gemini error: {e}")
         sys.exit(1)
+    except OpenAIClientError as e:
+        log(f"❌ OpenAI error: {e}")
+        sys.exit(1)
+    except LLMProviderError as e:
+        log(f"❌ LLM error: {e}")
+        sys.exit(1)
+    except PlanRenderError as e:
+        log(f"❌ Meal plan error: {e}")
+        sys.exit(1)
+    except TenantError as e:
+        log(f"❌ Kitchen error: {e}")
+        sys.exit(1)
+    except DeadlineExceededError as e:
+        log(f"❌ Timed out: {e}")
+        sys.exit(1)
+    except DaemonError as e:
+        log(f"❌ Daemon error: {e}")
+        sys.exit(1)
     except KeyboardInterrupt:
         log("\n🛑 Cancelled by user")
         sys.exit(130)
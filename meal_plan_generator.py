@@ -1,14 +1,28 @@
 """Core meal plan generation logic for Lunch Lady."""
 
+import asyncio
+import copy
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, Tuple
-from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from dataclasses import asdict, dataclass
 
 from config import Config
-from sheets_client import SheetsClient
-from sheet_loader import load_sheet_data
-from prompt_builder import PromptBuilder, load_prompt_files
-from gemini_client import GeminiClient
+from clients import ClientRegistry
+from deadline import (
+    DeadlineExceededError, await_with_deadline, deadline_error, deadline_passed, request_deadline, run_detached,
+    time_left
+)
+from plan_archive import PlanArchive
+from sheet_loader import SheetData, SheetSnapshotCache
+from metrics import FAST_MODEL_ROUTES, GENERATIONS, PROMPT_CHARS, PROMPT_TOKENS, SPECULATIONS, span
+from plan_renderer import TEMPLATES, PlanRenderer
+from response_cache import ResponseCache
+from row_selector import RowSelector
+from shared_cache import SharedCache
+from singleflight import AsyncSingleFlight, SingleFlight, SingleFlightTimeoutError
+from prompt_builder import BuiltPrompt, PromptBuilder, PromptCache, PromptTemplateStore, TokenReport, estimate_tokens
+from snapshot_store import SnapshotStore
 
 
 @dataclass
@@ -17,68 +31,872 @@ class GenerationResult:
     response: str
     prompt: str
     output_format: str
+    cached: bool = False
+    token_report: Optional[TokenReport] = None
+    plan_json: Optional[str] = None  # Structured plan the response was rendered from
+    model: Optional[str] = None  # Provider and model that produced the response
+    sheet_hash: Optional[str] = None  # Fingerprint of the sheet snapshot used
+    archive_id: Optional[int] = None  # ID in the plan archive, once archived
+
+    def to_dict(self) -> Dict:
+        """Convert to a JSON-serializable dictionary."""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'GenerationResult':
+        """Create a GenerationResult from a dictionary produced by to_dict()."""
+        report = data.get('token_report')
+        return cls(**{**data, 'token_report': TokenReport.from_dict(report) if report else None})
 
 
 class MealPlanGenerator:
     """Generates meal plans using the full pipeline."""
 
-    def __init__(self, config: Config, script_dir: Path):
+    def __init__(
+        self,
+        config: Config,
+        script_dir: Path,
+        clients: Optional[ClientRegistry] = None,
+        config_store: Optional[SnapshotStore[Config]] = None
+    ):
         """
         Initialize the generator.
 
+        Prompt files are loaded into memory once here; call start_watching()
+        to pick up later changes to them (and to the .env file, if a
+        config_store is given).
+
         Args:
             config: Configuration object
             script_dir: Directory containing prompt files
+            clients: Long-lived API clients to use. A private registry is
+                created if not given.
+            config_store: Store holding the current config snapshot, for
+                hot reload. Defaults to a fixed snapshot of config.
         """
-        self.config = config
+        self.config_store = config_store or SnapshotStore(lambda: config)
         self.script_dir = script_dir
+        self.templates = PromptTemplateStore(script_dir)
+        self.clients = clients or ClientRegistry(config)
+        self.sheet_cache = SheetSnapshotCache(
+            cache_dir=Path(config.sheet_cache_dir or script_dir / '.cache'),
+            ttl=config.sheet_cache_ttl
+        )
+        self.row_selector = RowSelector()
+        self.renderer = PlanRenderer()
+        # Shared by every process using the same file (e.g. web server workers)
+        self.shared_cache = SharedCache(Path(config.shared_cache_db or script_dir / '.cache' / 'shared.sqlite3'))
+        self.prompt_cache = PromptCache(self.shared_cache)
+        self.response_cache = None
+        if config.response_cache_enabled:
+            self.response_cache = ResponseCache(
+                store=self.shared_cache,
+                ttl=config.response_cache_ttl,
+                max_bytes=config.response_cache_max_bytes,
+                memory_entries=config.response_cache_memory_entries,
+                variants=config.response_cache_variants
+            )
+        self.archive = None
+        if config.plan_archive_enabled:
+            self.archive = PlanArchive(Path(config.plan_archive_db or script_dir / '.cache' / 'plans.sqlite3'))
+
+        # Concurrent callers share in-flight sheet fetches and, optionally,
+        # in-flight LLM calls for the same prompt
+        self._sheet_flight = SingleFlight()
+        self._async_sheet_flight = AsyncSingleFlight()
+        self._generation_flight = SingleFlight()
+        self._async_generation_flight = AsyncSingleFlight()
+        # (config snapshot, the same with GEMINI_FAST_MODEL) for _route()
+        self._fast_config: Tuple[Optional[Config], Optional[Config]] = (None, None)
+
+    def derive(self, config_store: SnapshotStore[Config]) -> 'MealPlanGenerator':
+        """
+        Create a generator for another config source, such as one kitchen.
+
+        The new generator shares this one's API clients, prompt files,
+        response cache, plan archive and in-flight call coalescing, and
+        keeps its own sheet snapshot and row index in memory. It is never
+        watched itself.
+
+        Args:
+            config_store: Store holding the other config snapshot
+
+        Returns:
+            The derived generator.
+        """
+        generator = copy.copy(self)
+        generator.config_store = config_store
+        generator.sheet_cache = SheetSnapshotCache(self.sheet_cache.cache_dir, self.sheet_cache.ttl)
+        generator.row_selector = RowSelector()
+        return generator
+
+    @property
+    def config(self) -> Config:
+        """The current config snapshot."""
+        return self.config_store.current
+
+    def budget(self, deadline: Optional[float] = None) -> Optional[float]:
+        """
+        Get the seconds a request may take, for request_deadline().
+
+        Args:
+            deadline: Seconds asked for, or None for REQUEST_DEADLINE
+
+        Returns:
+            The budget, or None (or 0) for no limit.
+        """
+        return self.config.request_deadline if deadline is None else deadline
 
-    def generate(self, output_format: str = 'md') -> GenerationResult:
+    def start_watching(self) -> None:
+        """Start reloading config and prompt files when they change."""
+        self.config_store.start()
+        self.templates.start()
+
+    def stop_watching(self) -> None:
+        """Stop watching config and prompt files."""
+        self.config_store.stop()
+        self.templates.stop()
+
+    def generate(
+        self,
+        output_format: str = 'md',
+        refresh_sheets: bool = False,
+        no_cache: bool = False,
+        archive: bool = True,
+        deadline: Optional[float] = None
+    ) -> GenerationResult:
         """
         Generate a meal plan.
 
         Args:
             output_format: Output format (e.g., 'md', 'html')
+            refresh_sheets: Bypass the sheet snapshot cache
+            no_cache: Skip the response cache lookup (the fresh response is
+                still stored)
+            archive: Record the plan in the plan archive
+            deadline: Seconds the generation may take. Defaults to
+                REQUEST_DEADLINE; 0 means no limit.
 
         Returns:
             GenerationResult containing the response, prompt, and format
+
+        Raises:
+            PlanRenderError: If a structured plan is invalid
+            DeadlineExceededError: If the deadline passed first
         """
-        # Initialize Google Sheets client
-        sheets_client = SheetsClient(
-            api_key=self.config.google_api_key,
-            spreadsheet_id=self.config.spreadsheet_id
-        )
+        with span('generate'), request_deadline(self.budget(deadline)):
+            try:
+                # Use one config snapshot for the whole request
+                config = self.config
+                plan_format = self._plan_format(config, output_format)
+                stale = self._speculation_snapshot(config, refresh_sheets)
+                if stale is not None:
+                    result = self._speculate(config, plan_format, stale, no_cache)
+                else:
+                    prompt = self._assemble_prompt(config, plan_format, refresh_sheets)
+                    result = self._complete(config, prompt, plan_format, no_cache)
+                result = self._render(result, output_format)
+            except Exception:
+                GENERATIONS.inc(labels=('error',))
+                raise
 
-        # Load all sheet data
-        sheet_data = load_sheet_data(sheets_client)
+        if archive:
+            self.archive_result(result)
+        return self._count(result)
 
-        # Load prompt files
-        prompt_top, prompt_output = load_prompt_files(self.script_dir, output_format)
+    def complete(
+        self,
+        prompt: BuiltPrompt,
+        output_format: str = 'md',
+        no_cache: bool = False,
+        archive: bool = True,
+        deadline: Optional[float] = None
+    ) -> GenerationResult:
+        """
+        Generate a meal plan for an already assembled prompt.
 
-        if not prompt_output:
-            raise ValueError(f"Required output prompt file not found: prompt-output-{output_format}.md")
+        Safe to call from several threads at once.
 
-        # Build prompt
-        prompt_builder = PromptBuilder(
-            config=sheet_data.config,
-            sheet_context=sheet_data.sheet_context,
-            food_sheets=sheet_data.food_sheets,
-            prompt_top=prompt_top,
-            prompt_output=prompt_output
-        )
-        prompt = prompt_builder.build_prompt()
+        Args:
+            prompt: Prompt from build_prompt() or build_prompts()
+            output_format: Output format the prompt was requested for
+            no_cache: Skip the response cache lookup (the fresh response is
+                still stored)
+            archive: Record the plan in the plan archive
+            deadline: Seconds the generation may take. Defaults to
+                REQUEST_DEADLINE; 0 means no limit.
+
+        Returns:
+            GenerationResult containing the response, prompt, and format
+
+        Raises:
+            PlanRenderError: If a structured plan is invalid
+            DeadlineExceededError: If the deadline passed first
+        """
+        with span('generate'), request_deadline(self.budget(deadline)):
+            try:
+                result = self._complete(self.config, prompt, prompt.output_format, no_cache)
+                result = self._render(result, output_format)
+            except Exception:
+                GENERATIONS.inc(labels=('error',))
+                raise
+
+        if archive:
+            self.archive_result(result)
+        return self._count(result)
+
+    async def agenerate(
+        self,
+        output_format: str = 'md',
+        refresh_sheets: bool = False,
+        no_cache: bool = False,
+        archive: bool = True,
+        deadline: Optional[float] = None
+    ) -> GenerationResult:
+        """
+        Generate a meal plan without blocking the event loop.
+
+        Sheet data is loaded on the bounded blocking executor, and Gemini is
+        called through its async API.
+
+        Args:
+            output_format: Output format (e.g., 'md', 'html')
+            refresh_sheets: Bypass the sheet snapshot cache
+            no_cache: Skip the response cache lookup (the fresh response is
+                still stored)
+            archive: Record the plan in the plan archive
+            deadline: Seconds the generation may take. Defaults to
+                REQUEST_DEADLINE; 0 means no limit.
+
+        Returns:
+            GenerationResult containing the response, prompt, and format
+
+        Raises:
+            PlanRenderError: If a structured plan is invalid
+            DeadlineExceededError: If the deadline passed first
+        """
+        with span('generate'), request_deadline(self.budget(deadline)):
+            try:
+                result = self._render(await self._agenerate(output_format, refresh_sheets, no_cache), output_format)
+            except Exception:
+                GENERATIONS.inc(labels=('error',))
+                raise
+
+        if archive:
+            await self.aarchive_result(result)
+        return self._count(result)
+
+    async def _agenerate(self, output_format: str, refresh_sheets: bool, no_cache: bool) -> GenerationResult:
+        """Generate an unrendered result for agenerate()."""
+        # Use one config snapshot for the whole request
+        config = self.config
+        plan_format = self._plan_format(config, output_format)
+        stale = None
+        if config.speculative_generation:
+            stale = await self.clients.run_blocking(self._speculation_snapshot, config, refresh_sheets)
+        if stale is not None:
+            return await self._aspeculate(config, plan_format, stale, no_cache)
+
+        prompt = await self._aassemble_prompt(config, plan_format, refresh_sheets)
+        return await self._acomplete(config, prompt, plan_format, no_cache)
+
+    def _speculation_snapshot(self, config: Config, refresh_sheets: bool) -> Optional[SheetData]:
+        """Get the expired sheet snapshot to speculate on, or None when
+        speculation is off or the normal path needs no revision check."""
+        if not config.speculative_generation or refresh_sheets:
+            return None
+        return self.sheet_cache.expired(config.spreadsheet_id)
+
+    def _speculate(
+        self,
+        config: Config,
+        output_format: str,
+        stale: SheetData,
+        no_cache: bool
+    ) -> GenerationResult:
+        """
+        Generate on an expired snapshot while the sheets are checked.
+
+        The LLM call for the stale prompt runs on the speculation pool
+        while this thread loads the sheets. If the fresh prompt is the same,
+        the speculative response is used; otherwise it is abandoned and the
+        fresh prompt is generated. When the pool is busy, the request takes
+        the normal path.
+        """
+        stale_prompt = self._build_prompt(stale, self.templates.prompt_files(output_format), output_format)
+        speculative = self.clients.speculate(self._complete, config, stale_prompt, output_format, no_cache)
+        if speculative is None:
+            SPECULATIONS.inc(labels=('skipped',))
+            prompt = self._assemble_prompt(config, output_format, False)
+            return self._complete(config, prompt, output_format, no_cache)
+
+        fresh_prompt = self._assemble_prompt(config, output_format, False)
+        if fresh_prompt.text == stale_prompt.text:
+            SPECULATIONS.inc(labels=('hit',))
+            return speculative.result()
+
+        SPECULATIONS.inc(labels=('miss',))
+        # A call already in progress can't be stopped; its result is dropped
+        speculative.cancel()
+        return self._complete(config, fresh_prompt, output_format, no_cache)
+
+    async def _aspeculate(
+        self,
+        config: Config,
+        output_format: str,
+        stale: SheetData,
+        no_cache: bool
+    ) -> GenerationResult:
+        """Async version of _speculate(); a miss cancels the speculative call."""
+        stale_prompt = self._build_prompt(stale, self.templates.prompt_files(output_format), output_format)
+        speculative = asyncio.ensure_future(self._acomplete(config, stale_prompt, output_format, no_cache))
+        # Don't warn about the error of a speculative call nobody awaits
+        speculative.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+        try:
+            fresh_prompt = await self._aassemble_prompt(config, output_format, False)
+        except BaseException:
+            speculative.cancel()
+            raise
+
+        if fresh_prompt.text == stale_prompt.text:
+            SPECULATIONS.inc(labels=('hit',))
+            return await speculative
+
+        SPECULATIONS.inc(labels=('miss',))
+        speculative.cancel()
+        return await self._acomplete(config, fresh_prompt, output_format, no_cache)
+
+    async def _acomplete(
+        self,
+        config: Config,
+        prompt: BuiltPrompt,
+        output_format: str,
+        no_cache: bool
+    ) -> GenerationResult:
+        """Async version of _complete()."""
+        config = self._route(config, prompt)
+        cache_key = self._response_cache_key(config, prompt.text, output_format)
+        if cache_key and not no_cache:
+            with span('response_cache'):
+                cached = await self.clients.run_blocking(self.response_cache.get, cache_key)
+            if cached is not None:
+                return self._result(config, prompt, cached, output_format, cached=True)
+
+        response = await self._acall_llm(config, prompt, output_format)
+
+        if cache_key:
+            await self.clients.run_blocking(self.response_cache.put, cache_key, response)
+
+        return self._result(config, prompt, response, output_format)
+
+    @staticmethod
+    def speculation_stats() -> Dict:
+        """
+        Get the outcomes of speculative generations in this process.
+
+        Returns:
+            Dictionary with hits, misses, skipped (pool busy) and hit_rate
+            (None before the first).
+        """
+        hits = int(SPECULATIONS.value(('hit',)))
+        misses = int(SPECULATIONS.value(('miss',)))
+        return {
+            'hits': hits,
+            'misses': misses,
+            'skipped': int(SPECULATIONS.value(('skipped',))),
+            'hit_rate': hits / (hits + misses) if hits + misses else None
+        }
+
+    def supports_format(self, output_format: str) -> bool:
+        """Whether plans can be generated in an output format: it has a
+        prompt-output file, or is rendered from a structured plan."""
+        plan_format = self._plan_format(self.config, output_format)
+        return self.templates.prompt_files(plan_format)[1] is not None
+
+    def build_prompt(
+        self,
+        output_format: str = 'md',
+        refresh_sheets: bool = False,
+        structured: bool = True
+    ) -> BuiltPrompt:
+        """
+        Load sheet data and prompt files and assemble the prompt.
+
+        Args:
+            output_format: Output format (e.g., 'md', 'html')
+            refresh_sheets: Bypass the sheet snapshot cache
+            structured: With STRUCTURED_OUTPUT on, build the JSON prompt
+                that is rendered into output_format. Pass False to always
+                prompt for output_format directly (e.g. for streaming).
+
+        Returns:
+            The assembled prompt.
+        """
+        config = self.config
+        prompt_format = self._plan_format(config, output_format) if structured else output_format
+        return self._assemble_prompt(config, prompt_format, refresh_sheets)
+
+    def build_prompts(
+        self,
+        output_format: str,
+        user_inputs: List[Optional[str]],
+        refresh_sheets: bool = False
+    ) -> List[BuiltPrompt]:
+        """
+        Assemble one prompt per user input from a single sheet load.
+
+        Args:
+            output_format: Output format (e.g., 'md', 'html')
+            user_inputs: Values replacing the config sheet's user_input;
+                None keeps the sheet's own value
+            refresh_sheets: Bypass the sheet snapshot cache
 
-        # Initialize Gemini client and generate meal plan
-        gemini_client = GeminiClient(
-            model=self.config.gemini_model,
-            temperature=self.config.gemini_temperature,
-            max_tokens=self.config.gemini_max_tokens
+        Returns:
+            Prompts in the same order as user_inputs.
+        """
+        config = self.config
+        plan_format = self._plan_format(config, output_format)
+        sheet_data = self._load_sheet_data(config, refresh_sheets)
+        prompt_files = self.templates.prompt_files(plan_format)
+        return [
+            self._build_prompt(sheet_data, prompt_files, plan_format, user_input)
+            for user_input in user_inputs
+        ]
+
+    async def abuild_prompt(
+        self,
+        output_format: str = 'md',
+        refresh_sheets: bool = False,
+        structured: bool = True
+    ) -> BuiltPrompt:
+        """
+        Async version of build_prompt(). Sheet data is loaded on the bounded
+        blocking executor.
+
+        Args:
+            output_format: Output format (e.g., 'md', 'html')
+            refresh_sheets: Bypass the sheet snapshot cache
+            structured: See build_prompt()
+
+        Returns:
+            The assembled prompt.
+        """
+        config = self.config
+        prompt_format = self._plan_format(config, output_format) if structured else output_format
+        return await self._aassemble_prompt(config, prompt_format, refresh_sheets)
+
+    def stream(self, prompt: BuiltPrompt) -> Iterator[str]:
+        """
+        Stream a meal plan for an assembled prompt.
+
+        Args:
+            prompt: Prompt from build_prompt()
+
+        Yields:
+            Chunks of the generated meal plan text as they arrive.
+        """
+        config = self._route(self.config, prompt)
+        llm = self.clients.llm(config, structured=prompt.output_format == 'json')
+        self._count_prompt(prompt)
+        chunks = llm.stream_meal_plan(prompt.text, prefix=prompt.prefix)
+        if self.archive is None:
+            return chunks
+        return self._archive_stream(config, prompt, chunks)
+
+    def astream(self, prompt: BuiltPrompt) -> AsyncIterator[str]:
+        """
+        Async version of stream().
+
+        Args:
+            prompt: Prompt from abuild_prompt()
+
+        Yields:
+            Chunks of the generated meal plan text as they arrive.
+        """
+        config = self._route(self.config, prompt)
+        llm = self.clients.llm(config, structured=prompt.output_format == 'json')
+        self._count_prompt(prompt)
+        chunks = llm.astream_meal_plan(prompt.text, prefix=prompt.prefix)
+        if self.archive is None:
+            return chunks
+        return self._aarchive_stream(config, prompt, chunks)
+
+    def archive_result(self, result: GenerationResult) -> None:
+        """
+        Record a delivered plan in the plan archive, if enabled, and set its
+        archive_id.
+
+        Args:
+            result: The generation result, after rendering
+        """
+        if self.archive is None:
+            return
+
+        with span('archive'):
+            result.archive_id = self.archive.record(
+                prompt=result.prompt,
+                response=result.response,
+                output_format=result.output_format,
+                model=result.model,
+                sheet_hash=result.sheet_hash,
+                plan_json=result.plan_json,
+                cached=result.cached
+            )
+
+    async def aarchive_result(self, result: GenerationResult) -> None:
+        """Async version of archive_result(), run on the blocking executor."""
+        if self.archive is not None:
+            await self.clients.run_blocking(self.archive_result, result)
+
+    def _archive_stream(self, config: Config, prompt: BuiltPrompt, chunks: Iterator[str]) -> Iterator[str]:
+        """Pass chunks through, archiving the full plan once the stream ends."""
+        received = []
+        for chunk in chunks:
+            received.append(chunk)
+            yield chunk
+        self.archive_result(self._result(config, prompt, ''.join(received), prompt.output_format))
+
+    async def _aarchive_stream(
+        self,
+        config: Config,
+        prompt: BuiltPrompt,
+        chunks: AsyncIterator[str]
+    ) -> AsyncIterator[str]:
+        """Async version of _archive_stream()."""
+        received = []
+        async for chunk in chunks:
+            received.append(chunk)
+            yield chunk
+        await self.aarchive_result(self._result(config, prompt, ''.join(received), prompt.output_format))
+
+    def _assemble_prompt(
+        self,
+        config: Config,
+        output_format: str,
+        refresh_sheets: bool
+    ) -> BuiltPrompt:
+        """Load sheet data and assemble the prompt for a config snapshot."""
+        sheet_data = self._load_sheet_data(config, refresh_sheets)
+        prompt_files = self.templates.prompt_files(output_format)
+        return self._build_prompt(sheet_data, prompt_files, output_format)
+
+    async def _aassemble_prompt(
+        self,
+        config: Config,
+        output_format: str,
+        refresh_sheets: bool
+    ) -> BuiltPrompt:
+        """Async version of _assemble_prompt()."""
+        sheet_data = await await_with_deadline(
+            self._async_sheet_flight.do(
+                (config.spreadsheet_id, refresh_sheets),
+                run_detached,
+                self._shared_budget(config),
+                self.clients.run_blocking,
+                self._load_sheet_data,
+                config,
+                refresh_sheets
+            ),
+            'sheets'
         )
+        prompt_files = self.templates.prompt_files(output_format)
+        return self._build_prompt(sheet_data, prompt_files, output_format)
+
+    def _complete(
+        self,
+        config: Config,
+        prompt: BuiltPrompt,
+        output_format: str,
+        no_cache: bool
+    ) -> GenerationResult:
+        """Generate a response for a prompt, using the response cache."""
+        config = self._route(config, prompt)
+        cache_key = self._response_cache_key(config, prompt.text, output_format)
+        if cache_key and not no_cache:
+            with span('response_cache'):
+                cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return self._result(config, prompt, cached, output_format, cached=True)
+
+        # Generate meal plan with the configured LLM provider(s)
+        response = self._call_llm(config, prompt, output_format)
 
-        response = gemini_client.generate_meal_plan(prompt)
+        if cache_key:
+            self.response_cache.put(cache_key, response)
 
+        return self._result(config, prompt, response, output_format)
+
+    def _result(
+        self,
+        config: Config,
+        prompt: BuiltPrompt,
+        response: str,
+        output_format: str,
+        cached: bool = False
+    ) -> GenerationResult:
+        """Create the GenerationResult for a prompt's response."""
         return GenerationResult(
             response=response,
-            prompt=prompt,
-            output_format=output_format
+            prompt=prompt.text,
+            output_format=output_format,
+            cached=cached,
+            token_report=prompt.token_report,
+            model=self.clients.llm(config).name,
+            sheet_hash=prompt.sheet_hash
         )
+
+    @staticmethod
+    def _plan_format(config: Config, output_format: str) -> str:
+        """Format to prompt for: 'json' when output_format is rendered from
+        a structured plan, otherwise output_format itself."""
+        if config.structured_output and output_format in TEMPLATES:
+            return 'json'
+        return output_format
+
+    def _render(self, result: GenerationResult, output_format: str) -> GenerationResult:
+        """Render a structured result into the requested output format."""
+        if result.output_format != 'json':
+            return result
+
+        result.plan_json = result.response
+        with span('render'):
+            result.response = self.renderer.render(result.response, output_format)
+        result.output_format = output_format
+        return result
+
+    @staticmethod
+    def _count(result: GenerationResult) -> GenerationResult:
+        """Count a finished generation by outcome."""
+        GENERATIONS.inc(labels=('cached' if result.cached else 'generated',))
+        return result
+
+    @staticmethod
+    def _count_prompt(prompt: BuiltPrompt) -> None:
+        """Count the size of a prompt about to be sent to the model."""
+        PROMPT_CHARS.inc(len(prompt.text))
+        PROMPT_TOKENS.inc(MealPlanGenerator._prompt_tokens(prompt))
+
+    @staticmethod
+    def _prompt_tokens(prompt: BuiltPrompt) -> int:
+        """Estimated tokens in a prompt."""
+        return prompt.token_report.total_tokens if prompt.token_report else estimate_tokens(prompt.text)
+
+    def _route(self, config: Config, prompt: BuiltPrompt) -> Config:
+        """
+        Pick the model for a prompt.
+
+        GEMINI_FAST_MODEL is used instead of GEMINI_MODEL when less than
+        FAST_MODEL_BUDGET seconds are left before the request deadline, or
+        the prompt is estimated at more than FAST_MODEL_PROMPT_TOKENS.
+
+        Returns:
+            config, or a snapshot of it with the fast model.
+        """
+        fast_model = config.gemini_fast_model
+        if not fast_model or fast_model == config.gemini_model:
+            return config
+
+        left = time_left()
+        if left is not None and left < config.fast_model_budget:
+            reason = 'budget'
+        elif config.fast_model_prompt_tokens and self._prompt_tokens(prompt) > config.fast_model_prompt_tokens:
+            reason = 'prompt_size'
+        else:
+            return config
+
+        FAST_MODEL_ROUTES.inc(labels=(reason,))
+        base_config, fast_config = self._fast_config
+        if base_config is not config:
+            fast_config = config.with_values({'GEMINI_MODEL': fast_model})
+            self._fast_config = (config, fast_config)
+        return fast_config
+
+    @staticmethod
+    @contextmanager
+    def _deadline_errors(stage: str) -> Iterator[None]:
+        """Report a failure after the request deadline passed (usually a
+        timeout set from it) as DeadlineExceededError."""
+        try:
+            yield
+        except DeadlineExceededError:
+            raise
+        except Exception as e:
+            if deadline_passed():
+                raise deadline_error(stage) from e
+            raise
+
+    @staticmethod
+    def _shared_budget(config: Config) -> Optional[float]:
+        """
+        Budget for work shared by coalesced callers.
+
+        The longer of the leader's time left and REQUEST_DEADLINE, so a
+        leader with a short deadline doesn't cut the work short for
+        followers with longer ones. None when either is unlimited.
+        """
+        left = time_left()
+        if left is None or not config.request_deadline:
+            return None
+        return max(left, config.request_deadline)
+
+    @staticmethod
+    def _coalesce(flight: SingleFlight, stage: str, key, func, *args, **kwargs):
+        """
+        Run func through a SingleFlight within this caller's deadline.
+
+        A follower stops waiting at its own deadline. If the shared call
+        failed only because the leader's deadline passed, a caller with
+        time left runs it again instead of failing too.
+        """
+        while True:
+            try:
+                return flight.do(key, func, *args, timeout=time_left(), **kwargs)
+            except SingleFlightTimeoutError:
+                raise deadline_error(stage) from None
+            except DeadlineExceededError:
+                if deadline_passed():
+                    raise
+
+    def _check_response(self, response: str, output_format: str) -> str:
+        """Reject structured plans that don't match MEAL_PLAN_SCHEMA, down
+        to each meal, before they are cached.
+
+        Raises:
+            PlanRenderError: If the plan is invalid
+        """
+        if output_format == 'json':
+            self.renderer.render(response, 'json')
+        return response
+
+    def _response_cache_key(self, config: Config, prompt: str, output_format: str) -> Optional[str]:
+        """Get the response cache key for a prompt, or None if caching is off."""
+        if self.response_cache is None:
+            return None
+
+        return ResponseCache.make_key(
+            prompt,
+            self.clients.llm(config).name,
+            config.gemini_temperature,
+            config.gemini_max_tokens,
+            output_format
+        )
+
+    def _call_llm(self, config: Config, prompt: BuiltPrompt, output_format: str) -> str:
+        """Call the LLM, sharing identical in-flight calls if configured."""
+        llm = self.clients.llm(config, structured=output_format == 'json')
+        with span('llm'), self._deadline_errors('llm'):
+            if not config.coalesce_generations:
+                self._count_prompt(prompt)
+                response = llm.generate_meal_plan(prompt.text, prefix=prompt.prefix)
+            else:
+                response = self._coalesce(
+                    self._generation_flight,
+                    'llm',
+                    (llm.name, output_format, prompt.text),
+                    self._send_prompt,
+                    llm,
+                    prompt
+                )
+        return self._check_response(response, output_format)
+
+    def _send_prompt(self, llm, prompt: BuiltPrompt) -> str:
+        """Count and send a prompt; run once per coalesced group of callers."""
+        self._count_prompt(prompt)
+        return llm.generate_meal_plan(prompt.text, prefix=prompt.prefix)
+
+    async def _asend_prompt(self, llm, prompt: BuiltPrompt) -> str:
+        """Async version of _send_prompt()."""
+        self._count_prompt(prompt)
+        return await llm.agenerate_meal_plan(prompt.text, prefix=prompt.prefix)
+
+    async def _acall_llm(self, config: Config, prompt: BuiltPrompt, output_format: str) -> str:
+        """Async version of _call_llm()."""
+        llm = self.clients.llm(config, structured=output_format == 'json')
+        with span('llm'), self._deadline_errors('llm'):
+            if not config.coalesce_generations:
+                response = await await_with_deadline(self._asend_prompt(llm, prompt), 'llm')
+            else:
+                # The shared call runs under a budget of its own, so each
+                # caller only stops waiting at its own deadline
+                response = await await_with_deadline(
+                    self._async_generation_flight.do(
+                        (llm.name, output_format, prompt.text),
+                        run_detached,
+                        self._shared_budget(config),
+                        self._asend_prompt,
+                        llm,
+                        prompt
+                    ),
+                    'llm'
+                )
+        return self._check_response(response, output_format)
+
+    def _load_sheet_data(self, config: Config, refresh_sheets: bool) -> SheetData:
+        """
+        Load all sheet data, from the snapshot cache when unchanged.
+
+        Concurrent callers share a single in-flight load, which also builds
+        the row selection index for a new snapshot.
+        """
+        spreadsheet_id = config.spreadsheet_id
+        with span('sheets'), self._deadline_errors('sheets'):
+            return self._coalesce(
+                self._sheet_flight,
+                'sheets',
+                (spreadsheet_id, refresh_sheets),
+                self._load_snapshot,
+                config,
+                refresh_sheets
+            )
+
+    def _load_snapshot(self, config: Config, refresh_sheets: bool) -> SheetData:
+        """Load a sheet snapshot and prepare its row selection index."""
+        spreadsheet_id = config.spreadsheet_id
+        sheet_data = self.sheet_cache.load(
+            spreadsheet_id,
+            lambda: self.clients.sheets(spreadsheet_id, config.google_api_key),
+            refresh=refresh_sheets
+        )
+        self.row_selector.prepare(sheet_data)
+        return sheet_data
+
+    def _build_prompt(
+        self,
+        sheet_data: SheetData,
+        prompt_files: Tuple[Optional[str], Optional[str]],
+        output_format: str,
+        user_input: Optional[str] = None
+    ) -> BuiltPrompt:
+        """Assemble the prompt from sheet data and prompt file contents."""
+        prompt_top, prompt_output = prompt_files
+
+        if not prompt_output:
+            raise ValueError(f"Required output prompt file not found: prompt-output-{output_format}.md")
+
+        cache_key = PromptCache.make_key(sheet_data.fingerprint(), prompt_files, output_format, user_input)
+        with span('prompt_cache'):
+            prompt = self.prompt_cache.get(cache_key)
+        if prompt is not None:
+            return prompt
+
+        sheet_config = sheet_data.config
+        if user_input is not None:
+            sheet_config = {**sheet_config, 'user_input': user_input}
+
+        with span('row_selection'):
+            food_sheets = self.row_selector.select(sheet_data, sheet_config)
+
+        with span('build_prompt'):
+            prompt_builder = PromptBuilder(
+                config=sheet_config,
+                sheet_context=sheet_data.sheet_context,
+                food_sheets=food_sheets,
+                prompt_top=prompt_top,
+                prompt_output=prompt_output
+            )
+            prompt = prompt_builder.build()
+        prompt.output_format = output_format
+        prompt.sheet_hash = sheet_data.fingerprint()
+        self.prompt_cache.put(cache_key, prompt)
+        return prompt
@@ -0,0 +1,324 @@
+"""Latency histograms, counters and Prometheus export for Lunch Lady."""
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Upper bounds in seconds, spanning cache hits up to slow model calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the Prometheus text format."""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    """Format a label set as {name="value",...}, or '' if there are none."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value: float) -> str:
+    """Format a sample value, without a trailing .0 for whole numbers."""
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        """
+        Initialize the counter.
+
+        Args:
+            name: Metric name
+            help_text: One-line description
+            labelnames: Names of the labels, in the order values are passed
+        """
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, labels: Tuple[str, ...] = ()) -> None:
+        """Add amount to the counter for a label set."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, labels: Tuple[str, ...] = ()) -> float:
+        """Current value for a label set."""
+        with self._lock:
+            return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        """Prometheus text format lines for this counter."""
+        with self._lock:
+            values = sorted(self._values.items())
+
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for labels, value in values:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_number(value)}')
+        return lines
+
+
+class Histogram:
+    """Observations counted into fixed buckets per label set."""
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        """
+        Initialize the histogram.
+
+        Args:
+            name: Metric name
+            help_text: One-line description
+            labelnames: Names of the labels, in the order values are passed
+            buckets: Sorted bucket upper bounds; +Inf is implied
+        """
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket (last is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: Tuple[str, ...] = ()) -> None:
+        """Record one observation for a label set."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def summary(self, labels: Tuple[str, ...] = ()) -> Tuple[int, float]:
+        """Observation count and sum for a label set."""
+        with self._lock:
+            series = self._series.get(labels)
+            return (series[2], series[1]) if series else (0, 0.0)
+
+    def render(self) -> List[str]:
+        """Prometheus text format lines for this histogram."""
+        with self._lock:
+            series = sorted((labels, [list(s[0]), s[1], s[2]]) for labels, s in self._series.items())
+
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        bounds = [_format_number(bound) for bound in self.buckets] + ['+Inf']
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                label_text = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f'{self.name}_bucket{label_text} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_number(total)}')
+            lines.append(f'{self.name}_count{label_text} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """A named collection of metrics that renders as one Prometheus page."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        """Get or create a counter."""
+        return self._register(name, lambda: Counter(name, help_text, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        """Get or create a histogram."""
+        return self._register(name, lambda: Histogram(name, help_text, labelnames, buckets))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def _register(self, name: str, factory):
+        """Return the metric with this name, creating it if needed."""
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+
+# Process-wide registry served at /metrics
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'lunchlady_stage_duration_seconds',
+    'Time spent in each generation stage.',
+    ('stage',)
+)
+UPSTREAM_ERRORS = REGISTRY.counter(
+    'lunchlady_upstream_errors_total',
+    'Failed upstream calls by upstream and kind (retryable, fatal, circuit_open).',
+    ('upstream', 'kind')
+)
+GENERATIONS = REGISTRY.counter(
+    'lunchlady_generations_total',
+    'Meal plan generations by outcome (generated, cached, error).',
+    ('outcome',)
+)
+SPECULATIONS = REGISTRY.counter(
+    'lunchlady_speculations_total',
+    'Generations started on an expired sheet snapshot, by outcome (hit, miss, skipped).',
+    ('outcome',)
+)
+DEADLINES_EXCEEDED = REGISTRY.counter(
+    'lunchlady_deadlines_exceeded_total',
+    'Requests that ran out of time, by the upstream or stage they were waiting for.',
+    ('stage',)
+)
+FAST_MODEL_ROUTES = REGISTRY.counter(
+    'lunchlady_fast_model_routes_total',
+    'Generations sent to GEMINI_FAST_MODEL, by reason (budget, prompt_size).',
+    ('reason',)
+)
+PROMPT_CHARS = REGISTRY.counter(
+    'lunchlady_prompt_chars_total',
+    'Characters of prompts sent to the model.'
+)
+PROMPT_TOKENS = REGISTRY.counter(
+    'lunchlady_prompt_tokens_total',
+    'Estimated tokens of prompts sent to the model.'
+)
+RESPONSE_TOKENS = REGISTRY.counter(
+    'lunchlady_response_tokens_total',
+    'Tokens generated by the model, as reported by the provider.',
+    ('provider',)
+)
+
+
+class StageTimings:
+    """Per-request breakdown of stage durations, for the CLI --timings flag.
+
+    Stages are listed in the order they were first entered, indented by
+    how deeply they were nested, with the total time and call count of
+    each.
+    """
+
+    def __init__(self):
+        """Initialize with no stages."""
+        # stage -> [depth, seconds, calls]
+        self.stages: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def enter(self, stage: str, depth: int) -> None:
+        """Register a stage on entry so parents are listed before children."""
+        with self._lock:
+            if stage not in self.stages:
+                self.stages[stage] = [depth, 0.0, 0]
+
+    def exit(self, stage: str, seconds: float) -> None:
+        """Add the duration of a finished stage."""
+        with self._lock:
+            entry = self.stages[stage]
+            entry[1] += seconds
+            entry[2] += 1
+
+    def totals(self) -> Dict[str, float]:
+        """Total seconds spent in each stage."""
+        with self._lock:
+            return {stage: seconds for stage, (_, seconds, _) in self.stages.items()}
+
+    def format(self) -> str:
+        """Render the breakdown as an indented table."""
+        with self._lock:
+            stages = list(self.stages.items())
+
+        width = max((depth * 2 + len(stage) for stage, (depth, _, _) in stages), default=0)
+        lines = []
+        for stage, (depth, seconds, calls) in stages:
+            name = '  ' * depth + stage
+            suffix = f'  x{calls}' if calls > 1 else ''
+            lines.append(f'{name:<{width}}  {seconds * 1000:9.1f} ms{suffix}')
+        return '\n'.join(lines)
+
+
+_timings: contextvars.ContextVar[Optional[StageTimings]] = contextvars.ContextVar('lunchlady_timings', default=None)
+# Nesting depth of spans in the current thread or task, tracked only while
+# a breakdown is being collected
+_depth: contextvars.ContextVar[int] = contextvars.ContextVar('lunchlady_span_depth', default=0)
+
+
+@contextmanager
+def collect_timings() -> Iterator[StageTimings]:
+    """
+    Collect a per-stage breakdown of everything run in this context.
+
+    Yields:
+        StageTimings filled in as spans finish.
+    """
+    timings = StageTimings()
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+class span:
+    """Context manager timing one stage into STAGE_SECONDS.
+
+    Also adds the duration to the current collect_timings() breakdown, if
+    one is active. Written as a class rather than a generator-based
+    context manager because it sits on every hot path.
+    """
+
+    __slots__ = ('stage', 'start', 'timings', 'token')
+
+    def __init__(self, stage: str):
+        """
+        Initialize the span.
+
+        Args:
+            stage: Stage name, used as the histogram's stage label
+        """
+        self.stage = stage
+
+    def __enter__(self) -> 'span':
+        self.timings = _timings.get()
+        if self.timings is not None:
+            depth = _depth.get()
+            self.token = _depth.set(depth + 1)
+            self.timings.enter(self.stage, depth)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        elapsed = time.perf_counter() - self.start
+        STAGE_SECONDS.observe(elapsed, (self.stage,))
+        if self.timings is not None:
+            _depth.reset(self.token)
+            self.timings.exit(self.stage, elapsed)
@@ -1,7 +1,9 @@
 """OpenAI client for Lunch Lady."""
 
-from typing import Optional
-from openai import OpenAI, OpenAIError
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from deadline import time_left
+from metrics import RESPONSE_TOKENS, span
 
 
 class OpenAIClientError(Exception):
@@ -10,14 +12,19 @@ class OpenAIClientError(Exception):
 
 
 class OpenAIClient:
-    """Client for generating meal plans using OpenAI."""
+    """Client for generating meal plans using OpenAI.
+
+    The openai SDK is imported when the first client is created, so
+    importing this module (e.g. for OpenAIClientError) stays cheap.
+    """
 
     def __init__(
         self,
         api_key: str,
         model: str,
         temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        response_schema: Optional[Dict[str, Any]] = None
     ):
         """
         Initialize the OpenAI client.
@@ -27,18 +34,72 @@ class OpenAIClient:
             model: Model name (e.g., "gpt-4", "gpt-3.5-turbo")
             temperature: Sampling temperature (optional)
             max_tokens: Maximum tokens in response (optional)
+            response_schema: Optional JSON schema; responses are then JSON
+                objects matching it
         """
+        from openai import AsyncOpenAI, OpenAI
+
         self.client = OpenAI(api_key=api_key)
+        self.async_client = AsyncOpenAI(api_key=api_key)
+        self.name = f'openai:{model}'
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.response_schema = response_schema
+
+    def _build_params(self, prompt: str) -> Dict[str, Any]:
+        """Build chat completion request parameters."""
+        params = {
+            'model': self.model,
+            'messages': [
+                {'role': 'user', 'content': prompt}
+            ]
+        }
+
+        # Add optional parameters
+        if self.temperature is not None:
+            params['temperature'] = self.temperature
+
+        if self.max_tokens is not None:
+            params['max_tokens'] = self.max_tokens
+
+        if self.response_schema is not None:
+            params['response_format'] = {
+                'type': 'json_schema',
+                'json_schema': {'name': 'meal_plan', 'schema': self.response_schema}
+            }
+
+        # Don't wait on the API past the request deadline
+        timeout = time_left()
+        if timeout is not None:
+            params['timeout'] = timeout
+
+        return params
+
+    @staticmethod
+    def _client_error(error: Exception) -> OpenAIClientError:
+        """Wrap an exception from an API call in an OpenAIClientError."""
+        from openai import OpenAIError
 
-    def generate_meal_plan(self, prompt: str) -> str:
+        if isinstance(error, OpenAIError):
+            return OpenAIClientError(f"OpenAI API error: {error}")
+        return OpenAIClientError(f"Unexpected error calling OpenAI: {error}")
+
+    @staticmethod
+    def _record_usage(response) -> None:
+        """Count the completion tokens OpenAI reports for a call."""
+        usage = getattr(response, 'usage', None)
+        tokens = getattr(usage, 'completion_tokens', None)
+        if tokens:
+            RESPONSE_TOKENS.inc(tokens, ('openai',))
+
+    def generate_meal_plan(self, prompt: str, prefix: Optional[str] = None) -> str:
         """
         Generate a meal plan using the OpenAI API.
 
         Args:
             prompt: The prompt text to send to OpenAI
+            prefix: Unused; OpenAI caches repeated prompt prefixes automatically
 
         Returns:
             The generated meal plan text.
@@ -47,28 +108,93 @@ class OpenAIClient:
             OpenAIClientError: If the API call fails
         """
         try:
-            # Build request parameters
-            params = {
-                'model': self.model,
-                'messages': [
-                    {'role': 'user', 'content': prompt}
-                ]
-            }
+            # Make API call
+            with span('openai.chat'):
+                response = self.client.chat.completions.create(**self._build_params(prompt))
+            self._record_usage(response)
+
+            # Extract response text
+            return response.choices[0].message.content
 
-            # Add optional parameters
-            if self.temperature is not None:
-                params['temperature'] = self.temperature
+        except Exception as e:
+            raise self._client_error(e)
 
-            if self.max_tokens is not None:
-                params['max_tokens'] = self.max_tokens
+    async def agenerate_meal_plan(self, prompt: str, prefix: Optional[str] = None) -> str:
+        """
+        Generate a meal plan using the async OpenAI API.
 
-            # Make API call
-            response = self.client.chat.completions.create(**params)
+        Args:
+            prompt: The prompt text to send to OpenAI
+            prefix: Unused; OpenAI caches repeated prompt prefixes automatically
+
+        Returns:
+            The generated meal plan text.
+
+        Raises:
+            OpenAIClientError: If the API call fails
+        """
+        try:
+            with span('openai.chat'):
+                response = await self.async_client.chat.completions.create(**self._build_params(prompt))
+            self._record_usage(response)
 
             # Extract response text
             return response.choices[0].message.content
 
-        except OpenAIError as e:
-            raise OpenAIClientError(f"OpenAI API error: {e}")
         except Exception as e:
-            raise OpenAIClientError(f"Unexpected error calling OpenAI: {e}")
\ No newline at end of file
+            raise self._client_error(e)
+
+    def stream_meal_plan(self, prompt: str, prefix: Optional[str] = None) -> Iterator[str]:
+        """
+        Generate a meal plan, yielding text chunks as they arrive.
+
+        Args:
+            prompt: The prompt text to send to OpenAI
+            prefix: Unused; OpenAI caches repeated prompt prefixes automatically
+
+        Yields:
+            Chunks of the generated meal plan text.
+
+        Raises:
+            OpenAIClientError: If the API call fails
+        """
+        try:
+            stream = self.client.chat.completions.create(
+                stream=True,
+                **self._build_params(prompt)
+            )
+
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+        except Exception as e:
+            raise self._client_error(e)
+
+    async def astream_meal_plan(self, prompt: str, prefix: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Generate a meal plan with the async API, yielding text chunks as
+        they arrive.
+
+        Args:
+            prompt: The prompt text to send to OpenAI
+            prefix: Unused; OpenAI caches repeated prompt prefixes automatically
+
+        Yields:
+            Chunks of the generated meal plan text.
+
+        Raises:
+            OpenAIClientError: If the API call fails
+        """
+        try:
+            stream = await self.async_client.chat.completions.create(
+                stream=True,
+                **self._build_params(prompt)
+            )
+
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+        except Exception as e:
+            raise self._client_error(e)
@@ -0,0 +1,304 @@
+"""Append-only archive of generated meal plans for Lunch Lady."""
+
+import gzip
+import hashlib
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS bodies (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS plans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    sheet_hash TEXT,
+    prompt_hash TEXT NOT NULL,
+    response_hash TEXT NOT NULL,
+    plan_json_hash TEXT,
+    model TEXT,
+    output_format TEXT NOT NULL,
+    cached INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS plans_created ON plans (created_at);
+CREATE INDEX IF NOT EXISTS plans_format ON plans (output_format, id);
+CREATE INDEX IF NOT EXISTS plans_prompt ON plans (prompt_hash);
+CREATE INDEX IF NOT EXISTS plans_sheet ON plans (sheet_hash);
+'''
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 hex digest of a text body."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def parse_time(value: str) -> float:
+    """
+    Parse a history time filter.
+
+    Args:
+        value: Unix time, or an ISO 8601 date or date and time (local time
+            unless it has an offset)
+
+    Returns:
+        The time as Unix seconds.
+
+    Raises:
+        ValueError: If the value is neither
+    """
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid time {value!r}; use a Unix time or an ISO date like 2026-05-01")
+
+
+@dataclass
+class ArchivedPlan:
+    """One archived generation. Bodies are only loaded on request."""
+    id: int
+    created_at: float
+    sheet_hash: Optional[str]
+    prompt_hash: str
+    response_hash: str
+    model: Optional[str]
+    output_format: str
+    cached: bool
+    response: Optional[str] = None
+    prompt: Optional[str] = None
+    plan_json: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        """Convert to a JSON-serializable dictionary, omitting unloaded bodies."""
+        data = asdict(self)
+        for key in ('response', 'prompt', 'plan_json'):
+            if data[key] is None:
+                data.pop(key)
+        return data
+
+
+class PlanArchive:
+    """SQLite archive of every delivered meal plan.
+
+    Each plan is one row of metadata (time, sheet snapshot hash, prompt
+    hash, model, format). Prompt, response and structured plan bodies are
+    gzip-compressed and stored once per distinct content hash, so repeated
+    prompts and cache hits add only a metadata row. Rows are only ever
+    appended. Indexes on time, format and both hashes keep history lookups
+    from scanning the table.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Open or create the archive.
+
+        Args:
+            path: SQLite file to use
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._db.close()
+
+    def record(
+        self,
+        prompt: str,
+        response: str,
+        output_format: str,
+        model: Optional[str] = None,
+        sheet_hash: Optional[str] = None,
+        plan_json: Optional[str] = None,
+        cached: bool = False
+    ) -> int:
+        """
+        Append a generated plan.
+
+        Args:
+            prompt: Prompt the plan was generated from
+            response: The plan as delivered
+            output_format: Format of response
+            model: Provider and model name
+            sheet_hash: Fingerprint of the sheet snapshot used
+            plan_json: Structured plan the response was rendered from
+            cached: Whether the response came from the response cache
+
+        Returns:
+            ID of the archived plan.
+        """
+        bodies = {content_hash(prompt): prompt, content_hash(response): response}
+        plan_json_hash = None
+        if plan_json is not None:
+            plan_json_hash = content_hash(plan_json)
+            bodies[plan_json_hash] = plan_json
+
+        with self._lock:
+            known = {
+                row[0] for row in self._db.execute(
+                    f"SELECT hash FROM bodies WHERE hash IN ({','.join('?' * len(bodies))})",
+                    list(bodies)
+                )
+            }
+
+        # Compress without holding the lock; only new bodies are stored, and
+        # one stored meanwhile by another writer is ignored on insert
+        new_bodies = [
+            (body_hash, gzip.compress(text.encode('utf-8'), mtime=0))
+            for body_hash, text in bodies.items()
+            if body_hash not in known
+        ]
+
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                self._db.executemany('INSERT OR IGNORE INTO bodies (hash, data) VALUES (?, ?)', new_bodies)
+                cursor = self._db.execute(
+                    'INSERT INTO plans (created_at, sheet_hash, prompt_hash, response_hash, plan_json_hash, '
+                    'model, output_format, cached) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (
+                        time.time(),
+                        sheet_hash,
+                        content_hash(prompt),
+                        content_hash(response),
+                        plan_json_hash,
+                        model,
+                        output_format,
+                        int(cached)
+                    )
+                )
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+
+        return cursor.lastrowid
+
+    def history(
+        self,
+        limit: int = 20,
+        before_id: Optional[int] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        output_format: Optional[str] = None,
+        hash_prefix: Optional[str] = None
+    ) -> List[ArchivedPlan]:
+        """
+        List archived plans, newest first, without their bodies.
+
+        Args:
+            limit: Maximum plans to return
+            before_id: Only plans listed after the plan with this ID (the
+                cursor for the next page is the last ID returned)
+            since: Only plans created at or after this Unix time
+            until: Only plans created before this Unix time
+            output_format: Only plans in this format
+            hash_prefix: Only plans whose prompt or sheet hash starts with this
+
+        Returns:
+            Matching plans.
+        """
+        clauses = []
+        params: List = []
+        # With a time filter, ordering by time lets the time index both find
+        # and order the plans; ids and times both grow as plans are added, so
+        # the order is the same apart from clock changes
+        by_time = since is not None or until is not None
+        if before_id is not None:
+            if by_time:
+                clauses.append('(created_at, id) < (SELECT created_at, id FROM plans WHERE id = ?)')
+            else:
+                clauses.append('id < ?')
+            params.append(before_id)
+        if since is not None:
+            clauses.append('created_at >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('created_at < ?')
+            params.append(until)
+        if output_format:
+            clauses.append('output_format = ?')
+            params.append(output_format)
+        if hash_prefix:
+            # Range comparisons, unlike LIKE, can use the hash indexes
+            prefix = hash_prefix.lower()
+            clauses.append('((prompt_hash >= ? AND prompt_hash < ?) OR (sheet_hash >= ? AND sheet_hash < ?))')
+            params.extend([prefix, prefix + '\uffff'] * 2)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        order = 'created_at DESC, id DESC' if by_time else 'id DESC'
+        with self._lock:
+            rows = self._db.execute(
+                f'SELECT * FROM plans {where} ORDER BY {order} LIMIT ?',
+                params + [limit]
+            ).fetchall()
+
+        return [self._plan(row) for row in rows]
+
+    def get(self, plan_id: int, include_prompt: bool = False) -> Optional[ArchivedPlan]:
+        """
+        Get one archived plan with its response.
+
+        Args:
+            plan_id: Plan ID
+            include_prompt: Also load the prompt body
+
+        Returns:
+            The plan, or None if there is none with that ID.
+        """
+        with self._lock:
+            row = self._db.execute('SELECT * FROM plans WHERE id = ?', (plan_id,)).fetchone()
+            if row is None:
+                return None
+
+            plan = self._plan(row)
+            plan.response = self._body(row['response_hash'])
+            if row['plan_json_hash']:
+                plan.plan_json = self._body(row['plan_json_hash'])
+            if include_prompt:
+                plan.prompt = self._body(row['prompt_hash'])
+
+        return plan
+
+    def stats(self) -> Dict:
+        """Get plan and distinct body counts and the archive file size."""
+        with self._lock:
+            plans = self._db.execute('SELECT COUNT(*) FROM plans').fetchone()[0]
+            bodies = self._db.execute('SELECT COUNT(*) FROM bodies').fetchone()[0]
+        size = sum(path.stat().st_size for path in self.path.parent.glob(f'{self.path.name}*'))
+        return {'plans': plans, 'bodies': bodies, 'bytes': size}
+
+    @staticmethod
+    def _plan(row: sqlite3.Row) -> ArchivedPlan:
+        """Create an ArchivedPlan (without bodies) from a plans row."""
+        return ArchivedPlan(
+            id=row['id'],
+            created_at=row['created_at'],
+            sheet_hash=row['sheet_hash'],
+            prompt_hash=row['prompt_hash'],
+            response_hash=row['response_hash'],
+            model=row['model'],
+            output_format=row['output_format'],
+            cached=bool(row['cached'])
+        )
+
+    def _body(self, body_hash: str) -> Optional[str]:
+        """Load and decompress a body; the caller holds the lock."""
+        row = self._db.execute('SELECT data FROM bodies WHERE hash = ?', (body_hash,)).fetchone()
+        return gzip.decompress(row[0]).decode('utf-8') if row else None
@@ -0,0 +1,127 @@
+"""Pre-generated meal plan pool for Lunch Lady."""
+
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from deadline import detached_deadline
+from meal_plan_generator import GenerationResult, MealPlanGenerator
+
+
+class PlanPool:
+    """Pool of ready meal plans, kept full by background refill tasks.
+
+    Every plan is an independent sample from the same prompt, so plans can
+    be generated ahead of demand. Each pooled plan remembers the prompt it
+    was generated from; when the current prompt differs (the sheet data or
+    prompt files changed), stale plans are thrown away instead of served.
+    """
+
+    def __init__(self, generator: MealPlanGenerator, formats: List[str], depth: int):
+        """
+        Initialize the pool.
+
+        Args:
+            generator: Generator used to produce plans
+            formats: Output formats to keep plans for (e.g. ['html'])
+            depth: Number of ready plans to keep per format
+        """
+        self.generator = generator
+        self.depth = depth
+        self._plans: Dict[str, Deque[GenerationResult]] = {fmt: deque() for fmt in formats}
+        self._refills: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self.last_refill_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def start(self) -> None:
+        """Start filling the pool for every format."""
+        for output_format in self._plans:
+            self._schedule_refill(output_format)
+
+    async def stop(self) -> None:
+        """Cancel any running refill tasks."""
+        tasks = list(self._refills.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._refills = {}
+
+    async def take(self, output_format: str) -> Optional[GenerationResult]:
+        """
+        Take a ready plan from the pool.
+
+        Args:
+            output_format: Output format of the plan
+
+        Returns:
+            A plan generated from the current prompt, or None if the pool
+            has none (the caller should then generate one live).
+        """
+        plans = self._plans.get(output_format)
+        if plans is None:
+            return None
+
+        prompt = await self.generator.abuild_prompt(output_format)
+        self._discard_stale(output_format, prompt.text)
+
+        result = plans.popleft() if plans else None
+        self._schedule_refill(output_format)
+
+        if result is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        # Pooled plans are archived when served, not when generated
+        await self.generator.aarchive_result(result)
+        return result
+
+    def stats(self) -> Dict:
+        """Get pool depth, hit rate and refill latency."""
+        total = self.hits + self.misses
+        return {
+            'depth': {fmt: len(plans) for fmt, plans in self._plans.items()},
+            'target_depth': self.depth,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else None,
+            'discarded': self.discarded,
+            'last_refill_seconds': self.last_refill_seconds,
+            'last_error': self.last_error
+        }
+
+    def _discard_stale(self, output_format: str, prompt: str) -> None:
+        """Drop plans generated from a different prompt."""
+        plans = self._plans[output_format]
+        fresh = [plan for plan in plans if plan.prompt == prompt]
+        self.discarded += len(plans) - len(fresh)
+        plans.clear()
+        plans.extend(fresh)
+
+    def _schedule_refill(self, output_format: str) -> None:
+        """Start a refill task for a format unless one is already running."""
+        task = self._refills.get(output_format)
+        if task is None or task.done():
+            self._refills[output_format] = asyncio.create_task(self._refill(output_format))
+
+    async def _refill(self, output_format: str) -> None:
+        """Generate plans until the format is back at the target depth."""
+        while len(self._plans[output_format]) < self.depth:
+            start = time.perf_counter()
+            try:
+                # Scheduled from a request's take(); not bound by its deadline
+                with detached_deadline(None):
+                    result = await self.generator.agenerate(output_format, no_cache=True, archive=False)
+            except Exception as e:
+                # Leave the pool short; the next take() retries
+                self.last_error = str(e)
+                return
+
+            self.last_refill_seconds = time.perf_counter() - start
+            self.last_error = None
+            self._discard_stale(output_format, result.prompt)
+            self._plans[output_format].append(result)
@@ -0,0 +1,300 @@
+"""Structured meal plan schema and local rendering for Lunch Lady."""
+
+import html
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple
+
+
+class PlanRenderError(Exception):
+    """Raised when a structured meal plan is invalid or can't be rendered."""
+    pass
+
+
+# JSON schema the model's structured output must follow
+MEAL_PLAN_SCHEMA: Dict[str, Any] = {
+    'type': 'object',
+    'properties': {
+        'days': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'name': {'type': 'string'},
+                    'meals': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'meal': {'type': 'string'},
+                                'title': {'type': 'string'},
+                                'style': {'type': 'string'},
+                                'components': {'type': 'array', 'items': {'type': 'string'}},
+                                'notes': {'type': 'string'}
+                            },
+                            'required': ['meal', 'title', 'style', 'components']
+                        }
+                    }
+                },
+                'required': ['name', 'meals']
+            }
+        },
+        'shopping': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'section': {'type': 'string'},
+                    'items': {'type': 'array', 'items': {'type': 'string'}}
+                },
+                'required': ['section', 'items']
+            }
+        },
+        'pre_prep': {'type': 'array', 'items': {'type': 'string'}}
+    },
+    'required': ['days', 'shopping', 'pre_prep']
+}
+
+
+@dataclass(frozen=True)
+class PlanTemplate:
+    """str.format templates for rendering a meal plan in one format.
+
+    Every template gets already-escaped values. ``document`` receives
+    ``days``, ``shopping`` and ``pre_prep`` (the rendered sections); the
+    others receive the fields named in their placeholders.
+    """
+    document: str
+    day: str  # {name}, {meals}
+    meal: str  # {meal}, {title}, {style}, {components}, {notes}
+    component: str  # {text}
+    notes: str  # {text}
+    shopping_section: str  # {section}, {items}
+    item: str  # {text}
+    escape: Callable[[str], str] = str
+
+
+MARKDOWN_TEMPLATE = PlanTemplate(
+    document='# Meal Plan\n\n{days}## Shopping\n\n{shopping}## Pre-Prep\n\n{pre_prep}',
+    day='## {name}\n\n{meals}',
+    meal='### {meal}: {title} ({style})\n\n{components}\n{notes}',
+    component='- {text}\n',
+    notes='*{text}*\n\n',
+    shopping_section='**{section}**\n\n{items}\n',
+    item='- {text}\n'
+)
+
+_FONT = 'font-family: Arial, sans-serif;'
+
+HTML_TEMPLATE = PlanTemplate(
+    document=(
+        f'<h1 style="color: #333; {_FONT}">Meal Plan</h1>\n\n'
+        '{days}'
+        f'<h2 style="color: #555; {_FONT} margin-top: 20px;">Shopping</h2>\n\n'
+        '{shopping}'
+        f'<h2 style="color: #555; {_FONT} margin-top: 20px;">Pre-Prep</h2>\n\n'
+        f'<ul style="{_FONT} line-height: 1.6;">\n{{pre_prep}}</ul>\n'
+    ),
+    day=f'<h2 style="color: #555; {_FONT} margin-top: 20px;">{{name}}</h2>\n\n{{meals}}',
+    meal=(
+        f'<h3 style="color: #666; {_FONT} margin-top: 15px;">{{meal}}: {{title}} '
+        '<span style="font-weight: normal;">({style})</span></h3>\n\n'
+        f'<ul style="{_FONT} line-height: 1.6;">\n{{components}}</ul>\n\n'
+        '{notes}'
+    ),
+    component='  <li>{text}</li>\n',
+    notes=f'<p style="{_FONT} font-style: italic; color: #666; margin-top: 10px;">{{text}}</p>\n\n',
+    shopping_section=(
+        f'<h3 style="color: #666; {_FONT} margin-top: 15px;">{{section}}</h3>\n\n'
+        f'<ul style="{_FONT} line-height: 1.6;">\n{{items}}</ul>\n\n'
+    ),
+    item='  <li>{text}</li>\n',
+    escape=html.escape
+)
+
+# Output formats that can be rendered from a structured plan. Add a
+# PlanTemplate here to support another format.
+TEMPLATES: Dict[str, PlanTemplate] = {
+    'md': MARKDOWN_TEMPLATE,
+    'html': HTML_TEMPLATE
+}
+
+
+def parse_plan(text: str) -> Dict[str, Any]:
+    """
+    Parse and check a structured meal plan.
+
+    Args:
+        text: JSON text returned by the model
+
+    Returns:
+        The plan as a dictionary.
+
+    Raises:
+        PlanRenderError: If the text isn't a meal plan matching the schema
+    """
+    try:
+        plan = json.loads(text)
+    except ValueError as e:
+        raise PlanRenderError(f"Model did not return valid JSON: {e}")
+
+    _check_shape(plan, MEAL_PLAN_SCHEMA, 'plan')
+    return plan
+
+
+_SCHEMA_TYPES = {'object': dict, 'array': list, 'string': str}
+
+
+def _check_shape(value: Any, schema: Dict[str, Any], path: str) -> None:
+    """
+    Check a parsed value against a MEAL_PLAN_SCHEMA node, so rendering
+    never meets an entry of the wrong type.
+
+    Raises:
+        PlanRenderError: Naming the first part of the plan that doesn't match
+    """
+    expected = schema['type']
+    if not isinstance(value, _SCHEMA_TYPES[expected]):
+        raise PlanRenderError(f"Meal plan JSON: {path} must be {'an' if expected == 'object' else 'a'} {expected}")
+
+    if expected == 'array':
+        for index, item in enumerate(value):
+            _check_shape(item, schema['items'], f'{path}[{index}]')
+    elif expected == 'object':
+        for key in schema.get('required', ()):
+            if key not in value:
+                raise PlanRenderError(f"Meal plan JSON: {path} is missing '{key}'")
+        for key, field_schema in schema['properties'].items():
+            if key in value:
+                _check_shape(value[key], field_schema, f'{path}.{key}')
+
+
+def render_plan(plan: Dict[str, Any], template: PlanTemplate) -> str:
+    """
+    Render a parsed meal plan with a template.
+
+    Args:
+        plan: Plan from parse_plan()
+        template: Templates for the output format
+
+    Returns:
+        The rendered meal plan.
+    """
+    escape = template.escape
+
+    def items(values: List[Any], item_template: str) -> str:
+        return ''.join(item_template.format(text=escape(str(value))) for value in values)
+
+    days = []
+    for day in plan['days']:
+        meals = []
+        for meal in day.get('meals') or []:
+            notes = meal.get('notes')
+            meals.append(template.meal.format(
+                meal=escape(str(meal.get('meal', ''))),
+                title=escape(str(meal.get('title', ''))),
+                style=escape(str(meal.get('style', ''))),
+                components=items(meal.get('components') or [], template.component),
+                notes=template.notes.format(text=escape(str(notes))) if notes else ''
+            ))
+        days.append(template.day.format(name=escape(str(day.get('name', ''))), meals=''.join(meals)))
+
+    shopping = ''.join(
+        template.shopping_section.format(
+            section=escape(str(section.get('section', ''))),
+            items=items(section.get('items') or [], template.item)
+        )
+        for section in plan['shopping']
+    )
+
+    return template.document.format(
+        days=''.join(days),
+        shopping=shopping,
+        pre_prep=items(plan['pre_prep'], template.item)
+    )
+
+
+class PlanRenderer:
+    """Renders structured meal plans, caching each rendered variant.
+
+    Plans are cached by their JSON text, so asking for another format of a
+    plan that was already rendered skips parsing, and asking again for the
+    same format is a dictionary lookup.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        """
+        Initialize the renderer.
+
+        Args:
+            max_entries: Rendered variants kept in memory
+        """
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._rendered: 'OrderedDict[Tuple[str, str], str]' = OrderedDict()
+        self._parsed: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+
+    @staticmethod
+    def formats() -> List[str]:
+        """Output formats that can be rendered locally, plus 'json'."""
+        return list(TEMPLATES) + ['json']
+
+    def render(self, plan_json: str, output_format: str) -> str:
+        """
+        Render a structured plan in an output format.
+
+        Args:
+            plan_json: JSON text of the plan
+            output_format: 'json' or a format in TEMPLATES
+
+        Returns:
+            The rendered plan ('json' returns the JSON text itself).
+
+        Raises:
+            PlanRenderError: If the plan is invalid or the format unknown
+        """
+        if output_format == 'json':
+            self._parse(plan_json)
+            return plan_json
+
+        template = TEMPLATES.get(output_format)
+        if template is None:
+            raise PlanRenderError(
+                f"Can't render format '{output_format}' "
+                f"(available: {', '.join(self.formats())})"
+            )
+
+        key = (plan_json, output_format)
+        with self._lock:
+            rendered = self._rendered.get(key)
+            if rendered is not None:
+                self._rendered.move_to_end(key)
+                return rendered
+
+        rendered = render_plan(self._parse(plan_json), template)
+
+        with self._lock:
+            self._rendered[key] = rendered
+            while len(self._rendered) > self.max_entries:
+                self._rendered.popitem(last=False)
+
+        return rendered
+
+    def _parse(self, plan_json: str) -> Dict[str, Any]:
+        """Parse a plan, reusing the parsed copy of recent plans."""
+        with self._lock:
+            plan = self._parsed.get(plan_json)
+            if plan is not None:
+                self._parsed.move_to_end(plan_json)
+                return plan
+
+        plan = parse_plan(plan_json)
+
+        with self._lock:
+            self._parsed[plan_json] = plan
+            while len(self._parsed) > self.max_entries:
+                self._parsed.popitem(last=False)
+
+        return plan
@@ -1,7 +1,184 @@
 """Prompt builder for Lunch Lady."""
 
+import csv
+import hashlib
+import io
+import json
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from shared_cache import SharedCache
+from snapshot_store import SnapshotStore, file_signature
+
+PROMPT_FILE_PATTERN = 'prompt-*.md'
+
+TABLE_FORMATS = ('markdown', 'csv', 'tsv')
+
+# Rough average for English text; good enough for budgeting and reporting
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of LLM tokens in a piece of text.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Estimated token count (about one token per four characters).
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _config_bool(value: Optional[str]) -> bool:
+    """Interpret a config sheet value as a boolean (true/yes/on/1)."""
+    return bool(value) and value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+@dataclass
+class TableOptions:
+    """How food sheet tables are encoded in the prompt.
+
+    Read from the optional config sheet keys table_format, drop_columns,
+    drop_empty_columns, dedupe_rows and token_budget.
+    """
+    table_format: str = 'markdown'
+    drop_columns: List[str] = field(default_factory=list)
+    drop_empty_columns: bool = False
+    dedupe_rows: bool = False
+    token_budget: Optional[int] = None
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, str]) -> 'TableOptions':
+        """
+        Read table options from the config sheet.
+
+        Raises:
+            ValueError: If table_format or token_budget is invalid
+        """
+        table_format = (config.get('table_format') or 'markdown').strip().lower()
+        if table_format not in TABLE_FORMATS:
+            raise ValueError(
+                f"Unknown table_format '{table_format}' in config sheet "
+                f"(expected one of: {', '.join(TABLE_FORMATS)})"
+            )
+
+        token_budget = (config.get('token_budget') or '').strip()
+        try:
+            token_budget = int(token_budget) if token_budget else None
+        except ValueError:
+            raise ValueError(f"Invalid token_budget '{token_budget}' in config sheet")
+
+        drop_columns = config.get('drop_columns') or ''
+        return cls(
+            table_format=table_format,
+            drop_columns=[name.strip().lower() for name in drop_columns.split(',') if name.strip()],
+            drop_empty_columns=_config_bool(config.get('drop_empty_columns')),
+            dedupe_rows=_config_bool(config.get('dedupe_rows')),
+            token_budget=token_budget
+        )
+
+
+@dataclass
+class TokenReport:
+    """Estimated prompt size per section, compared with plain markdown tables."""
+    sections: List[Tuple[str, int]]
+    baseline_tokens: int
+    table_format: str
+    token_budget: Optional[int] = None
+    trimmed_rows: int = 0
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'TokenReport':
+        """Create a TokenReport from a dictionary produced by asdict()."""
+        return cls(**{**data, 'sections': [tuple(section) for section in data['sections']]})
+
+    @property
+    def total_tokens(self) -> int:
+        """Estimated tokens in the whole prompt."""
+        return sum(tokens for _, tokens in self.sections)
+
+    @property
+    def saved_tokens(self) -> int:
+        """Estimated tokens saved compared with untrimmed markdown tables."""
+        return self.baseline_tokens - self.total_tokens
+
+    def summary(self) -> str:
+        """One-line summary of the prompt size and savings."""
+        summary = f"~{self.total_tokens} tokens"
+        if self.saved_tokens > 0:
+            percent = 100 * self.saved_tokens / self.baseline_tokens
+            summary += f", {self.saved_tokens} ({percent:.0f}%) saved"
+        if self.trimmed_rows:
+            summary += f", {self.trimmed_rows} rows trimmed to fit {self.token_budget}"
+        return summary
+
+    def format(self) -> str:
+        """
+        Format the report as a plain-text table.
+
+        Returns:
+            Multi-line report string.
+        """
+        width = max([len(name) for name, _ in self.sections] + [len('markdown tables')])
+        lines = [f"Estimated prompt tokens (~{CHARS_PER_TOKEN} characters per token, {self.table_format} tables)"]
+        for name, tokens in self.sections:
+            lines.append(f"  {name:<{width}}  {tokens:>7}")
+        lines.append(f"  {'total':<{width}}  {self.total_tokens:>7}")
+        lines.append(f"  {'markdown tables':<{width}}  {self.baseline_tokens:>7}")
+        lines.append(f"  {'saved':<{width}}  {self.saved_tokens:>7}")
+        if self.token_budget:
+            lines.append(f"  {'budget':<{width}}  {self.token_budget:>7} ({self.trimmed_rows} rows trimmed)")
+        return '\n'.join(lines)
+
+
+@dataclass
+class BuiltPrompt:
+    """An assembled prompt, split into a static prefix and variable suffix.
+
+    The prefix holds everything that is the same across requests for the
+    same sheets and prompt files (prompt-top.md, prompt_header, the food
+    tables and prompt_footer), so it can be cached by the LLM provider.
+    ``text`` is always ``prefix + suffix``.
+    """
+    text: str
+    prefix: str
+    token_report: TokenReport
+    output_format: Optional[str] = None
+    sheet_hash: Optional[str] = None  # Fingerprint of the sheet snapshot used
+
+    @property
+    def suffix(self) -> str:
+        """The part of the prompt after the static prefix."""
+        return self.text[len(self.prefix):]
+
+    def to_dict(self) -> Dict:
+        """Convert to a JSON-serializable dictionary, storing the prefix
+        by its length."""
+        return {
+            'text': self.text,
+            'prefix_length': len(self.prefix),
+            'token_report': asdict(self.token_report) if self.token_report else None,
+            'output_format': self.output_format,
+            'sheet_hash': self.sheet_hash
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'BuiltPrompt':
+        """Create a BuiltPrompt from a dictionary produced by to_dict()."""
+        return cls(
+            text=data['text'],
+            prefix=data['text'][:data['prefix_length']],
+            token_report=TokenReport.from_dict(data['token_report']) if data['token_report'] else None,
+            output_format=data['output_format'],
+            sheet_hash=data['sheet_hash']
+        )
 
 
 def load_prompt_files(script_dir: Path, output_format: str) -> Tuple[Optional[str], Optional[str]]:
@@ -28,9 +205,168 @@ def load_prompt_files(script_dir: Path, output_format: str) -> Tuple[Optional[st
     return prompt_top, prompt_output
 
 
+def load_prompt_templates(script_dir: Path) -> Mapping[str, str]:
+    """
+    Load every prompt-*.md file in a directory.
+
+    Args:
+        script_dir: Directory to search for prompt files
+
+    Returns:
+        Read-only mapping of file name to file content.
+    """
+    templates = {
+        path.name: path.read_text()
+        for path in sorted(script_dir.glob(PROMPT_FILE_PATTERN))
+    }
+    return MappingProxyType(templates)
+
+
+class PromptTemplateStore(SnapshotStore[Mapping[str, str]]):
+    """In-memory prompt files, reloaded when any prompt-*.md file changes."""
+
+    def __init__(self, script_dir: Path):
+        """
+        Initialize the store and load the prompt files.
+
+        Args:
+            script_dir: Directory containing prompt files
+        """
+        super().__init__(
+            loader=lambda: load_prompt_templates(script_dir),
+            signature=lambda: file_signature(sorted(script_dir.glob(PROMPT_FILE_PATTERN)))
+        )
+
+    def prompt_files(self, output_format: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Get prompt-top.md and prompt-output-{format}.md from one snapshot.
+
+        Args:
+            output_format: Output format name (e.g., 'md', 'html')
+
+        Returns:
+            Tuple of (prompt_top, prompt_output), each may be None if the
+            file doesn't exist
+        """
+        templates = self.current
+        return templates.get('prompt-top.md'), templates.get(f'prompt-output-{output_format}.md')
+
+
+class PromptCache:
+    """Built prompts, keyed by everything that goes into them.
+
+    Building a prompt for a large workbook (row selection indexes, table
+    encoding, trimming to the token budget) is repeated work for every
+    request and every process. Prompts are kept in a small in-memory LRU
+    and, optionally, in a SharedCache so other processes (e.g. the other
+    web server workers) skip the build too. Keys hash the sheet snapshot
+    fingerprint, the prompt files, the output format and the user_input,
+    so a change to any of them simply misses.
+
+    Cached prompts are shared between callers and must not be modified.
+    """
+
+    NAMESPACE = 'prompts'
+
+    def __init__(
+        self,
+        store: Optional[SharedCache] = None,
+        memory_entries: int = 32,
+        ttl: float = 86400,
+        max_bytes: int = 64 * 1024 * 1024
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            store: Shared tier, or None for memory only
+            memory_entries: Maximum number of prompts kept in memory
+            ttl: Seconds a prompt stays in the shared tier
+            max_bytes: Maximum total size of prompts in the shared tier
+        """
+        self.store = store
+        self.memory_entries = memory_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory: 'OrderedDict[str, BuiltPrompt]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(
+        sheet_hash: str,
+        prompt_files: Tuple[Optional[str], Optional[str]],
+        output_format: str,
+        user_input: Optional[str]
+    ) -> str:
+        """
+        Build a cache key from everything a prompt is built from.
+
+        Returns:
+            Hex SHA-256 digest.
+        """
+        material = json.dumps([sheet_hash, list(prompt_files), output_format, user_input], ensure_ascii=False)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[BuiltPrompt]:
+        """
+        Look up a prompt, from memory or else the shared tier.
+
+        Args:
+            key: Cache key from make_key()
+
+        Returns:
+            The prompt, or None on a miss.
+        """
+        with self._lock:
+            prompt = self._memory.get(key)
+            if prompt is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return prompt
+
+        value = self.store.get(self.NAMESPACE, key) if self.store else None
+        if value is None:
+            self.misses += 1
+            return None
+
+        prompt = BuiltPrompt.from_dict(json.loads(value))
+        self._remember(key, prompt)
+        self.hits += 1
+        return prompt
+
+    def put(self, key: str, prompt: BuiltPrompt) -> None:
+        """
+        Store a prompt in memory and in the shared tier.
+
+        Args:
+            key: Cache key from make_key()
+            prompt: The built prompt
+        """
+        self._remember(key, prompt)
+        if self.store:
+            self.store.put(self.NAMESPACE, key, json.dumps(prompt.to_dict()).encode('utf-8'), self.ttl, self.max_bytes)
+
+    def stats(self) -> Dict[str, int]:
+        """Get hit and miss counts."""
+        return {'hits': self.hits, 'misses': self.misses, 'memory_entries': len(self._memory)}
+
+    def _remember(self, key: str, prompt: BuiltPrompt) -> None:
+        """Put a prompt in memory, evicting the least recently used."""
+        with self._lock:
+            self._memory[key] = prompt
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+
 class PromptBuilder:
     """Builds prompts from Google Sheets data."""
 
+    # Sections that vary per request; they always come last in the prompt
+    VARIABLE_SECTIONS = ('user_input', 'prompt-output')
+
     def __init__(
         self,
         config: Dict[str, str],
@@ -61,53 +397,242 @@ class PromptBuilder:
 
         Returns:
             The assembled prompt string.
+
+        Raises:
+            ValueError: If the config sheet has invalid table options
+        """
+        return self.build().text
+
+    def build(self) -> BuiltPrompt:
+        """
+        Build the complete prompt, split into its static prefix and variable
+        suffix, and report its estimated size.
+
+        Food sheet tables are encoded according to the config sheet's table
+        options. If token_budget is set and the prompt is over it, data rows
+        are trimmed deterministically: the last row of whichever table is
+        currently largest is dropped until the prompt fits (or no data rows
+        remain). Instructions and context are never trimmed.
+
+        Returns:
+            The built prompt.
+
+        Raises:
+            ValueError: If the config sheet has invalid table options
+        """
+        options = TableOptions.from_config(self.config)
+
+        tables = []
+        for sheet_name, sheet_data in self.food_sheets:
+            rows = self._clean_table(sheet_data, options)
+            tables.append((sheet_name, self._format_table_lines(rows, options.table_format)))
+
+        sections = self._build_sections(tables)
+        prompt = self._join_sections(sections)
+
+        trimmed_rows = 0
+        if options.token_budget and estimate_tokens(prompt) > options.token_budget:
+            trimmed_rows = self._trim_tables(tables, len(prompt) - options.token_budget * CHARS_PER_TOKEN)
+            sections = self._build_sections(tables)
+            prompt = self._join_sections(sections)
+
+        # Size of the same prompt with untrimmed markdown tables
+        baseline_tables = [
+            (sheet_name, self._format_table_lines(self._normalize_rows(sheet_data), 'markdown'))
+            for sheet_name, sheet_data in self.food_sheets
+        ]
+        baseline_sections = self._build_sections(baseline_tables)
+
+        report = TokenReport(
+            sections=[(name, estimate_tokens('\n'.join(parts))) for name, parts in sections],
+            baseline_tokens=sum(estimate_tokens('\n'.join(parts)) for _, parts in baseline_sections),
+            table_format=options.table_format,
+            token_budget=options.token_budget,
+            trimmed_rows=trimmed_rows
+        )
+        # Static sections come first, so the prefix is their joined lines
+        # plus the newline before the first variable section
+        static_lines = [
+            line
+            for name, parts in sections if name not in self.VARIABLE_SECTIONS
+            for line in parts
+        ]
+        prefix = '\n'.join(static_lines)
+        if len(prefix) < len(prompt):
+            prefix += '\n' if static_lines else ''
+        return BuiltPrompt(text=prompt, prefix=prefix, token_report=report)
+
+    def _build_sections(
+        self,
+        tables: List[Tuple[str, Optional[Tuple[List[str], List[str]]]]]
+    ) -> List[Tuple[str, List[str]]]:
+        """
+        Lay out the prompt as named sections of lines.
+
+        Args:
+            tables: (sheet_name, (header_lines, row_lines)) per food sheet,
+                with None for sheets without data
+
+        Returns:
+            List of (section_name, lines) in prompt order.
         """
-        parts = []
+        sections = []
 
         # Add top file content
         if self.prompt_top:
-            parts.append(self.prompt_top)
-            parts.append('')  # Empty line
+            sections.append(('prompt-top', [self.prompt_top, '']))
 
         # Add header from config
         if 'prompt_header' in self.config:
-            parts.append(self.config['prompt_header'])
-            parts.append('')  # Empty line
+            sections.append(('prompt_header', [self.config['prompt_header'], '']))
 
         # Add each food sheet
-        for sheet_name, sheet_data in self.food_sheets:
-            parts.append(f"## {sheet_name}")
+        for sheet_name, table in tables:
+            parts = [f"## {sheet_name}"]
 
             # Add context if available
             if sheet_name in self.sheet_context:
                 parts.append(self.sheet_context[sheet_name])
                 parts.append('')  # Empty line
 
-            # Add markdown table
-            if sheet_data:
-                table = self._format_as_markdown_table(sheet_data)
-                parts.append(table)
+            # Add table
+            if table:
+                header_lines, row_lines = table
+                parts.append('\n'.join(header_lines + row_lines))
             else:
                 parts.append('(No data)')
 
             parts.append('')  # Empty line between sheets
+            sections.append((sheet_name, parts))
 
         # Add footer from config
         if 'prompt_footer' in self.config:
-            parts.append(self.config['prompt_footer'])
-            parts.append('')  # Empty line
+            sections.append(('prompt_footer', [self.config['prompt_footer'], '']))
 
         # Add user input from config
         if 'user_input' in self.config:
-            parts.append('**Final thoughts from the user:** ' + self.config['user_input'])
-            parts.append('')  # Empty line
+            sections.append(('user_input', ['**Final thoughts from the user:** ' + self.config['user_input'], '']))
 
         # Add output file content
         if self.prompt_output:
-            parts.append(self.prompt_output)
-            parts.append('')  # Empty line
+            sections.append(('prompt-output', [self.prompt_output, '']))
+
+        return sections
+
+    @staticmethod
+    def _join_sections(sections: List[Tuple[str, List[str]]]) -> str:
+        """Join prompt sections into the prompt string."""
+        return '\n'.join(line for _, parts in sections for line in parts)
+
+    @staticmethod
+    def _trim_tables(
+        tables: List[Tuple[str, Optional[Tuple[List[str], List[str]]]]],
+        excess_chars: int
+    ) -> int:
+        """
+        Drop data rows in place until excess_chars have been removed.
+
+        The last row of the table with the most row characters is dropped
+        first (ties go to the earlier sheet), so the result only depends on
+        the data.
+
+        Returns:
+            Number of rows dropped.
+        """
+        sizes = [sum(len(line) + 1 for line in table[1]) if table else 0 for _, table in tables]
+        dropped = 0
+        while excess_chars > 0:
+            largest = max(range(len(tables)), key=lambda index: (sizes[index], -index), default=None)
+            if largest is None or sizes[largest] == 0:
+                break
+
+            line = tables[largest][1][1].pop()
+            sizes[largest] -= len(line) + 1
+            excess_chars -= len(line) + 1
+            dropped += 1
+
+        return dropped
+
+    @staticmethod
+    def _normalize_rows(data: List[List[str]]) -> List[List[str]]:
+        """Pad or cut every row to the header row's width."""
+        if not data:
+            return []
+
+        num_cols = len(data[0])
+        return [(row + [''] * (num_cols - len(row)))[:num_cols] for row in data]
+
+    def _clean_table(self, data: List[List[str]], options: TableOptions) -> List[List[str]]:
+        """
+        Apply column and row filters to sheet data.
 
-        return '\n'.join(parts)
+        Args:
+            data: Sheet data with header row first
+            options: Table options from the config sheet
+
+        Returns:
+            Filtered rows, header row first.
+        """
+        rows = self._normalize_rows(data)
+        if not rows:
+            return rows
+
+        header = rows[0]
+        keep = [
+            index for index, name in enumerate(header)
+            if name.strip().lower() not in options.drop_columns
+        ]
+        if options.drop_empty_columns:
+            keep = [index for index in keep if any(row[index].strip() for row in rows[1:])]
+        rows = [[row[index] for index in keep] for row in rows]
+
+        if options.dedupe_rows:
+            seen = set()
+            unique = [rows[0]]
+            for row in rows[1:]:
+                key = tuple(cell.strip().lower() for cell in row)
+                if key not in seen:
+                    seen.add(key)
+                    unique.append(row)
+            rows = unique
+
+        return rows
+
+    def _format_table_lines(
+        self,
+        rows: List[List[str]],
+        table_format: str
+    ) -> Optional[Tuple[List[str], List[str]]]:
+        """
+        Encode table rows as lines in the given format.
+
+        Args:
+            rows: Rows with the header row first, all the same width
+            table_format: One of TABLE_FORMATS
+
+        Returns:
+            Tuple of (header_lines, row_lines), or None if there are no rows.
+        """
+        if not rows:
+            return None
+
+        if table_format == 'markdown':
+            lines = self._format_as_markdown_table(rows).split('\n')
+            return lines[:2], lines[2:]
+
+        if table_format == 'tsv':
+            lines = [
+                '\t'.join(' '.join(cell.split()) for cell in row)
+                for row in rows
+            ]
+            return lines[:1], lines[1:]
+
+        lines = []
+        for row in rows:
+            buffer = io.StringIO()
+            csv.writer(buffer, lineterminator='').writerow(row)
+            lines.append(buffer.getvalue())
+        return lines[:1], lines[1:]
 
     def _format_as_markdown_table(self, data: List[List[str]]) -> str:
         """
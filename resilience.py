@@ -0,0 +1,413 @@
+"""Rate limiting, retries and circuit breaking for upstream APIs."""
+
+import asyncio
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Iterator, Optional, Tuple
+
+from deadline import DeadlineExceededError, await_with_deadline, check_deadline, deadline_error, deadline_passed, time_left
+from metrics import UPSTREAM_ERRORS
+
+
+class UpstreamUnavailableError(Exception):
+    """Raised without calling the upstream while its circuit is open."""
+    pass
+
+
+# Classifier: exception -> (retryable, retry_after_seconds)
+ErrorClassifier = Callable[[Exception], Tuple[bool, Optional[float]]]
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header value.
+
+    Args:
+        value: Delay in seconds or an HTTP date
+
+    Returns:
+        Seconds to wait, or None if missing or unparseable.
+    """
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_timeout(error: BaseException) -> bool:
+    """Whether an error is a client-side timeout (socket, httpx, OpenAI...)."""
+    return isinstance(error, TimeoutError) or any('Timeout' in cls.__name__ for cls in type(error).__mro__)
+
+
+class TokenBucket:
+    """Token bucket rate limiter shared by all threads and coroutines."""
+
+    def __init__(self, rate_per_minute: float, burst: Optional[int] = None):
+        """
+        Initialize a full bucket.
+
+        Args:
+            rate_per_minute: Sustained requests allowed per minute
+            burst: Bucket capacity. Defaults to one second's worth of
+                requests, at least 1.
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst or max(1, int(self.rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        """Add the tokens earned since the last update. Call with the
+        lock held."""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _reserve(self, timeout: Optional[float] = None) -> Optional[float]:
+        """Take a token, returning how long the caller must wait for it, or
+        None (taking nothing) if that is longer than timeout."""
+        with self._lock:
+            self._refill()
+            delay = max(0.0, (1 - self._tokens) / self.rate)
+            if timeout is not None and delay > timeout:
+                return None
+            self._tokens -= 1
+            return delay
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for the given time, e.g. an upstream's
+        Retry-After, and restart from an empty bucket afterwards so the
+        callers that waited don't all go at once."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 1 - seconds * self.rate)
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until a request may be made.
+
+        Args:
+            timeout: Longest wait in seconds, or None for no limit
+
+        Returns:
+            False, without waiting, if the wait would exceed timeout.
+        """
+        delay = self._reserve(timeout)
+        if delay is None:
+            return False
+        if delay:
+            time.sleep(delay)
+        return True
+
+    async def aacquire(self, timeout: Optional[float] = None) -> bool:
+        """Async version of acquire() that doesn't block the event loop."""
+        delay = self._reserve(timeout)
+        if delay is None:
+            return False
+        if delay:
+            await asyncio.sleep(delay)
+        return True
+
+
+class CircuitBreaker:
+    """Fails fast after repeated upstream failures.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are rejected for ``reset_timeout`` seconds. Then a single trial
+    call is let through: success closes the circuit, failure reopens it.
+    A trial that ends without either (e.g. it was cancelled) must be
+    released so the next call can be the trial.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Initialize a closed circuit.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds to stay open before a trial call
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """'closed', 'open' or 'half-open'."""
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return 'open'
+            return 'half-open'
+
+    def allow(self) -> bool:
+        """Check whether a call may be made now (see enter())."""
+        return self.enter()[0]
+
+    def enter(self) -> Tuple[bool, bool]:
+        """
+        Admit a call if the circuit allows it.
+
+        Returns:
+            Tuple of (allowed, trial). A trial call must end with
+            record_success(), record_failure() or release_trial().
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True, False
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False, False
+            if self._trial_in_flight:
+                return False, False
+            self._trial_in_flight = True
+            return True, True
+
+    def release_trial(self) -> None:
+        """Free the half-open trial slot of a call that ended without an
+        outcome, leaving the circuit as it is."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        """Record a successful call, closing the circuit."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """Record a failed call, opening the circuit past the threshold."""
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class Upstream:
+    """Rate limiter, retry policy and circuit breaker for one upstream API.
+
+    Retries use exponential backoff with full jitter, and wait at least as
+    long as the upstream's Retry-After when it sends one. Only errors the
+    classifier marks retryable (throttling, server errors, network
+    failures) are retried or count against the circuit breaker. An error
+    with a Retry-After is the upstream answering and pacing its clients,
+    so it is retried but doesn't open the circuit, and it pauses the rate
+    limiter for everyone.
+
+    Calls respect the current request deadline: no attempt starts after
+    it, neither the rate limit nor a backoff waits past it, and async
+    attempts are cancelled when it passes. Running out of time raises
+    DeadlineExceededError. A timeout or cancellation caused by the
+    deadline is not held against the upstream's circuit, but real
+    failures still are.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        classify: ErrorClassifier,
+        rate_per_minute: Optional[float] = None,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0
+    ):
+        """
+        Initialize the upstream.
+
+        Args:
+            name: Upstream name used in error messages
+            classify: Returns (retryable, retry_after) for an exception
+            rate_per_minute: Request rate limit, or None for no limit
+            max_attempts: Attempts per call, including the first
+            base_delay: Backoff delay before the first retry
+            max_delay: Maximum backoff delay
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open
+        """
+        self.name = name
+        self.classify = classify
+        self.limiter = TokenBucket(rate_per_minute) if rate_per_minute else None
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Call func with rate limiting, retries and circuit breaking.
+
+        Raises:
+            UpstreamUnavailableError: If the circuit is open
+            DeadlineExceededError: If the request deadline passes
+            Exception: The last error from func if it could not succeed
+        """
+        for attempt in range(self.max_attempts):
+            trial = self._check_circuit()
+            try:
+                self._wait_for_rate_limit()
+
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    delay = self._on_failure(e, attempt)
+                    time.sleep(delay)
+                    continue
+
+                self.breaker.record_success()
+                return result
+            finally:
+                if trial:
+                    # No-op once an outcome was recorded
+                    self.breaker.release_trial()
+
+    async def acall(self, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Async version of call().
+
+        Raises:
+            UpstreamUnavailableError: If the circuit is open
+            DeadlineExceededError: If the request deadline passes
+            Exception: The last error from func if it could not succeed
+        """
+        for attempt in range(self.max_attempts):
+            trial = self._check_circuit()
+            try:
+                if self.limiter and not await self.limiter.aacquire(time_left()):
+                    raise deadline_error(self.name)
+                check_deadline(self.name)
+
+                try:
+                    result = await await_with_deadline(func(*args, **kwargs), self.name)
+                except DeadlineExceededError:
+                    raise
+                except Exception as e:
+                    delay = self._on_failure(e, attempt)
+                    await asyncio.sleep(delay)
+                    continue
+
+                self.breaker.record_success()
+                return result
+            finally:
+                if trial:
+                    # Also frees the slot when the call is cancelled
+                    self.breaker.release_trial()
+
+    @contextmanager
+    def admitted(self) -> Iterator[None]:
+        """
+        Apply the circuit breaker and rate limit to a call that is not
+        retried here (e.g. a stream), recording its outcome when the body
+        ends.
+
+        Raises:
+            UpstreamUnavailableError: If the circuit is open
+            DeadlineExceededError: If the request deadline has passed
+        """
+        trial = self._check_circuit()
+        try:
+            self._wait_for_rate_limit()
+
+            try:
+                yield
+            except Exception as e:
+                retryable, retry_after = self.classify(e)
+                UPSTREAM_ERRORS.inc(labels=(self.name, 'retryable' if retryable else 'fatal'))
+                if retryable and retry_after is None:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                raise
+
+            self.breaker.record_success()
+        finally:
+            if trial:
+                # A stream closed early has no outcome; free the slot
+                self.breaker.release_trial()
+
+    def _wait_for_rate_limit(self) -> None:
+        """Wait for the rate limit, but not past the request deadline.
+
+        Raises:
+            DeadlineExceededError: If the deadline passes first
+        """
+        if self.limiter and not self.limiter.acquire(time_left()):
+            raise deadline_error(self.name)
+        check_deadline(self.name)
+
+    def _check_circuit(self) -> bool:
+        """
+        Raise if the circuit is open.
+
+        Returns:
+            Whether the call is the half-open trial.
+        """
+        allowed, trial = self.breaker.enter()
+        if not allowed:
+            UPSTREAM_ERRORS.inc(labels=(self.name, 'circuit_open'))
+            raise UpstreamUnavailableError(
+                f"{self.name} is unavailable after repeated failures; retrying in "
+                f"up to {self.breaker.reset_timeout:.0f}s"
+            )
+        return trial
+
+    def _on_failure(self, error: Exception, attempt: int) -> float:
+        """
+        Record a failure and return the delay before the next attempt.
+
+        Re-raises the error if it is not retryable or attempts are used up,
+        and raises DeadlineExceededError if the request deadline has passed
+        or would pass during the delay.
+        """
+        if deadline_passed() and _is_timeout(error):
+            # A timeout set from the request deadline, not an upstream
+            # fault; the caller frees a trial slot without an outcome
+            raise deadline_error(self.name) from error
+
+        retryable, retry_after = self.classify(error)
+        UPSTREAM_ERRORS.inc(labels=(self.name, 'retryable' if retryable else 'fatal'))
+        if not retryable or retry_after is not None:
+            # The upstream answered; it is healthy even if the request wasn't
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        if not retryable:
+            raise error
+
+        if deadline_passed():
+            raise deadline_error(self.name) from error
+        if attempt + 1 >= self.max_attempts:
+            raise error
+
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+            if self.limiter:
+                # Hold back every caller sharing the quota, not just this one
+                self.limiter.pause(retry_after)
+
+        remaining = time_left()
+        if remaining is not None and delay >= remaining:
+            raise deadline_error(self.name) from error
+
+        return delay
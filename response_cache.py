@@ -0,0 +1,154 @@
+"""LLM response cache for Lunch Lady."""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from shared_cache import SharedCache
+
+
+class ResponseCache:
+    """Content-addressed cache of LLM responses.
+
+    Entries are keyed by a hash of everything that determines the response
+    (prompt, model, sampling parameters, output format). Each key holds up
+    to ``variants`` responses: until that many have been collected, lookups
+    miss so a fresh response gets generated and added; after that a random
+    stored variant is returned.
+
+    There are two tiers. An in-memory LRU holds the most recently used keys,
+    and an optional SharedCache holds every key, capped at ``max_bytes``
+    with the least recently used evicted first. The shared tier is seen by
+    every process using the same file, so a response generated by one web
+    server worker is served by all of them.
+    """
+
+    NAMESPACE = 'responses'
+
+    def __init__(
+        self,
+        store: Optional[SharedCache] = None,
+        ttl: float = 86400,
+        max_bytes: int = 50 * 1024 * 1024,
+        memory_entries: int = 128,
+        variants: int = 1
+    ):
+        """
+        Initialize the response cache.
+
+        Args:
+            store: Shared tier, or None for memory only
+            ttl: Seconds each response stays valid
+            max_bytes: Maximum total size of the shared tier
+            memory_entries: Maximum number of keys in the memory tier
+            variants: Number of distinct responses to keep per key
+        """
+        self.store = store
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.variants = max(1, variants)
+        self.hits = 0
+        self.misses = 0
+        self._memory: 'OrderedDict[str, List[Dict]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(
+        prompt: str,
+        model: str,
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        output_format: str
+    ) -> str:
+        """
+        Build a cache key from everything that determines the response.
+
+        Returns:
+            Hex SHA-256 digest.
+        """
+        material = json.dumps(
+            [prompt, model, temperature, max_tokens, output_format],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Cache key from make_key()
+
+        Returns:
+            One of the stored variants, or None on a miss (including when
+            fewer than ``variants`` responses have been stored yet).
+        """
+        with self._lock:
+            entries = self._entries(key)
+
+            if len(entries) < self.variants:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return random.choice(entries)['response']
+
+    def put(self, key: str, response: str) -> None:
+        """
+        Store a response under a key.
+
+        Args:
+            key: Cache key from make_key()
+            response: Response text to store
+        """
+        with self._lock:
+            entries = self._entries(key)
+            entries.append({'response': response, 'expires_at': time.time() + self.ttl})
+            # Keep the newest variants only
+            entries = entries[-self.variants:]
+
+            self._remember(key, entries)
+
+        # Written outside the lock, so readers aren't held up by SQLite
+        if self.store:
+            self.store.put(self.NAMESPACE, key, json.dumps(entries).encode('utf-8'), self.ttl, self.max_bytes)
+
+    def stats(self) -> Dict[str, int]:
+        """Get hit and miss counts."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'memory_entries': len(self._memory)
+        }
+
+    def _entries(self, key: str) -> List[Dict]:
+        """Get unexpired entries for a key from memory, falling back to
+        the shared tier when memory holds fewer than ``variants``."""
+        now = time.time()
+        entries = []
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            entries = [entry for entry in self._memory[key] if entry['expires_at'] > now]
+
+        if len(entries) < self.variants and self.store:
+            # Another process may have stored the key, or more variants
+            value = self.store.get(self.NAMESPACE, key)
+            if value is not None:
+                shared = [entry for entry in json.loads(value) if entry['expires_at'] > now]
+                if len(shared) > len(entries):
+                    entries = shared
+                    self._remember(key, entries)
+
+        return entries
+
+    def _remember(self, key: str, entries: List[Dict]) -> None:
+        """Put entries in the memory tier, evicting the least recently used."""
+        self._memory[key] = entries
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
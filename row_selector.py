@@ -0,0 +1,267 @@
+"""Relevance-based row selection for large food sheets in Lunch Lady."""
+
+import heapq
+import math
+import re
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from sheet_loader import SheetData
+
+# Columns searched, with how much a matching word in each one counts
+TEXT_COLUMNS = {'name': 2.0, 'style': 1.5, 'details': 1.0}
+
+STOPWORDS = frozenset(
+    'a an and are as at be but by for from i in is it me my of on or our '
+    'some that the this to want we what with would you'.split()
+)
+
+# Golden ratio conjugate, for spreading samples evenly through a group
+_SPREAD = 0.6180339887
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase search terms with simple plural folding.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        Terms in order of appearance, stopwords removed.
+    """
+    terms = []
+    for word in re.findall(r'[a-z0-9]+', text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 4 and word.endswith('ies'):
+            word = word[:-3] + 'y'
+        elif len(word) > 4 and word.endswith('oes'):
+            word = word[:-2]
+        elif len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+@dataclass
+class RowSelectionOptions:
+    """Row selection settings, read from the optional config sheet keys
+    max_rows_per_sheet, diversity_rows and row_keywords."""
+    max_rows: Optional[int] = None
+    diversity_rows: int = 0
+    keywords: str = ''
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, str]) -> 'RowSelectionOptions':
+        """
+        Read row selection options from the config sheet.
+
+        Raises:
+            ValueError: If max_rows_per_sheet or diversity_rows is invalid
+                or negative
+        """
+        values = {}
+        for key in ('max_rows_per_sheet', 'diversity_rows'):
+            value = (config.get(key) or '').strip()
+            try:
+                values[key] = int(value) if value else None
+            except ValueError:
+                raise ValueError(f"Invalid {key} '{value}' in config sheet")
+            if values[key] is not None and values[key] < 0:
+                raise ValueError(f"{key} can't be negative in config sheet, got {value}")
+
+        max_rows = values['max_rows_per_sheet']
+        diversity_rows = values['diversity_rows']
+        if diversity_rows is None:
+            diversity_rows = max_rows // 5 if max_rows else 0
+
+        return cls(
+            max_rows=max_rows,
+            diversity_rows=min(diversity_rows, max_rows or 0),
+            keywords=config.get('row_keywords') or ''
+        )
+
+
+class SheetIndex:
+    """TF-IDF index over the Name, Style and Details columns of one sheet."""
+
+    def __init__(self, data: List[List[str]]):
+        """
+        Build the index.
+
+        Args:
+            data: Sheet data with header row first
+        """
+        self.header = data[0] if data else []
+        self.rows = data[1:]
+        columns = [
+            (index, TEXT_COLUMNS[name.strip().lower()])
+            for index, name in enumerate(self.header)
+            if name.strip().lower() in TEXT_COLUMNS
+        ]
+
+        # term -> [(row, weighted term frequency x IDF)]
+        self.postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        style_column = next(
+            (index for index, name in enumerate(self.header) if name.strip().lower() == 'style'),
+            None
+        )
+        groups: Dict[str, List[int]] = {}
+
+        for row_number, row in enumerate(self.rows):
+            weights: Dict[str, float] = defaultdict(float)
+            for column, weight in columns:
+                if column < len(row):
+                    for term in tokenize(row[column]):
+                        weights[term] += weight
+            for term, weight in weights.items():
+                self.postings[term].append((row_number, weight))
+
+            style = row[style_column].strip().lower() if style_column is not None and style_column < len(row) else ''
+            groups.setdefault(style, []).append(row_number)
+
+        # Fold each term's IDF into its postings so scoring is a plain sum
+        total = max(1, len(self.rows))
+        for term, posting in self.postings.items():
+            idf = math.log(1 + total / len(posting))
+            self.postings[term] = [(row_number, weight * idf) for row_number, weight in posting]
+        self.postings = dict(self.postings)
+
+        # Rows of each style, reordered so any prefix is spread over the group
+        self.style_groups = [self._spread(group) for group in groups.values()]
+
+    @staticmethod
+    def _spread(group: List[int]) -> List[int]:
+        """Reorder rows so that every prefix samples the whole group evenly."""
+        order = sorted(range(len(group)), key=lambda i: ((i * _SPREAD) % 1, i))
+        return [group[i] for i in order]
+
+    def select(self, terms: List[str], top_k: int, diversity: int) -> List[List[str]]:
+        """
+        Pick the most relevant rows plus a sample across styles.
+
+        Args:
+            terms: Query terms
+            top_k: Rows to pick by relevance
+            diversity: Extra rows sampled round-robin across styles. Also
+                fills any relevance slots no row matched.
+
+        Returns:
+            Selected rows with the header row first, in sheet order.
+        """
+        target = top_k + diversity
+        if len(self.rows) <= target:
+            return [self.header] + self.rows
+
+        scores: Dict[int, float] = {}
+        for term in set(terms):
+            for row_number, weight in self.postings.get(term, ()):
+                scores[row_number] = scores.get(row_number, 0.0) + weight
+
+        # Highest score first; ties go to the earlier row
+        best = heapq.nsmallest(top_k, scores, key=lambda row_number: (-scores[row_number], row_number))
+        chosen = set(best)
+
+        positions = [0] * len(self.style_groups)
+        while len(chosen) < target:
+            progressed = False
+            for group_number, group in enumerate(self.style_groups):
+                while positions[group_number] < len(group) and group[positions[group_number]] in chosen:
+                    positions[group_number] += 1
+                if positions[group_number] < len(group):
+                    chosen.add(group[positions[group_number]])
+                    positions[group_number] += 1
+                    progressed = True
+                    if len(chosen) >= target:
+                        break
+            if not progressed:
+                break
+
+        return [self.header] + [self.rows[row_number] for row_number in sorted(chosen)]
+
+
+class RowSelector:
+    """Selects the food sheet rows relevant to a request.
+
+    With ``max_rows_per_sheet`` set in the config sheet, each food sheet
+    larger than that is cut down to its top rows by TF-IDF relevance to the
+    user_input (plus ``row_keywords``), and ``diversity_rows`` more rows
+    sampled evenly across Style values so the plan doesn't collapse onto
+    one cuisine. Smaller sheets, and all sheets when the option is unset,
+    are passed through unchanged.
+
+    The index is built by prepare() when a snapshot is loaded, and only
+    rebuilt for a different snapshot; selection itself only touches the
+    postings of the query terms.
+    """
+
+    def __init__(self):
+        """Initialize with no index."""
+        self._lock = threading.Lock()
+        # (snapshot, its indexes by sheet name), replaced as a whole
+        self._current: Tuple[Optional[SheetData], Dict[str, SheetIndex]] = (None, {})
+
+    def prepare(self, sheet_data: SheetData) -> None:
+        """
+        Build the indexes for a loaded snapshot if its config sheet turns
+        row selection on, so requests don't wait for the build.
+
+        Invalid options are left for select() to report.
+
+        Args:
+            sheet_data: Sheet snapshot, just loaded or refreshed
+        """
+        try:
+            options = RowSelectionOptions.from_config(sheet_data.config or {})
+        except ValueError:
+            return
+        if options.max_rows:
+            self._indexes_for(sheet_data)
+
+    def select(
+        self,
+        sheet_data: SheetData,
+        config: Mapping[str, str]
+    ) -> List[Tuple[str, List[List[str]]]]:
+        """
+        Select rows from every food sheet.
+
+        Args:
+            sheet_data: Sheet snapshot
+            config: Config sheet values, with any user_input override applied
+
+        Returns:
+            Food sheets in the same order, with selected rows.
+
+        Raises:
+            ValueError: If the config sheet has invalid selection options
+        """
+        options = RowSelectionOptions.from_config(config)
+        if not options.max_rows:
+            return sheet_data.food_sheets
+
+        indexes = self._indexes_for(sheet_data)
+        terms = tokenize(f"{config.get('user_input') or ''} {options.keywords}")
+        top_k = options.max_rows - options.diversity_rows
+        return [
+            (sheet_name, indexes[sheet_name].select(terms, top_k, options.diversity_rows) if data else data)
+            for sheet_name, data in sheet_data.food_sheets
+        ]
+
+    def _indexes_for(self, sheet_data: SheetData) -> Dict[str, SheetIndex]:
+        """Get the indexes for a snapshot, building them if it changed."""
+        indexed, indexes = self._current
+        if indexed is sheet_data:
+            return indexes
+
+        with self._lock:
+            if self._current[0] is not sheet_data:
+                self._current = (sheet_data, {
+                    sheet_name: SheetIndex(data)
+                    for sheet_name, data in sheet_data.food_sheets
+                    if data
+                })
+            return self._current[1]
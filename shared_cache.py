@@ -0,0 +1,149 @@
+"""Cross-process cache in a SQLite file for Lunch Lady."""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    UNIQUE (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (namespace, accessed_at);
+'''
+
+
+class SharedCache:
+    """Key-value cache that every process using the same file shares.
+
+    Web server workers, the daemon and CLI runs all read and write the same
+    SQLite file in WAL mode, so readers never block each other or the
+    writer, and a value stored by one process is seen by the next read in
+    any other. Entries live in namespaces (e.g. ``responses``, ``prompts``)
+    that are sized and evicted separately, least recently used first.
+
+    Callers use content-derived keys, so an entry never goes stale: when
+    the sheets or prompt files change, the key changes with them. That
+    keeps every process coherent without any invalidation messages.
+    Access times are only written when they are more than
+    ``touch_interval`` seconds old, so hot reads don't turn into writes.
+    """
+
+    def __init__(self, path: Path, touch_interval: float = 60.0):
+        """
+        Open or create the cache.
+
+        Args:
+            path: SQLite file to use
+            touch_interval: Seconds before a read refreshes an entry's
+                access time
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.touch_interval = touch_interval
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._db.close()
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        """
+        Look up a value.
+
+        Args:
+            namespace: Namespace of the entry
+            key: Key of the entry
+
+        Returns:
+            The value, or None if it is missing or expired.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                'SELECT value, expires_at, accessed_at FROM entries WHERE namespace = ? AND key = ?',
+                (namespace, key)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                return None
+            if now - row[2] > self.touch_interval:
+                self._db.execute(
+                    'UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?',
+                    (now, namespace, key)
+                )
+        return row[0]
+
+    def put(self, namespace: str, key: str, value: bytes, ttl: float, max_bytes: Optional[int] = None) -> None:
+        """
+        Store a value, replacing any previous one.
+
+        Args:
+            namespace: Namespace of the entry
+            key: Key of the entry
+            value: Value to store
+            ttl: Seconds the entry stays valid
+            max_bytes: Maximum total value size of the namespace; expired
+                and then least recently used entries are deleted past it
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO entries (namespace, key, value, size, expires_at, accessed_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (namespace, key, value, len(value), now + ttl, now)
+                )
+                if max_bytes is not None:
+                    self._evict(namespace, max_bytes, now)
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+
+    def delete(self, namespace: str, key: str) -> None:
+        """Delete an entry, if present."""
+        with self._lock:
+            self._db.execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (namespace, key))
+
+    def stats(self) -> Dict:
+        """Get entry counts and sizes per namespace, and the file size."""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT namespace, COUNT(*), SUM(size) FROM entries GROUP BY namespace'
+            ).fetchall()
+        size = sum(path.stat().st_size for path in self.path.parent.glob(f'{self.path.name}*'))
+        return {
+            'namespaces': {namespace: {'entries': count, 'bytes': total} for namespace, count, total in rows},
+            'file_bytes': size
+        }
+
+    def _evict(self, namespace: str, max_bytes: int, now: float) -> None:
+        """Delete expired, then least recently used, entries of a namespace
+        until it fits in max_bytes. Runs inside the caller's transaction."""
+        self._db.execute('DELETE FROM entries WHERE namespace = ? AND expires_at <= ?', (namespace, now))
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries WHERE namespace = ?', (namespace,)).fetchone()[0]
+        if total <= max_bytes:
+            return
+
+        doomed = []
+        for rowid, size in self._db.execute(
+            'SELECT rowid, size FROM entries WHERE namespace = ? ORDER BY accessed_at', (namespace,)
+        ):
+            if total <= max_bytes:
+                break
+            doomed.append((rowid,))
+            total -= size
+        self._db.executemany('DELETE FROM entries WHERE rowid = ?', doomed)
@@ -1,7 +1,13 @@
 """Sheet data loader module."""
 
-from dataclasses import dataclass
-from typing import Optional, Dict, List, Tuple
+import hashlib
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Callable, Optional, Dict, List, Tuple
 from sheets_client import SheetsClient
 
 
@@ -12,27 +18,239 @@ class SheetData:
     sheet_context: Optional[Dict[str, str]]
     food_sheets: List[Tuple[str, List[List[str]]]]
 
+    def to_dict(self) -> Dict:
+        """Convert to a JSON-serializable dictionary."""
+        return asdict(self)
+
+    def fingerprint(self) -> str:
+        """
+        Content hash of the snapshot, computed once per object.
+
+        Returns:
+            SHA-256 hex digest of the sheet data.
+        """
+        fingerprint = getattr(self, '_fingerprint', None)
+        if fingerprint is None:
+            encoded = json.dumps(self.to_dict(), sort_keys=True, separators=(',', ':')).encode('utf-8')
+            fingerprint = self._fingerprint = hashlib.sha256(encoded).hexdigest()
+        return fingerprint
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SheetData':
+        """Create SheetData from a dictionary produced by to_dict()."""
+        return cls(
+            config=data.get('config') or {},
+            sheet_context=data.get('sheet_context') or {},
+            food_sheets=[(name, rows) for name, rows in data.get('food_sheets', [])]
+        )
+
 
 def load_sheet_data(sheets_client: SheetsClient) -> SheetData:
     """Load all data from Google Sheets.
 
+    The whole workbook is fetched in a single request and then split into
+    the config sheet, the sheet-context sheet and the food sheets.
+
     Args:
         sheets_client: Initialized SheetsClient instance
 
     Returns:
         SheetData containing config, sheet_context, and food_sheets
     """
-    # Read config sheet
-    config = sheets_client.read_config_sheet()
+    config = {}
+    sheet_context = {}
+    food_sheets = []
 
-    # Read sheet context
-    sheet_context = sheets_client.read_sheet_context()
-
-    # Read all food sheets
-    food_sheets = sheets_client.get_food_sheets_data()
+    for sheet_name, data in sheets_client.read_workbook():
+        if sheet_name == 'config':
+            config = SheetsClient.parse_key_value_rows(data)
+        elif sheet_name == 'sheet-context':
+            sheet_context = SheetsClient.parse_key_value_rows(data)
+        else:
+            # Food sheets keep their workbook order
+            food_sheets.append((sheet_name, data))
 
     return SheetData(
         config=config,
         sheet_context=sheet_context,
         food_sheets=food_sheets
     )
+
+
+class SheetSnapshotCache:
+    """On-disk cache of SheetData snapshots, one file per spreadsheet.
+
+    A snapshot younger than the TTL is used without touching the network.
+    Once it is older, the spreadsheet revision is checked first and the
+    workbook is only downloaded again if the revision has changed.
+
+    The parsed SheetData is also kept in memory and reused while its file
+    is unchanged, so repeated loads return the same object. Callers must
+    treat it as read-only.
+
+    Snapshot files are replaced atomically and checked on every load, so
+    processes sharing the directory (e.g. web server workers) pick up each
+    other's downloads instead of fetching the workbook themselves. A
+    revision check that finds nothing changed only touches a small
+    ``.checked`` file next to the snapshot; its mtime restarts the TTL.
+    """
+
+    def __init__(self, cache_dir: Path, ttl: float = 300, on_change: Optional[Callable[[], None]] = None):
+        """
+        Initialize the snapshot cache.
+
+        Args:
+            cache_dir: Directory to store snapshot files in
+            ttl: Seconds a snapshot is trusted without a revision check
+            on_change: Called after a snapshot is loaded into memory or
+                replaced, e.g. to re-check a memory cap on memory_bytes()
+        """
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.on_change = on_change
+        # spreadsheet_id -> (file signature, snapshot metadata, sheet data)
+        self._memory: Dict[str, Tuple[Tuple, Dict, SheetData]] = {}
+
+    def load(
+        self,
+        spreadsheet_id: str,
+        client_factory: Callable[[], SheetsClient],
+        refresh: bool = False
+    ) -> SheetData:
+        """
+        Load sheet data, using the cached snapshot when it is still valid.
+
+        Args:
+            spreadsheet_id: ID of the spreadsheet
+            client_factory: Callable returning a SheetsClient, only invoked
+                when the network has to be consulted
+            refresh: Ignore any cached snapshot and download the workbook
+
+        Returns:
+            SheetData for the spreadsheet.
+        """
+        snapshot, sheet_data = (None, None) if refresh else self._read(spreadsheet_id)
+
+        if snapshot and time.time() - self._checked_at(spreadsheet_id, snapshot) < self.ttl:
+            return sheet_data
+
+        sheets_client = client_factory()
+        revision = sheets_client.get_revision()
+
+        if snapshot and revision is not None and revision == snapshot['revision']:
+            # Nothing changed, trust the snapshot for another TTL period
+            self._touch_checked(spreadsheet_id)
+            return sheet_data
+
+        sheet_data = load_sheet_data(sheets_client)
+        self._write(spreadsheet_id, {
+            'spreadsheet_id': spreadsheet_id,
+            'revision': revision,
+            'fetched_at': time.time()
+        }, sheet_data)
+
+        return sheet_data
+
+    def expired(self, spreadsheet_id: str) -> Optional[SheetData]:
+        """
+        Get the cached snapshot if the next load() has to check its revision.
+
+        Args:
+            spreadsheet_id: ID of the spreadsheet
+
+        Returns:
+            The snapshot older than the TTL, or None if there is no snapshot
+            or it is still trusted as is.
+        """
+        snapshot, sheet_data = self._read(spreadsheet_id)
+        if snapshot and time.time() - self._checked_at(spreadsheet_id, snapshot) >= self.ttl:
+            return sheet_data
+        return None
+
+    def memory_bytes(self) -> int:
+        """Approximate size of the snapshots held in memory, by file size."""
+        return sum(signature[1] for signature, _, _ in list(self._memory.values()) if signature)
+
+    def _path(self, spreadsheet_id: str) -> Path:
+        """Path of the snapshot file for a spreadsheet."""
+        return self.cache_dir / f'sheets-{spreadsheet_id}.json'
+
+    def _checked_path(self, spreadsheet_id: str) -> Path:
+        """Path of the file whose mtime records the last unchanged revision check."""
+        return self.cache_dir / f'sheets-{spreadsheet_id}.checked'
+
+    def _checked_at(self, spreadsheet_id: str, snapshot: Dict) -> float:
+        """Time a snapshot was last downloaded or found unchanged."""
+        try:
+            checked_at = os.stat(self._checked_path(spreadsheet_id)).st_mtime
+        except OSError:
+            checked_at = 0.0
+        return max(snapshot['fetched_at'], checked_at)
+
+    def _touch_checked(self, spreadsheet_id: str) -> None:
+        """Record an unchanged revision check; a failure only means an
+        earlier recheck."""
+        try:
+            self._checked_path(spreadsheet_id).touch()
+        except OSError:
+            pass
+
+    @staticmethod
+    def _signature(path: Path) -> Optional[Tuple]:
+        """Cheap change signature of a snapshot file, None if missing."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _read(self, spreadsheet_id: str) -> Tuple[Optional[Dict], Optional[SheetData]]:
+        """
+        Read a snapshot, reusing the parsed copy if the file is unchanged.
+
+        Returns:
+            Tuple of (snapshot metadata, sheet data), or (None, None) if the
+            file is missing or unreadable.
+        """
+        path = self._path(spreadsheet_id)
+        signature = self._signature(path)
+        memory = self._memory.get(spreadsheet_id)
+        if memory and signature is not None and memory[0] == signature:
+            return dict(memory[1]), memory[2]
+
+        try:
+            snapshot = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None, None
+
+        if snapshot.get('spreadsheet_id') != spreadsheet_id:
+            return None, None
+
+        sheet_data = SheetData.from_dict(snapshot.pop('data'))
+        self._remember(spreadsheet_id, signature, snapshot, sheet_data)
+        return dict(snapshot), sheet_data
+
+    def _write(self, spreadsheet_id: str, snapshot: Dict, sheet_data: SheetData) -> None:
+        """Atomically write a snapshot file and remember its parsed data."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(spreadsheet_id)
+        # A unique temp file per writer, so concurrent threads and processes
+        # never write into each other's file before the atomic replace
+        with tempfile.NamedTemporaryFile(
+            'w', dir=self.cache_dir, prefix=f'{path.name}.', suffix='.tmp', delete=False
+        ) as tmp_file:
+            tmp_file.write(json.dumps({**snapshot, 'data': sheet_data.to_dict()}))
+        os.replace(tmp_file.name, path)
+        self._remember(spreadsheet_id, self._signature(path), snapshot, sheet_data)
+
+    def _remember(
+        self,
+        spreadsheet_id: str,
+        signature: Optional[Tuple],
+        snapshot: Dict,
+        sheet_data: SheetData
+    ) -> None:
+        """Keep a parsed snapshot in memory and report the change."""
+        self._memory[spreadsheet_id] = (signature, snapshot, sheet_data)
+        if self.on_change is not None:
+            self.on_change()
@@ -1,8 +1,11 @@
 """Google Sheets client for Lunch Lady."""
 
-from typing import Dict, List, Optional, Tuple
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+import copy
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from deadline import time_left
+from metrics import span
+from resilience import RETRYABLE_STATUSES, Upstream, UpstreamUnavailableError, parse_retry_after
 
 
 class SheetsClientError(Exception):
@@ -10,22 +13,138 @@ class SheetsClientError(Exception):
     pass
 
 
+def classify_sheets_error(error: Exception) -> Tuple[bool, Optional[float]]:
+    """
+    Decide whether a Sheets API error is worth retrying.
+
+    Returns:
+        Tuple of (retryable, retry_after_seconds).
+    """
+    import httplib2
+    from googleapiclient.errors import HttpError
+
+    if isinstance(error, HttpError):
+        retry_after = parse_retry_after(error.resp.get('retry-after'))
+        return error.resp.status in RETRYABLE_STATUSES, retry_after
+
+    if isinstance(error, (OSError, httplib2.HttpLib2Error)):
+        # Connection resets, timeouts and similar network failures
+        return True, None
+
+    return False, None
+
+
 class SheetsClient:
-    """Client for reading data from Google Sheets."""
+    """Client for reading data from Google Sheets.
+
+    googleapiclient is imported when the first client is created, so
+    importing this module stays cheap.
+    """
 
     SPECIAL_SHEETS = {'config', 'sheet-context'}
 
-    def __init__(self, api_key: str, spreadsheet_id: str):
+    # Only fetch sheet titles and formatted cell values when pulling grid data
+    WORKBOOK_FIELDS = 'sheets(properties(title),data(rowData(values(formattedValue))))'
+
+    def __init__(
+        self,
+        api_key: str,
+        spreadsheet_id: str,
+        http: Optional[Any] = None,
+        upstream: Optional[Upstream] = None
+    ):
         """
         Initialize the Sheets client.
 
+        The discovery document bundled with google-api-python-client is used,
+        so building the service never fetches it over the network.
+
         Args:
             api_key: Google API key
             spreadsheet_id: ID of the spreadsheet to read from
+            http: Optional httplib2.Http to reuse a keep-alive connection.
+                httplib2 is not thread-safe, so an Http instance must not be
+                shared between threads.
+            upstream: Optional rate limiter, retry policy and circuit
+                breaker applied to every request
         """
         self.api_key = api_key
         self.spreadsheet_id = spreadsheet_id
-        self.service = build('sheets', 'v4', developerKey=api_key)
+        self.http = http
+        self.upstream = upstream
+        self.service = self._build_service('sheets', 'v4')
+        # Lazily built services and resource collections, shared with
+        # clients from for_spreadsheet()
+        self._services: Dict[str, Any] = {}
+
+    def for_spreadsheet(self, spreadsheet_id: str) -> 'SheetsClient':
+        """
+        Create a client for another spreadsheet that shares this client's
+        API services and connection, which are costly to build (several
+        hundred KB each). Like this client, it must stay on one thread.
+
+        Args:
+            spreadsheet_id: ID of the spreadsheet to read from
+
+        Returns:
+            The new client.
+        """
+        sheets_client = copy.copy(self)
+        sheets_client.spreadsheet_id = spreadsheet_id
+        return sheets_client
+
+    def _cached(self, name: str, factory: Callable[[], Any]) -> Any:
+        """
+        Get a service or resource collection, building it on first use.
+
+        googleapiclient builds a collection's methods, docstrings included,
+        each time it is requested, which takes longer than a request to a
+        nearby server.
+        """
+        resource = self._services.get(name)
+        if resource is None:
+            resource = self._services[name] = factory()
+        return resource
+
+    def _spreadsheets(self) -> Any:
+        """The Sheets API spreadsheets collection."""
+        return self._cached('spreadsheets', self.service.spreadsheets)
+
+    def _build_service(self, service_name: str, version: str):
+        """Build an API service from the bundled static discovery document."""
+        from googleapiclient.discovery import build
+
+        return build(
+            service_name,
+            version,
+            developerKey=self.api_key,
+            http=self.http,
+            static_discovery=True,
+            cache_discovery=False
+        )
+
+    def _execute(self, request, stage: str) -> Dict:
+        """Execute an API request through the upstream policy, if any,
+        timing it as the given metrics stage."""
+        with span(stage):
+            if self.upstream is None:
+                return self._timed_execute(request)
+
+            return self.upstream.call(self._timed_execute, request)
+
+    def _timed_execute(self, request) -> Dict:
+        """Execute a request with a socket timeout of the time left before
+        the request deadline, or none without one."""
+        timeout = time_left()
+        if self.http is not None:
+            # The Http belongs to this thread, so it can be adjusted per call;
+            # open keep-alive connections need their sockets updated too
+            self.http.timeout = timeout
+            for connection in self.http.connections.values():
+                connection.timeout = timeout
+                if connection.sock is not None:
+                    connection.sock.settimeout(timeout)
+        return request.execute()
 
     def get_all_sheet_names(self) -> List[str]:
         """
@@ -34,15 +153,51 @@ class SheetsClient:
         Returns:
             List of sheet names in the order they appear in the workbook.
         """
+        from googleapiclient.errors import HttpError
+
         try:
-            spreadsheet = self.service.spreadsheets().get(
+            request = self._spreadsheets().get(
                 spreadsheetId=self.spreadsheet_id
-            ).execute()
+            )
+            spreadsheet = self._execute(request, 'sheets.get_all_sheet_names')
 
             return [sheet['properties']['title'] for sheet in spreadsheet['sheets']]
-        except HttpError as e:
+        except (HttpError, UpstreamUnavailableError) as e:
             raise SheetsClientError(f"Failed to get sheet names: {e}")
 
+    def get_revision(self) -> Optional[str]:
+        """
+        Get a cheap revision fingerprint for the spreadsheet.
+
+        Uses the Drive API file version, which changes whenever any cell in
+        the workbook changes. No cell values are downloaded.
+
+        Returns:
+            Revision string, or None if it could not be determined (e.g. the
+            Drive API is not enabled for the API key).
+        """
+        from googleapiclient.errors import HttpError
+
+        try:
+            files = self._cached(
+                'files',
+                lambda: self._cached('drive', lambda: self._build_service('drive', 'v3')).files()
+            )
+            request = files.get(
+                fileId=self.spreadsheet_id,
+                fields='version,modifiedTime'
+            )
+            metadata = self._execute(request, 'sheets.get_revision')
+        except (HttpError, UpstreamUnavailableError):
+            return None
+
+        version = metadata.get('version')
+        modified = metadata.get('modifiedTime')
+        if not version and not modified:
+            return None
+
+        return f"{version}:{modified}"
+
     def read_sheet(self, sheet_name: str) -> List[List[str]]:
         """
         Read all data from a sheet.
@@ -53,16 +208,87 @@ class SheetsClient:
         Returns:
             List of rows, where each row is a list of cell values.
         """
+        from googleapiclient.errors import HttpError
+
         try:
-            result = self.service.spreadsheets().values().get(
+            request = self._cached('values', lambda: self._spreadsheets().values()).get(
                 spreadsheetId=self.spreadsheet_id,
                 range=sheet_name
-            ).execute()
+            )
+            result = self._execute(request, 'sheets.read_sheet')
 
             return result.get('values', [])
-        except HttpError as e:
+        except (HttpError, UpstreamUnavailableError) as e:
             raise SheetsClientError(f"Failed to read sheet '{sheet_name}': {e}")
 
+    def read_workbook(self) -> List[Tuple[str, List[List[str]]]]:
+        """
+        Read every sheet in the workbook with a single API request.
+
+        Returns:
+            List of tuples (sheet_name, sheet_data) in workbook order,
+            including the special sheets.
+        """
+        from googleapiclient.errors import HttpError
+
+        try:
+            request = self._spreadsheets().get(
+                spreadsheetId=self.spreadsheet_id,
+                includeGridData=True,
+                fields=self.WORKBOOK_FIELDS
+            )
+            spreadsheet = self._execute(request, 'sheets.read_workbook')
+        except (HttpError, UpstreamUnavailableError) as e:
+            raise SheetsClientError(f"Failed to read workbook: {e}")
+
+        sheets = []
+        for sheet in spreadsheet.get('sheets', []):
+            rows = []
+            for grid in sheet.get('data', []):
+                rows.extend(self._grid_to_values(grid.get('rowData', [])))
+            sheets.append((sheet['properties']['title'], rows))
+
+        return sheets
+
+    @staticmethod
+    def _grid_to_values(row_data: List[Dict]) -> List[List[str]]:
+        """
+        Convert grid rowData into the shape returned by values().get.
+
+        Trailing empty cells and trailing empty rows are dropped, matching
+        the values API.
+        """
+        rows = []
+        for row in row_data:
+            cells = [cell.get('formattedValue', '') for cell in row.get('values', [])]
+            while cells and cells[-1] == '':
+                cells.pop()
+            rows.append(cells)
+
+        while rows and not rows[-1]:
+            rows.pop()
+
+        return rows
+
+    @staticmethod
+    def parse_key_value_rows(data: List[List[str]]) -> Dict[str, str]:
+        """
+        Parse two-column sheet data into a dictionary.
+
+        Args:
+            data: Sheet data where column A is the key and column B the value
+
+        Returns:
+            Dictionary mapping keys to values. Rows with fewer than two
+            cells are skipped.
+        """
+        result = {}
+        for row in data:
+            if len(row) >= 2:
+                result[row[0].strip()] = row[1].strip()
+
+        return result
+
     def read_config_sheet(self) -> Dict[str, str]:
         """
         Read the 'config' sheet and return as a dictionary.
@@ -77,17 +303,7 @@ class SheetsClient:
             # config sheet is optional
             return {}
 
-        if not data:
-            return {}
-
-        config = {}
-        for row in data:
-            if len(row) >= 2:
-                key = row[0].strip()
-                value = row[1].strip()
-                config[key] = value
-
-        return config
+        return self.parse_key_value_rows(data)
 
     def read_sheet_context(self) -> Dict[str, str]:
         """
@@ -103,17 +319,7 @@ class SheetsClient:
             # sheet-context is optional
             return {}
 
-        if not data:
-            return {}
-
-        context = {}
-        for row in data:
-            if len(row) >= 2:
-                sheet_name = row[0].strip()
-                context_text = row[1].strip()
-                context[sheet_name] = context_text
-
-        return context
+        return self.parse_key_value_rows(data)
 
     def get_food_sheets_data(self) -> List[Tuple[str, List[List[str]]]]:
         """
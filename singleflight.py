@@ -0,0 +1,117 @@
+"""Request coalescing for Lunch Lady."""
+
+import asyncio
+import threading
+from concurrent.futures import Future, wait
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class SingleFlightTimeoutError(TimeoutError):
+    """Raised when a caller stops waiting for another caller's call."""
+    pass
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight block until it finishes and receive the same result, or the
+    same exception. Safe to use from multiple threads.
+    """
+
+    def __init__(self):
+        """Initialize with no calls in flight."""
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def do(
+        self,
+        key: Hashable,
+        func: Callable[..., Any],
+        *args,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> Any:
+        """
+        Run func, or wait for the in-flight call with the same key.
+
+        Args:
+            key: Key identifying equivalent calls
+            func: Callable to run
+            *args: Positional arguments for func
+            timeout: Longest wait for another caller's call, or None for
+                no limit. Not passed to func.
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            The result of the single execution.
+
+        Raises:
+            SingleFlightTimeoutError: If timeout passed while waiting
+            Whatever exception the single execution raised.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            done, _ = wait([future], timeout)
+            if not done:
+                raise SingleFlightTimeoutError(f"Gave up waiting for the in-flight call after {timeout:g}s")
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class AsyncSingleFlight:
+    """Coalesces concurrent awaits with the same key into one task.
+
+    The work runs in its own task, so a caller being cancelled does not
+    cancel the work other callers are waiting for.
+    """
+
+    def __init__(self):
+        """Initialize with no calls in flight."""
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Await func, or the in-flight task with the same key.
+
+        Args:
+            key: Key identifying equivalent calls
+            func: Coroutine function to run
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            The result of the single execution.
+
+        Raises:
+            Whatever exception the single execution raised.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        """Remove a finished task so the next call starts a new one."""
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
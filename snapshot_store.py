@@ -0,0 +1,120 @@
+"""Hot-reloading snapshot store for Lunch Lady."""
+
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Generic, Hashable, Iterable, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+def file_signature(paths: Iterable[Path]) -> Tuple:
+    """
+    Build a cheap change signature for a set of files.
+
+    Args:
+        paths: Files to include; missing files are recorded as missing
+
+    Returns:
+        Tuple of (path, mtime_ns, size) entries.
+    """
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((str(path), stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((str(path), None, None))
+
+    return tuple(signature)
+
+
+class SnapshotStore(Generic[T]):
+    """Holds an immutable snapshot and swaps it atomically when its source
+    files change.
+
+    Readers take ``current`` once and keep using that object, so an
+    in-flight request sees a consistent view even if a reload happens
+    meanwhile. Change detection runs on a background polling thread; reading
+    ``current`` never touches the filesystem.
+
+    If a reload fails (e.g. a half-written file), the previous snapshot is
+    kept and the error is recorded in ``last_error``.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], T],
+        signature: Optional[Callable[[], Hashable]] = None,
+        poll_interval: float = 2.0
+    ):
+        """
+        Initialize the store and load the first snapshot.
+
+        Args:
+            loader: Callable building a new snapshot
+            signature: Callable returning a value that changes whenever the
+                snapshot's sources change. None means the snapshot never
+                reloads.
+            poll_interval: Seconds between change checks once started
+        """
+        self.loader = loader
+        self.signature = signature
+        self.poll_interval = poll_interval
+        self.last_error: Optional[str] = None
+        self._signature = signature() if signature else None
+        self.current: T = loader()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def check(self) -> bool:
+        """
+        Reload the snapshot if its sources changed.
+
+        Returns:
+            True if a new snapshot was swapped in.
+        """
+        if self.signature is None:
+            return False
+
+        signature = self.signature()
+        if signature == self._signature:
+            return False
+
+        try:
+            snapshot = self.loader()
+        except Exception as e:
+            self.last_error = str(e)
+            return False
+
+        self._signature = signature
+        self.last_error = None
+        self.current = snapshot
+        return True
+
+    def start(self) -> None:
+        """Start polling for changes on a background thread."""
+        if self.signature is None or self._thread is not None:
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._poll,
+            name='lunchlady-reload',
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop polling for changes."""
+        if self._thread is None:
+            return
+
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _poll(self) -> None:
+        """Check for changes until stopped."""
+        while not self._stop.wait(self.poll_interval):
+            self.check()
@@ -0,0 +1,293 @@
+"""Multiple kitchens (tenants), each with its own workbook, for Lunch Lady."""
+
+import json
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+from config import Config
+from meal_plan_generator import MealPlanGenerator
+from snapshot_store import SnapshotStore, file_signature
+
+
+class TenantError(Exception):
+    """Raised when a kitchen is unknown or the tenants file is invalid."""
+    pass
+
+
+KITCHEN_NAME = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+@dataclass(frozen=True)
+class Tenant:
+    """A kitchen: its spreadsheet and any .env settings it overrides."""
+    name: str
+    spreadsheet_id: str
+    settings: Tuple[Tuple[str, str], ...] = ()
+
+    def apply(self, config: Config) -> Config:
+        """
+        Get the config snapshot for this kitchen.
+
+        Args:
+            config: The process's config snapshot
+
+        Returns:
+            config with the kitchen's spreadsheet and settings applied.
+        """
+        return config.with_values({**dict(self.settings), 'SPREADSHEET_ID': self.spreadsheet_id})
+
+
+def load_tenants(path: Path) -> Mapping[str, Tenant]:
+    """
+    Load kitchens from a tenants file.
+
+    The file is a JSON object mapping each kitchen name to an object with
+    a ``spreadsheet_id`` and optional ``settings``, a mapping of .env
+    variables that differ for that kitchen (e.g. GEMINI_MODEL).
+
+    Args:
+        path: Tenants file. A missing file means no kitchens.
+
+    Returns:
+        Read-only mapping of kitchen name to Tenant.
+
+    Raises:
+        TenantError: If the file is not valid
+    """
+    try:
+        data = json.loads(Path(path).read_text())
+    except FileNotFoundError:
+        return MappingProxyType({})
+    except (OSError, ValueError) as e:
+        raise TenantError(f"Can't read tenants file {path}: {e}")
+
+    if not isinstance(data, dict):
+        raise TenantError(f"Tenants file {path} must contain a JSON object")
+
+    tenants = {}
+    for name, entry in data.items():
+        if not KITCHEN_NAME.match(name):
+            raise TenantError(f"Invalid kitchen name {name!r}: use letters, digits, '-' and '_'")
+        if not isinstance(entry, dict) or not isinstance(entry.get('spreadsheet_id'), str):
+            raise TenantError(f"Kitchen {name!r} needs a spreadsheet_id")
+
+        settings = entry.get('settings') or {}
+        if not isinstance(settings, dict):
+            raise TenantError(f"settings of kitchen {name!r} must be an object")
+
+        tenants[name] = Tenant(
+            name=name,
+            spreadsheet_id=entry['spreadsheet_id'],
+            settings=tuple(sorted((str(key), str(value)) for key, value in settings.items()))
+        )
+
+    return MappingProxyType(tenants)
+
+
+class TenantStore(SnapshotStore[Mapping[str, Tenant]]):
+    """Kitchens from the tenants file, reloaded when it changes."""
+
+    def __init__(self, path: Path, poll_interval: float = 2.0):
+        """
+        Initialize the store and load the tenants file.
+
+        Args:
+            path: Tenants file
+            poll_interval: Seconds between change checks once started
+
+        Raises:
+            TenantError: If the file is not valid
+        """
+        path = Path(path)
+        super().__init__(
+            loader=lambda: load_tenants(path),
+            signature=lambda: file_signature([path]),
+            poll_interval=poll_interval
+        )
+
+    def get(self, name: str) -> Tenant:
+        """
+        Get a kitchen by name.
+
+        Raises:
+            TenantError: If there is no such kitchen
+        """
+        tenant = self.current.get(name)
+        if tenant is None:
+            raise TenantError(f"Unknown kitchen: {name}")
+        return tenant
+
+
+class TenantConfigStore:
+    """Config source for one kitchen: the process's current config snapshot
+    with the kitchen's values applied.
+
+    It follows the process's store, so .env reloads reach every kitchen.
+    There is nothing to watch of its own; start() and stop() do nothing.
+    """
+
+    def __init__(self, base: SnapshotStore[Config], tenant: Tenant):
+        """
+        Initialize the store.
+
+        Args:
+            base: Store holding the process's config snapshot
+            tenant: Kitchen to apply
+        """
+        self.base = base
+        self.tenant = tenant
+        self._snapshot: Tuple[Optional[Config], Optional[Config]] = (None, None)
+
+    @property
+    def current(self) -> Config:
+        """The kitchen's config, derived once per process snapshot."""
+        base_config, config = self._snapshot
+        current = self.base.current
+        if current is not base_config:
+            config = self.tenant.apply(current)
+            self._snapshot = (current, config)
+        return config
+
+    def start(self) -> None:
+        """Nothing to watch; the process's store is watched instead."""
+
+    def stop(self) -> None:
+        """Nothing to stop."""
+
+
+@dataclass
+class _TenantEntry:
+    tenant: Tenant
+    generator: MealPlanGenerator
+
+
+class TenantRegistry:
+    """Generators for the kitchens in use, evicted least recently used first.
+
+    Each kitchen gets a generator derived from the process's generator: it
+    has its own config and sheet snapshot in memory, and shares the API
+    clients, prompt files, response cache and plan archive. Up to
+    ``max_tenants`` kitchens, holding at most ``max_bytes`` of sheet
+    snapshots between them, are kept. An evicted kitchen's per-thread
+    Sheets clients are closed with it; its snapshot stays on disk, so it
+    comes back without downloading the workbook again.
+
+    A kitchen whose entry in the tenants file changes gets a new generator
+    on its next request.
+    """
+
+    def __init__(
+        self,
+        base: MealPlanGenerator,
+        tenants: TenantStore,
+        max_tenants: int = 64,
+        max_bytes: int = 256 * 1024 * 1024
+    ):
+        """
+        Initialize the registry.
+
+        Args:
+            base: Generator for requests without a kitchen
+            tenants: Store of known kitchens
+            max_tenants: Kitchens kept in memory
+            max_bytes: Total sheet snapshot size of the kitchens kept
+        """
+        self.base = base
+        self.tenants = tenants
+        self.max_tenants = max_tenants
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, _TenantEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def start(self) -> None:
+        """Start reloading the tenants file when it changes."""
+        self.tenants.start()
+
+    def stop(self) -> None:
+        """Stop watching the tenants file."""
+        self.tenants.stop()
+
+    def generator(self, kitchen: Optional[str] = None) -> MealPlanGenerator:
+        """
+        Get the generator for a kitchen.
+
+        Args:
+            kitchen: Kitchen name, or None for the process's own spreadsheet
+
+        Returns:
+            The kitchen's generator.
+
+        Raises:
+            TenantError: If the kitchen is unknown
+        """
+        if not kitchen:
+            return self.base
+
+        tenant = self.tenants.get(kitchen)
+        with self._lock:
+            entry = self._entries.get(kitchen)
+            if entry is not None and entry.tenant == tenant:
+                self._entries.move_to_end(kitchen)
+                self.hits += 1
+                return entry.generator
+
+            self.misses += 1
+            generator = self.base.derive(TenantConfigStore(self.base.config_store, tenant))
+            # The snapshot is loaded after this returns; check the byte cap then
+            generator.sheet_cache.on_change = self._snapshot_loaded
+            self._entries[kitchen] = _TenantEntry(tenant, generator)
+            self._entries.move_to_end(kitchen)
+            if entry is not None:
+                self._release(entry)
+            self._evict()
+
+        return generator
+
+    def stats(self) -> Dict:
+        """Get kitchen counts, snapshot memory and hit and eviction counts."""
+        with self._lock:
+            cached = len(self._entries)
+            snapshot_bytes = sum(entry.generator.sheet_cache.memory_bytes() for entry in self._entries.values())
+        return {
+            'kitchens': len(self.tenants.current),
+            'cached': cached,
+            'max_cached': self.max_tenants,
+            'snapshot_bytes': snapshot_bytes,
+            'max_snapshot_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'last_error': self.tenants.last_error
+        }
+
+    def _snapshot_loaded(self) -> None:
+        """Re-apply the limits once a kitchen's snapshot is in memory."""
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used kitchens past the limits; the caller
+        holds the lock. The most recently used kitchen is always kept."""
+        total = sum(entry.generator.sheet_cache.memory_bytes() for entry in self._entries.values())
+        while len(self._entries) > 1 and (len(self._entries) > self.max_tenants or total > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            total -= entry.generator.sheet_cache.memory_bytes()
+            self.evictions += 1
+            self._release(entry)
+
+    def _release(self, entry: _TenantEntry) -> None:
+        """Close the Sheets clients of a dropped kitchen, unless another
+        kitchen (or the process itself) reads the same spreadsheet."""
+        spreadsheet_id = entry.tenant.spreadsheet_id
+        in_use = {other.tenant.spreadsheet_id for other in self._entries.values()}
+        in_use.add(self.base.config.spreadsheet_id)
+        if spreadsheet_id not in in_use:
+            self.base.clients.release_sheets(spreadsheet_id)
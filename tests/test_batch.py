@@ -0,0 +1,159 @@
+"""Tests for the CLI batch mode."""
+
+import json
+import shutil
+import threading
+import time
+from argparse import Namespace
+from pathlib import Path
+
+import pytest
+
+import main
+from clients import ClientRegistry
+from config import Config
+from meal_plan_generator import MealPlanGenerator
+from sheet_loader import SheetData
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+
+class BatchLLM:
+    """Thread-safe LLM provider that records how many calls overlap."""
+
+    name = 'stub:batch'
+
+    def __init__(self, latency: float = 0.05, fail_on: str = ''):
+        self.latency = latency
+        self.fail_on = fail_on
+        self.calls = 0
+        self.running = 0
+        self.most_running = 0
+        self._lock = threading.Lock()
+
+    def generate_meal_plan(self, prompt, prefix=None):
+        with self._lock:
+            self.calls += 1
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        try:
+            time.sleep(self.latency)
+            if self.fail_on and self.fail_on in prompt:
+                raise RuntimeError("model unavailable")
+            return '# Tacos' if 'tacos' in prompt else '# Plan'
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+@pytest.fixture
+def script_dir(tmp_path, monkeypatch):
+    """Copy the prompt files and write batch output under tmp_path."""
+    for path in REPO_DIR.glob('prompt-*.md'):
+        shutil.copy(path, tmp_path)
+    (tmp_path / '.env').write_text(
+        'GOOGLE_API_KEY=key\nSPREADSHEET_ID=sheet\nGEMINI_MODEL=gemini-test\nPLAN_ARCHIVE=false\n'
+    )
+    monkeypatch.setattr(main, 'SCRIPT_DIR', tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Serve a fixed snapshot, counting the sheet loads."""
+    snapshot = SheetData(
+        config={'user_input': 'anything'},
+        sheet_context={},
+        food_sheets=[('Mains', [['Name', 'Style', 'Details'], ['Pad Thai', 'Thai', 'Serves 4']])]
+    )
+    loads = []
+
+    def load_snapshot(self, config, refresh_sheets):
+        loads.append(refresh_sheets)
+        return snapshot
+    monkeypatch.setattr(MealPlanGenerator, '_load_snapshot', load_snapshot)
+    return loads
+
+
+@pytest.fixture
+def make_generator(script_dir, monkeypatch):
+    """Build generators answering from a given BatchLLM, closed afterwards."""
+    generators = []
+
+    def make(llm: BatchLLM) -> MealPlanGenerator:
+        monkeypatch.setattr(ClientRegistry, 'llm', lambda self, config=None, structured=False: llm)
+        generators.append(MealPlanGenerator(Config(str(script_dir / '.env')), script_dir))
+        return generators[-1]
+    yield make
+
+    for generator in generators:
+        generator.shared_cache.close()
+        generator.clients.close()
+
+
+def batch_args(**values) -> Namespace:
+    args = {
+        'inputs': None, 'count': 1, 'concurrency': 4, 'output': 'md', 'refresh_sheets': False,
+        'no_cache': False, 'deadline': None, 'results': None
+    }
+    return Namespace(**{**args, **values})
+
+
+def test_plans_are_generated_with_bounded_concurrency(script_dir, loads, make_generator):
+    llm = BatchLLM()
+    generator = make_generator(llm)
+
+    assert main.run_batch(generator, batch_args(count=6, concurrency=2))
+    assert llm.calls == 6
+    assert llm.most_running == 2
+    assert loads == [False]
+    assert sorted(path.name for path in script_dir.glob('last-response-*')) == [
+        f'last-response-{number}.md' for number in range(1, 7)
+    ]
+    assert (script_dir / 'last-prompt.md').exists()
+
+
+def test_each_input_gets_its_own_prompt_and_plans(script_dir, loads, make_generator):
+    (script_dir / 'inputs.txt').write_text('tacos please\n\nsomething light\n')
+    results = script_dir / 'results.jsonl'
+    llm = BatchLLM()
+    generator = make_generator(llm)
+
+    assert main.run_batch(generator, batch_args(inputs=str(script_dir / 'inputs.txt'), count=2, results=str(results)))
+    assert loads == [False]
+    assert 'tacos please' in (script_dir / 'last-prompt-1.md').read_text()
+    assert 'something light' in (script_dir / 'last-prompt-2.md').read_text()
+    assert 'tokens' in (script_dir / 'last-prompt-1.md').read_text().rsplit('<!--', 1)[1]
+
+    records = [json.loads(line) for line in results.read_text().splitlines()]
+    assert [(record['index'], record['user_input'], record['response']) for record in records] == [
+        (1, 'tacos please', '# Tacos'),
+        (2, 'tacos please', '# Tacos'),
+        (3, 'something light', '# Plan'),
+        (4, 'something light', '# Plan'),
+    ]
+    assert all(record['latency_seconds'] > 0 and not record['cached'] for record in records)
+    assert not list(script_dir.glob('last-response-*'))
+
+
+def test_failed_plans_are_reported_and_fail_the_batch(script_dir, loads, make_generator, capsys):
+    (script_dir / 'inputs.txt').write_text('tacos please\nsomething light\n')
+    results = script_dir / 'results.jsonl'
+    generator = make_generator(BatchLLM(fail_on='something light'))
+
+    assert not main.run_batch(generator, batch_args(inputs=str(script_dir / 'inputs.txt'), results=str(results)))
+
+    records = [json.loads(line) for line in results.read_text().splitlines()]
+    assert records[0]['response'] == '# Tacos'
+    assert 'model unavailable' in records[1]['error']
+    assert 'Plans: 1 succeeded, 1 failed' in capsys.readouterr().err
+
+
+@pytest.mark.parametrize('value', ['0', '-2', 'four'])
+def test_counts_must_be_positive_whole_numbers(value, monkeypatch, capsys):
+    monkeypatch.setattr('sys.argv', ['lunchlady', '--count', '3', '--concurrency', value])
+
+    with pytest.raises(SystemExit) as exit_info:
+        main.main()
+    assert exit_info.value.code == 2
+    assert 'argument --concurrency' in capsys.readouterr().err
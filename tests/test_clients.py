@@ -0,0 +1,91 @@
+"""Tests for the API client registry."""
+
+import gc
+import threading
+import time
+
+import pytest
+
+from clients import ClientRegistry
+from config import Config
+from llm_providers import HedgedProvider
+
+
+@pytest.fixture
+def registry(tmp_path):
+    env_file = tmp_path / '.env'
+    env_file.write_text('GOOGLE_API_KEY=key\nSPREADSHEET_ID=sheet\nGEMINI_MODEL=gemini-test\n')
+    registry = ClientRegistry(Config(str(env_file)))
+    yield registry
+    registry.close()
+
+
+def test_sheets_client_is_reused_per_thread(registry):
+    assert registry.sheets() is registry.sheets()
+    assert registry.sheets('other').http is registry.sheets().http
+
+
+def test_api_resources_are_built_once_per_thread(registry):
+    spreadsheets = registry.sheets()._spreadsheets()
+    assert registry.sheets()._spreadsheets() is spreadsheets
+    assert registry.sheets('other')._spreadsheets() is spreadsheets
+
+
+def test_exited_threads_release_their_sheets_clients(registry):
+    def use_sheets():
+        registry.sheets()
+        registry.sheets('other')
+
+    for _ in range(5):
+        thread = threading.Thread(target=use_sheets)
+        thread.start()
+        thread.join()
+    gc.collect()
+
+    assert len(registry._thread_sheets) == 0
+
+
+def test_clients_follow_the_configs_api_key(registry):
+    kitchen = registry.config.with_values({'GOOGLE_API_KEY': 'kitchen-key'})
+
+    assert registry.sheets('sheet', 'kitchen-key').api_key == 'kitchen-key'
+    assert registry.sheets('sheet').api_key == 'key'
+    assert registry.gemini(kitchen).client is not registry.gemini().client
+
+
+def test_context_cache_holds_entries_for_every_kitchen(registry):
+    config = registry.config.with_values({'GEMINI_CONTEXT_CACHE': 'true', 'TENANT_CACHE_SIZE': '100'})
+
+    assert registry.gemini(config).context_cache.max_entries == 400
+
+
+def test_close_shuts_down_hedged_provider_pools(registry):
+    hedged = HedgedProvider([registry.gemini()], registry.provider_stats)
+    registry._hedged_providers[('test',)] = hedged
+
+    registry.close()
+    assert hedged.executor._shutdown
+
+
+def test_speculation_is_skipped_while_the_pool_is_busy(registry):
+    release = threading.Event()
+    running = [registry.speculate(release.wait) for _ in range(registry.config.speculation_workers)]
+
+    assert all(running)
+    assert registry.speculate(lambda: None) is None
+    release.set()
+    for future in running:
+        future.result()
+    # Slots are released by done callbacks, just after the results are set
+    deadline = time.monotonic() + 1
+    while (future := registry.speculate(lambda: 'ok')) is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert future.result() == 'ok'
+
+
+def test_failed_speculation_submit_releases_its_slot(registry):
+    registry._speculation_executor.shutdown()
+
+    for _ in range(registry.config.speculation_workers + 1):
+        with pytest.raises(RuntimeError):
+            registry.speculate(lambda: None)
@@ -0,0 +1,151 @@
+"""Tests for the Gemini context cache manager against a fake caches API."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from context_cache import ContextCacheManager
+
+MODEL = 'gemini-test'
+PREFIX = 'word ' * 2000
+
+
+class FakeCaches:
+    """In-memory stand-in for client.caches."""
+
+    def __init__(self, fail_create: bool = False):
+        self.fail_create = fail_create
+        self.entries = {}
+        self.calls = []
+
+    def list(self):
+        self.calls.append('list')
+        return list(self.entries.values())
+
+    def create(self, model, config):
+        self.calls.append('create')
+        if self.fail_create:
+            raise RuntimeError("cache creation rejected")
+        name = f'cachedContents/{len(self.entries)}'
+        self.entries[name] = SimpleNamespace(
+            name=name,
+            display_name=config.display_name,
+            expire_time=datetime.now(timezone.utc) + timedelta(seconds=int(config.ttl[:-1]))
+        )
+        return self.entries[name]
+
+    def update(self, name, config):
+        self.calls.append('update')
+        if name not in self.entries:
+            raise RuntimeError("not found")
+        self.entries[name].expire_time = datetime.now(timezone.utc) + timedelta(seconds=int(config.ttl[:-1]))
+
+    def delete(self, name):
+        self.calls.append('delete')
+        self.entries.pop(name, None)
+
+
+class FakeAsyncCaches:
+    """Async view of a FakeCaches, like client.aio.caches."""
+
+    def __init__(self, caches: FakeCaches):
+        self.caches = caches
+
+    async def list(self):
+        entries = self.caches.list()
+
+        async def pager():
+            for entry in entries:
+                yield entry
+        return pager()
+
+    async def create(self, **kwargs):
+        return self.caches.create(**kwargs)
+
+    async def update(self, **kwargs):
+        return self.caches.update(**kwargs)
+
+    async def delete(self, **kwargs):
+        return self.caches.delete(**kwargs)
+
+
+def fake_client(caches: FakeCaches):
+    return SimpleNamespace(caches=caches, aio=SimpleNamespace(caches=FakeAsyncCaches(caches)))
+
+
+def test_handle_is_reused_by_key():
+    caches = FakeCaches()
+    manager = ContextCacheManager(fake_client(caches))
+
+    name = manager.get(MODEL, PREFIX)
+    assert name is not None
+    assert manager.get(MODEL, PREFIX) == name
+    assert caches.calls.count('create') == 1
+    assert manager.stats()['hits'] == 1
+
+
+def test_other_process_handle_is_found_by_display_name():
+    caches = FakeCaches()
+    name = ContextCacheManager(fake_client(caches)).get(MODEL, PREFIX)
+
+    assert ContextCacheManager(fake_client(caches)).get(MODEL, PREFIX) == name
+    assert caches.calls.count('create') == 1
+
+
+def test_handle_near_expiry_is_renewed():
+    caches = FakeCaches()
+    manager = ContextCacheManager(fake_client(caches), ttl=3600)
+    name = manager.get(MODEL, PREFIX)
+
+    key = manager.make_key(MODEL, PREFIX)
+    manager._handles[key].expires_at -= 3600
+    assert manager.get(MODEL, PREFIX) == name
+    assert caches.calls.count('update') == 1
+    assert manager.stats()['renewals'] == 1
+
+
+def test_least_recently_used_handle_is_deleted():
+    caches = FakeCaches()
+    manager = ContextCacheManager(fake_client(caches), max_entries=2)
+    first = manager.get(MODEL, PREFIX + 'a')
+    manager.get(MODEL, PREFIX + 'b')
+    manager.get(MODEL, PREFIX + 'a')
+    manager.get(MODEL, PREFIX + 'c')
+
+    assert first in caches.entries
+    assert len(caches.entries) == 2
+    assert caches.calls.count('delete') == 1
+
+
+def test_failed_create_falls_back_and_backs_off():
+    caches = FakeCaches(fail_create=True)
+    manager = ContextCacheManager(fake_client(caches))
+
+    assert manager.get(MODEL, PREFIX) is None
+    assert manager.get(MODEL, PREFIX) is None
+    assert caches.calls.count('create') == 1
+    assert manager.stats()['failures'] == 1
+
+
+def test_short_prefix_is_not_cached():
+    caches = FakeCaches()
+    assert ContextCacheManager(fake_client(caches)).get(MODEL, 'short') is None
+    assert caches.calls == []
+
+
+def test_async_reuse_renewal_and_fallback():
+    caches = FakeCaches()
+    manager = ContextCacheManager(fake_client(caches))
+
+    async def scenario():
+        name = await manager.aget(MODEL, PREFIX)
+        assert await manager.aget(MODEL, PREFIX) == name
+        manager._handles[manager.make_key(MODEL, PREFIX)].expires_at -= 3600
+        assert await manager.aget(MODEL, PREFIX) == name
+        caches.fail_create = True
+        assert await manager.aget(MODEL, PREFIX + 'x') is None
+
+    asyncio.run(scenario())
+    assert caches.calls.count('create') == 2
+    assert caches.calls.count('update') == 1
+    assert manager.stats()['failures'] == 1
@@ -0,0 +1,166 @@
+"""Tests for the warm daemon and the CLI's use of it."""
+
+import shutil
+import tempfile
+import threading
+import time
+from argparse import Namespace
+from pathlib import Path
+
+import pytest
+
+import main
+from clients import ClientRegistry
+from daemon import DaemonClient, DaemonError, LunchLadyDaemon
+from gemini_client import GeminiClientError
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+
+class DaemonLLM:
+    """LLM provider answering with a fixed plan, or failing."""
+
+    name = 'stub:daemon'
+
+    def __init__(self):
+        self.fail = False
+
+    def generate_meal_plan(self, prompt, prefix=None):
+        if self.fail:
+            raise GeminiClientError("quota exceeded")
+        return '# Plan'
+
+    def stream_meal_plan(self, prompt, prefix=None):
+        yield '# Pl'
+        yield 'an'
+
+
+@pytest.fixture
+def script_dir(monkeypatch):
+    # Unix socket paths are limited to about 100 characters, so not tmp_path
+    directory = Path(tempfile.mkdtemp(prefix='lunchlady-'))
+    for path in REPO_DIR.glob('prompt-*.md'):
+        shutil.copy(path, directory)
+    (directory / '.env').write_text(
+        'GOOGLE_API_KEY=key\nSPREADSHEET_ID=sheet\nGEMINI_MODEL=gemini-test\nPLAN_ARCHIVE=false\n'
+    )
+    monkeypatch.setattr(main, 'SCRIPT_DIR', directory)
+    yield directory
+    shutil.rmtree(directory)
+
+
+class FakeSheetsClient:
+    """Stand-in for SheetsClient, counting workbook downloads."""
+
+    downloads = 0
+
+    def get_revision(self):
+        return '1'
+
+    def read_workbook(self):
+        FakeSheetsClient.downloads += 1
+        return [('Mains', [['Name', 'Style', 'Details'], ['Pad Thai', 'Thai', 'Serves 4']])]
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """Answer from a DaemonLLM, with the sheets from a FakeSheetsClient."""
+    monkeypatch.setattr(FakeSheetsClient, 'downloads', 0)
+    monkeypatch.setattr(ClientRegistry, 'sheets', lambda self, spreadsheet_id, api_key: FakeSheetsClient())
+    llm = DaemonLLM()
+    monkeypatch.setattr(ClientRegistry, 'llm', lambda self, config=None, structured=False: llm)
+    return llm
+
+
+@pytest.fixture
+def daemon(script_dir, llm):
+    """A daemon serving on a socket in script_dir until the test ends."""
+    daemon = LunchLadyDaemon(str(script_dir / '.env'), script_dir / 'daemon.sock', script_dir)
+    daemon.warm_up()
+    thread = threading.Thread(target=daemon.serve_forever)
+    thread.start()
+
+    deadline = time.monotonic() + 5
+    while DaemonClient(daemon.socket_path).connect() is None:
+        assert time.monotonic() < deadline, "daemon didn't start"
+        time.sleep(0.01)
+    yield daemon
+
+    daemon.shutdown()
+    thread.join()
+
+
+def request(daemon, **options) -> list:
+    client = DaemonClient(daemon.socket_path, timeout=10)
+    options = {'env_file': str(daemon.env_file), **options}
+    return list(client.request(client.connect(), options))
+
+
+def cli_args(script_dir: Path, **values) -> Namespace:
+    args = {
+        'socket': str(script_dir / 'daemon.sock'), 'env_file': str(script_dir / '.env'), 'kitchen': None,
+        'output': 'md', 'refresh_sheets': False, 'no_cache': False, 'stream': False, 'deadline': None,
+        'timings': False
+    }
+    return Namespace(**{**args, **values})
+
+
+def test_requests_reuse_the_warm_generator(daemon):
+    first = request(daemon)
+    second = request(daemon)
+
+    assert [message['type'] for message in first] == ['accepted', 'result']
+    assert first[0]['model'] == 'gemini-test'
+    assert first[1]['result']['response'] == '# Plan'
+    assert second[1]['result']['response'] == '# Plan'
+    # Downloaded once by warm_up(), then served from memory
+    assert FakeSheetsClient.downloads == 1
+
+
+def test_streamed_requests_send_the_prompt_then_chunks(daemon):
+    messages = request(daemon, stream=True)
+
+    assert [message['type'] for message in messages] == ['accepted', 'prompt', 'chunk', 'chunk', 'done']
+    assert 'Pad Thai' in messages[1]['text']
+    assert ''.join(message['text'] for message in messages[2:4]) == '# Plan'
+
+
+def test_other_env_files_are_not_served(daemon, script_dir):
+    messages = request(daemon, env_file=str(script_dir / 'other.env'))
+
+    assert [message['type'] for message in messages] == ['unsupported']
+
+
+def test_errors_are_raised_under_their_own_type(daemon, llm):
+    llm.fail = True
+
+    with pytest.raises(GeminiClientError, match="quota exceeded"):
+        request(daemon)
+
+
+def test_second_daemon_on_the_same_socket_is_refused(daemon, script_dir):
+    other = LunchLadyDaemon(str(script_dir / '.env'), daemon.socket_path, script_dir)
+
+    with pytest.raises(DaemonError, match="already listening"):
+        other.serve_forever()
+    other.clients.close()
+
+
+def test_cli_hands_the_run_to_the_daemon(daemon, script_dir, capsys):
+    assert main.run_with_daemon(cli_args(script_dir))
+
+    assert capsys.readouterr().out == '# Plan\n'
+    assert (script_dir / 'last-response.md').read_text() == '# Plan'
+    assert 'Pad Thai' in (script_dir / 'last-prompt.md').read_text()
+
+
+def test_cli_streams_through_the_daemon(daemon, script_dir, capsys):
+    assert main.run_with_daemon(cli_args(script_dir, stream=True))
+
+    assert capsys.readouterr().out == '# Plan\n'
+    assert (script_dir / 'last-response.md').read_text() == '# Plan'
+
+
+def test_cli_runs_in_process_without_a_daemon(script_dir):
+    assert DaemonClient(script_dir / 'daemon.sock').connect() is None
+    assert not main.run_with_daemon(cli_args(script_dir))
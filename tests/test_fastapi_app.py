@@ -0,0 +1,146 @@
+"""Tests for the FastAPI web interface."""
+
+import asyncio
+import time
+from typing import Optional
+
+import pytest
+from fastapi.testclient import TestClient
+
+from clients import ClientRegistry
+from fastapi_app import app
+from gemini_client import GeminiClientError
+from meal_plan_generator import MealPlanGenerator
+from openai_client import OpenAIClientError
+from sheet_loader import SheetData
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    (tmp_path / '.env').write_text(
+        'GOOGLE_API_KEY=key\nSPREADSHEET_ID=sheet\nGEMINI_MODEL=gemini-test\n'
+        f'SHEET_CACHE_DIR={tmp_path}/cache\nSHARED_CACHE_DB={tmp_path}/shared.sqlite3\n'
+        f'PLAN_ARCHIVE_DB={tmp_path}/plans.sqlite3\nTENANTS_FILE={tmp_path}/tenants.json\n'
+        'PLAN_POOL_SIZE=0\nJOB_WORKERS=0\n'
+    )
+    # The app reads .env from the working directory
+    monkeypatch.chdir(tmp_path)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_openai_errors_are_reported_as_such(client, monkeypatch):
+    async def failing_agenerate(self, *args, **kwargs):
+        raise OpenAIClientError("quota exceeded")
+
+    monkeypatch.setattr(MealPlanGenerator, 'agenerate', failing_agenerate)
+    response = client.get('/new?format=md')
+
+    assert response.status_code == 500
+    assert response.json()['detail'] == "OpenAI API error: quota exceeded"
+
+
+class ChunkedLLM:
+    """LLM provider streaming fixed chunks, optionally failing partway."""
+
+    name = 'stub:chunked'
+
+    def __init__(self, chunks, delay: float = 0.0, fail_after: Optional[int] = None, on_end=None):
+        self.chunks = chunks
+        self.delay = delay
+        self.fail_after = fail_after
+        self.on_end = on_end
+
+    async def astream_meal_plan(self, prompt, prefix=None):
+        for number, chunk in enumerate(self.chunks):
+            if number == self.fail_after:
+                raise GeminiClientError("connection reset")
+            if number:
+                await asyncio.sleep(self.delay)
+            yield chunk
+        if self.on_end:
+            self.on_end()
+
+
+@pytest.fixture
+def stream_llm(monkeypatch):
+    """Serve a fixed snapshot and stream from the LLM the test sets."""
+    snapshot = SheetData(
+        config={},
+        sheet_context={},
+        food_sheets=[('Mains', [['Name', 'Style', 'Details'], ['Pad Thai', 'Thai', 'Serves 4']])]
+    )
+    monkeypatch.setattr(MealPlanGenerator, '_load_snapshot', lambda self, config, refresh_sheets: snapshot)
+    llms = {}
+    monkeypatch.setattr(ClientRegistry, 'llm', lambda self, config=None, structured=False: llms['llm'])
+
+    def use(llm):
+        llms['llm'] = llm
+        return llm
+    return use
+
+
+def history(client) -> list:
+    return client.get('/plans/history').json()['plans']
+
+
+def test_stream_reports_the_first_chunk_time(client, stream_llm):
+    stream_llm(ChunkedLLM(['<h1>Plan</h1>', '<p>Monday</p>', '<p>Tuesday</p>'], delay=0.5))
+    start = time.perf_counter()
+    response = client.get('/new/stream')
+    elapsed = time.perf_counter() - start
+
+    assert response.status_code == 200
+    assert response.text == '<h1>Plan</h1><p>Monday</p><p>Tuesday</p>'
+    ttfb = float(response.headers['Server-Timing'].split('dur=')[1]) / 1000
+    assert elapsed >= 1.0
+    assert ttfb < 0.5
+
+
+def test_stream_failing_before_the_first_chunk_is_a_500(client, stream_llm):
+    stream_llm(ChunkedLLM(['<h1>Plan</h1>'], fail_after=0))
+    response = client.get('/new/stream')
+
+    assert response.status_code == 500
+    assert response.json()['detail'] == "Gemini API error: connection reset"
+    assert history(client) == []
+
+
+def test_stream_failing_partway_is_cut_off_and_not_archived(client, stream_llm):
+    stream_llm(ChunkedLLM(['<h1>Plan</h1>', '<p>Monday</p>', '<p>Tuesday</p>'], fail_after=2))
+
+    with pytest.raises(GeminiClientError):
+        client.get('/new/stream')
+    assert history(client) == []
+
+
+def test_stream_is_archived_once_it_ends(client, stream_llm):
+    archived_before_end = []
+    archive = app.state.generator.archive
+    stream_llm(ChunkedLLM(
+        ['<h1>Plan</h1>', '<p>Monday</p>'],
+        on_end=lambda: archived_before_end.extend(archive.history(10))
+    ))
+    response = client.get('/new/stream')
+
+    assert archived_before_end == []
+    plans = history(client)
+    assert len(plans) == 1
+    assert plans[0]['output_format'] == 'html'
+    assert client.get(f"/plans/history/{plans[0]['id']}").json()['response'] == response.text
+
+
+def test_plan_history_pages_through_the_archive(client):
+    archive = app.state.generator.archive
+    ids = [archive.record(prompt='prompt', response=f'# Plan {n}', output_format='md') for n in range(3)]
+
+    first = client.get('/plans/history?limit=2').json()
+    second = client.get(f"/plans/history?limit=2&before={first['next_before']}").json()
+    assert [plan['id'] for plan in first['plans'] + second['plans']] == ids[::-1]
+    assert second['next_before'] is None
+    assert client.get(f'/plans/history/{ids[0]}').json()['response'] == '# Plan 0'
+
+
+def test_plan_history_rejects_bad_queries(client):
+    assert client.get('/plans/history?since=yesterday').status_code == 400
+    assert client.get('/plans/history/999').status_code == 404
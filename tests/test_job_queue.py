@@ -0,0 +1,83 @@
+"""Tests for the background job queue."""
+
+import threading
+import time
+from types import SimpleNamespace
+
+from job_queue import DONE, RUNNING, JobQueue, JobStore
+
+
+class FakeGenerator:
+    """Generator stand-in whose generations wait for a release."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def generate(self, output_format, no_cache=False):
+        self.started.set()
+        self.release.wait(5)
+        return SimpleNamespace(response='plan', prompt='prompt', plan_json=None, cached=False)
+
+
+def wait_for(condition, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_stop_waits_for_the_running_job(tmp_path):
+    generator = FakeGenerator()
+    store = JobStore(tmp_path / 'jobs.sqlite3')
+    queue = JobQueue(generator, store, workers=1, poll_interval=0.01)
+    queue.start()
+    job = queue.submit('md')
+    generator.started.wait(2)
+
+    generator.release.set()
+    assert queue.stop(2)
+    assert store.get(job.id).status == DONE
+    store.close()
+
+
+def test_job_outliving_stop_is_left_for_requeue(tmp_path):
+    generator = FakeGenerator()
+    store = JobStore(tmp_path / 'jobs.sqlite3')
+    queue = JobQueue(generator, store, workers=1, poll_interval=0.01)
+    queue.start()
+    job = queue.submit('md')
+    generator.started.wait(2)
+
+    assert not queue.stop(0.05)
+    generator.release.set()
+    time.sleep(0.1)
+    assert store.get(job.id).status == RUNNING
+    store.close()
+
+
+def test_failed_finish_is_recorded_and_the_worker_goes_on(tmp_path):
+    generator = FakeGenerator()
+    generator.release.set()
+    store = JobStore(tmp_path / 'jobs.sqlite3')
+    finish = store.finish
+    failures = []
+
+    def flaky_finish(job_id, **outcome):
+        if not failures:
+            failures.append(job_id)
+            raise RuntimeError("database is locked")
+        return finish(job_id, **outcome)
+
+    store.finish = flaky_finish
+    queue = JobQueue(generator, store, workers=1, poll_interval=0.01)
+    queue.start()
+    first = queue.submit('md')
+    assert wait_for(lambda: queue.last_error is not None)
+    second = queue.submit('md')
+
+    assert wait_for(lambda: store.get(second.id).status == DONE)
+    assert store.get(first.id).status == RUNNING
+    assert first.id in queue.stats()['last_error']
+    assert queue.stop(2)
+    store.close()
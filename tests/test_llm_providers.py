@@ -0,0 +1,118 @@
+"""Tests for hedging and failover across LLM providers."""
+
+import asyncio
+import time
+
+import pytest
+
+from llm_providers import HedgedProvider, LLMProviderError
+
+
+class FakeProvider:
+    """Provider answering after a fixed latency, or failing."""
+
+    def __init__(self, name: str, latency: float = 0.0, fail: bool = False):
+        self.name = name
+        self.latency = latency
+        self.fail = fail
+        self.started = []
+        self.cancelled = False
+
+    def _answer(self) -> str:
+        if self.fail:
+            raise RuntimeError(f"{self.name} is down")
+        return f'plan from {self.name}'
+
+    def generate_meal_plan(self, prompt, prefix=None):
+        self.started.append(time.monotonic())
+        time.sleep(self.latency)
+        return self._answer()
+
+    async def agenerate_meal_plan(self, prompt, prefix=None):
+        self.started.append(time.monotonic())
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self._answer()
+
+    def stream_meal_plan(self, prompt, prefix=None):
+        yield self._answer()
+        yield ' (more)'
+
+    async def astream_meal_plan(self, prompt, prefix=None):
+        yield self._answer()
+        yield ' (more)'
+
+
+def hedged(*providers, initial_delay: float = 0.05, timeout=None) -> HedgedProvider:
+    return HedgedProvider(list(providers), {}, initial_delay=initial_delay, timeout=timeout)
+
+
+def test_hedge_starts_after_the_delay_and_the_first_answer_wins():
+    primary, backup = FakeProvider('primary', latency=0.5), FakeProvider('backup')
+    provider = hedged(primary, backup)
+
+    assert provider.generate_meal_plan('prompt') == 'plan from backup'
+    assert 0.05 <= backup.started[0] - primary.started[0] < 0.3
+    assert provider.stats['backup'].wins == 1
+    assert provider.stats['primary'].losses == 1
+    provider.close()
+
+
+def test_fast_primary_is_not_hedged():
+    primary, backup = FakeProvider('primary', latency=0.01), FakeProvider('backup')
+    provider = hedged(primary, backup, initial_delay=0.5)
+
+    assert provider.generate_meal_plan('prompt') == 'plan from primary'
+    assert backup.started == []
+    provider.close()
+
+
+def test_async_hedge_cancels_the_loser():
+    primary, backup = FakeProvider('primary', latency=5), FakeProvider('backup')
+    provider = hedged(primary, backup)
+
+    async def scenario():
+        response = await provider.agenerate_meal_plan('prompt')
+        # Let the cancellation reach the losing task
+        await asyncio.sleep(0)
+        return response
+
+    start = time.monotonic()
+    assert asyncio.run(scenario()) == 'plan from backup'
+    assert time.monotonic() - start < 1
+    assert primary.cancelled
+    assert 0.05 <= backup.started[0] - primary.started[0] < 0.3
+
+
+def test_failing_primary_fails_over_without_waiting_for_the_hedge():
+    primary, backup = FakeProvider('primary', fail=True), FakeProvider('backup')
+    provider = hedged(primary, backup, initial_delay=10)
+
+    start = time.monotonic()
+    assert provider.generate_meal_plan('prompt') == 'plan from backup'
+    assert asyncio.run(provider.agenerate_meal_plan('prompt')) == 'plan from backup'
+    assert time.monotonic() - start < 1
+    assert provider.stats['primary'].errors == 2
+    provider.close()
+
+
+def test_all_providers_failing_raises():
+    provider = hedged(FakeProvider('primary', fail=True), FakeProvider('backup', fail=True))
+
+    with pytest.raises(LLMProviderError, match='primary: primary is down; backup: backup is down'):
+        provider.generate_meal_plan('prompt')
+    provider.close()
+
+
+def test_stream_fails_over_before_the_first_chunk():
+    provider = hedged(FakeProvider('primary', fail=True), FakeProvider('backup'))
+
+    async def astream():
+        return [chunk async for chunk in provider.astream_meal_plan('prompt')]
+
+    assert list(provider.stream_meal_plan('prompt')) == ['plan from backup', ' (more)']
+    assert asyncio.run(astream()) == ['plan from backup', ' (more)']
+    provider.close()
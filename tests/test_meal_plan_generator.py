@@ -0,0 +1,104 @@
+"""Tests for the meal plan generator."""
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+from clients import ClientRegistry
+from config import Config
+from meal_plan_generator import MealPlanGenerator
+from plan_renderer import PlanRenderError
+from sheet_loader import SheetData
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def script_dir(tmp_path):
+    for path in REPO_DIR.glob('prompt-*.md'):
+        shutil.copy(path, tmp_path)
+    (tmp_path / '.env').write_text('GOOGLE_API_KEY=key\nSPREADSHEET_ID=sheet\nGEMINI_MODEL=gemini-test\n')
+    return tmp_path
+
+
+def make_generator(script_dir: Path, **values) -> MealPlanGenerator:
+    config = Config(str(script_dir / '.env')).with_values(values)
+    return MealPlanGenerator(config, script_dir)
+
+
+def test_supported_formats_follow_the_prompt_files(script_dir):
+    generator = make_generator(script_dir)
+
+    assert generator.supports_format('md')
+    assert generator.supports_format('html')
+    assert not generator.supports_format('pdf')
+    assert not generator.supports_format('../prompt-top')
+
+
+def test_structured_output_renders_template_formats(script_dir):
+    (script_dir / 'prompt-output-html.md').unlink()
+
+    assert not make_generator(script_dir).supports_format('html')
+    assert make_generator(script_dir, STRUCTURED_OUTPUT='true').supports_format('html')
+
+
+def test_malformed_structured_reply_is_rejected_before_caching(script_dir):
+    generator = make_generator(script_dir, STRUCTURED_OUTPUT='true')
+    reply = '{"days": [{"name": "Monday", "meals": ["Pad Thai"]}], "shopping": [], "pre_prep": []}'
+
+    with pytest.raises(PlanRenderError):
+        generator._check_response(reply, 'json')
+
+
+class CountingLLM:
+    """LLM provider returning a numbered plan per call."""
+
+    name = 'stub:counting'
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate_meal_plan(self, prompt, prefix=None):
+        self.calls += 1
+        return f'# Plan {self.calls}'
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """Serve a fixed snapshot and answer from a CountingLLM."""
+    snapshot = SheetData(
+        config={},
+        sheet_context={},
+        food_sheets=[('Mains', [['Name', 'Style', 'Details'], ['Pad Thai', 'Thai', 'Serves 4']])]
+    )
+    monkeypatch.setattr(MealPlanGenerator, '_load_snapshot', lambda self, config, refresh_sheets: snapshot)
+    llm = CountingLLM()
+    monkeypatch.setattr(ClientRegistry, 'llm', lambda self, config=None, structured=False: llm)
+    return llm
+
+
+def test_repeated_prompts_are_served_from_the_response_cache(script_dir, llm):
+    generator = make_generator(script_dir, RESPONSE_CACHE='true', PLAN_ARCHIVE='false')
+
+    first = generator.generate()
+    second = generator.generate()
+    fresh = generator.generate(no_cache=True)
+
+    assert (first.response, first.cached) == ('# Plan 1', False)
+    assert (second.response, second.cached) == ('# Plan 1', True)
+    assert (fresh.response, fresh.cached) == ('# Plan 2', False)
+    assert llm.calls == 2
+    assert generator.response_cache.stats()['hits'] == 1
+    generator.shared_cache.close()
+
+
+def test_response_cache_is_off_by_default(script_dir, llm):
+    generator = make_generator(script_dir, PLAN_ARCHIVE='false')
+
+    generator.generate()
+    generator.generate()
+
+    assert generator.response_cache is None
+    assert llm.calls == 2
+    generator.shared_cache.close()
@@ -0,0 +1,171 @@
+"""Tests for the plan archive and the history command."""
+
+import gzip
+import json
+
+import pytest
+
+import main
+from plan_archive import PlanArchive, content_hash, parse_time
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = PlanArchive(tmp_path / 'plans.sqlite3')
+    yield archive
+    archive.close()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Record plans at times set by the test."""
+    clock = {'now': 1000.0}
+    monkeypatch.setattr('time.time', lambda: clock['now'])
+    return clock
+
+
+def test_plans_round_trip_with_their_bodies(archive):
+    plan_id = archive.record(
+        prompt='prompt', response='# Plan', output_format='md', model='gemini:test',
+        sheet_hash='abc123', plan_json='{"days": []}', cached=True
+    )
+
+    plan = archive.get(plan_id, include_prompt=True)
+    assert (plan.response, plan.prompt, plan.plan_json) == ('# Plan', 'prompt', '{"days": []}')
+    assert (plan.model, plan.output_format, plan.sheet_hash, plan.cached) == ('gemini:test', 'md', 'abc123', True)
+    assert plan.prompt_hash == content_hash('prompt')
+    assert archive.get(plan_id).prompt is None
+    assert archive.get(plan_id + 1) is None
+
+
+def test_bodies_are_compressed_and_stored_once(archive):
+    prompt = 'food table row\n' * 1000
+    for response in ('# Plan 1', '# Plan 2', '# Plan 1'):
+        archive.record(prompt=prompt, response=response, output_format='md')
+
+    assert archive.stats()['plans'] == 3
+    assert archive.stats()['bodies'] == 3
+    data = archive._db.execute('SELECT data FROM bodies WHERE hash = ?', (content_hash(prompt),)).fetchone()[0]
+    assert len(data) < len(prompt) / 10
+    assert gzip.decompress(data).decode() == prompt
+
+
+def test_history_pages_newest_first(archive):
+    ids = [archive.record(prompt='prompt', response=f'# Plan {n}', output_format='md') for n in range(5)]
+
+    first = archive.history(limit=2)
+    second = archive.history(limit=2, before_id=first[-1].id)
+    assert [plan.id for plan in first + second] == ids[::-1][:4]
+    assert first[0].response is None
+
+
+def test_history_filters_by_time_format_and_hash(archive, clock):
+    for hour, output_format, prompt in ((0, 'md', 'alpha'), (1, 'html', 'beta'), (2, 'md', 'beta')):
+        clock['now'] = 1000.0 + hour * 3600
+        archive.record(prompt=prompt, response='# Plan', output_format=output_format, sheet_hash=f'sheet{hour}')
+
+    def ids(**filters):
+        return [plan.id for plan in archive.history(**filters)]
+
+    assert ids(since=1000.0 + 3600) == [3, 2]
+    assert ids(until=1000.0 + 3600) == [1]
+    assert ids(since=1000.0, until=1000.0 + 7200) == [2, 1]
+    assert ids(output_format='md') == [3, 1]
+    assert ids(hash_prefix=content_hash('beta')[:8].upper()) == [3, 2]
+    assert ids(hash_prefix='sheet0') == [1]
+    assert ids(output_format='html', hash_prefix=content_hash('alpha')[:8]) == []
+
+
+def test_time_filtered_history_pages_by_time(archive, clock):
+    ids = []
+    for hour in range(5):
+        clock['now'] = 1000.0 + hour * 3600
+        ids.append(archive.record(prompt='prompt', response=f'# Plan {hour}', output_format='md'))
+
+    first = archive.history(limit=2, since=1000.0)
+    second = archive.history(limit=2, before_id=first[-1].id, since=1000.0)
+    assert [plan.id for plan in first + second] == ids[::-1][:4]
+
+
+def query_plan(archive: PlanArchive, where: str, params: list, order: str = 'id DESC') -> list:
+    """SQLite's plan for a history query, one step per item."""
+    rows = archive._db.execute(f'EXPLAIN QUERY PLAN SELECT * FROM plans WHERE {where} ORDER BY {order} LIMIT 20', params)
+    return [row['detail'] for row in rows]
+
+
+@pytest.mark.parametrize('where, params', [
+    ('output_format = ?', ['md']),
+    ('((prompt_hash >= ? AND prompt_hash < ?) OR (sheet_hash >= ? AND sheet_hash < ?))', ['abc', 'abc\uffff'] * 2),
+    ('id < ?', [10]),
+])
+def test_format_hash_and_page_lookups_use_an_index(archive, where, params):
+    assert 'SCAN plans' not in query_plan(archive, where, params)
+
+
+@pytest.mark.parametrize('where, params', [
+    ('created_at >= ?', [1000.0]),
+    ('created_at < ?', [1000.0]),
+    ('created_at >= ? AND (created_at, id) < (SELECT created_at, id FROM plans WHERE id = ?)', [1000.0, 10]),
+])
+def test_time_lookups_use_the_time_index_in_order(archive, where, params):
+    steps = query_plan(archive, where, params, order='created_at DESC, id DESC')
+
+    assert 'SCAN plans' not in steps
+    assert 'USE TEMP B-TREE FOR ORDER BY' not in steps
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('1700000000', 1700000000.0),
+    ('1700000000.5', 1700000000.5),
+])
+def test_times_parse_as_unix_seconds(value, expected):
+    assert parse_time(value) == expected
+
+
+def test_times_parse_as_iso_dates():
+    assert parse_time('2026-05-01') < parse_time('2026-05-01T12:00') < parse_time('2026-05-02')
+
+
+def test_invalid_times_are_rejected():
+    with pytest.raises(ValueError, match="Invalid time 'yesterday'"):
+        parse_time('yesterday')
+
+
+@pytest.fixture
+def env_file(tmp_path):
+    env_file = tmp_path / '.env'
+    env_file.write_text(
+        f'GOOGLE_API_KEY=key\nSPREADSHEET_ID=sheet\nGEMINI_MODEL=gemini-test\nPLAN_ARCHIVE_DB={tmp_path}/plans.sqlite3\n'
+    )
+    return str(env_file)
+
+
+def test_history_command_lists_and_shows_plans(tmp_path, env_file, capsys):
+    archive = PlanArchive(tmp_path / 'plans.sqlite3')
+    first = archive.record(prompt='prompt', response='# Plan 1', output_format='md', model='gemini:test')
+    second = archive.record(prompt='prompt', response='<h1>Plan 2</h1>', output_format='html')
+    archive.close()
+
+    main.run_history(['--env-file', env_file, '--json'])
+    listed = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [plan['id'] for plan in listed] == [second, first]
+
+    main.run_history(['--env-file', env_file, '--format', 'md'])
+    table = capsys.readouterr().out.splitlines()
+    assert len(table) == 2 and 'gemini:test' in table[1]
+
+    main.run_history(['--env-file', env_file, '--show', str(first)])
+    assert capsys.readouterr().out == '# Plan 1\n'
+    main.run_history(['--env-file', env_file, '--show', str(first), '--prompt'])
+    assert capsys.readouterr().out == 'prompt\n'
+
+
+def test_history_command_reports_bad_input(env_file, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main.run_history(['--env-file', env_file, '--since', 'yesterday'])
+    assert exit_info.value.code == 1
+    assert "Invalid time 'yesterday'" in capsys.readouterr().err
+
+    with pytest.raises(SystemExit):
+        main.run_history(['--env-file', env_file, '--show', '99'])
+    assert 'No archived plan #99' in capsys.readouterr().err
@@ -0,0 +1,127 @@
+"""Tests for the pre-generated plan pool."""
+
+import asyncio
+from types import SimpleNamespace
+
+from plan_pool import PlanPool
+
+
+class FakeGenerator:
+    """Generator whose plans are numbered and tagged with the current prompt."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.prompt = 'prompt 1'
+        self.fail = False
+        self.generated = 0
+        self.archived = []
+
+    async def abuild_prompt(self, output_format):
+        return SimpleNamespace(text=self.prompt)
+
+    async def agenerate(self, output_format, no_cache=False, archive=True):
+        assert no_cache and not archive
+        await asyncio.sleep(self.latency)
+        if self.fail:
+            raise RuntimeError("model unavailable")
+        self.generated += 1
+        return SimpleNamespace(response=f'{output_format} plan {self.generated}', prompt=self.prompt)
+
+    async def aarchive_result(self, result):
+        self.archived.append(result.response)
+
+
+async def settle(pool: PlanPool) -> None:
+    """Wait for the running refill tasks."""
+    await asyncio.gather(*pool._refills.values())
+
+
+def test_pool_fills_to_depth_and_refills_after_each_take():
+    generator = FakeGenerator()
+    pool = PlanPool(generator, ['html', 'md'], depth=2)
+
+    async def scenario():
+        pool.start()
+        await settle(pool)
+        assert pool.stats()['depth'] == {'html': 2, 'md': 2}
+
+        result = await pool.take('html')
+        await settle(pool)
+        return result
+
+    result = asyncio.run(scenario())
+    assert result.response == 'html plan 1'
+    assert pool.stats()['depth'] == {'html': 2, 'md': 2}
+    assert generator.generated == 5
+    # Plans are archived when served, not when generated
+    assert generator.archived == ['html plan 1']
+    assert pool.stats()['hit_rate'] == 1.0
+    assert pool.last_refill_seconds is not None
+
+
+def test_empty_pool_misses_and_starts_a_refill():
+    pool = PlanPool(FakeGenerator(latency=0.05), ['html'], depth=1)
+
+    async def scenario():
+        result = await pool.take('html')
+        await settle(pool)
+        return result
+
+    assert asyncio.run(scenario()) is None
+    assert pool.stats()['misses'] == 1
+    assert pool.stats()['depth'] == {'html': 1}
+
+
+def test_unpooled_formats_are_not_served():
+    pool = PlanPool(FakeGenerator(), ['html'], depth=1)
+
+    assert asyncio.run(pool.take('md')) is None
+    assert pool.stats()['misses'] == 0
+
+
+def test_plans_from_an_old_prompt_are_discarded():
+    generator = FakeGenerator()
+    pool = PlanPool(generator, ['html'], depth=2)
+
+    async def scenario():
+        pool.start()
+        await settle(pool)
+        generator.prompt = 'prompt 2'
+        result = await pool.take('html')
+        await settle(pool)
+        return result
+
+    assert asyncio.run(scenario()) is None
+    assert pool.stats()['discarded'] == 2
+    assert [plan.prompt for plan in pool._plans['html']] == ['prompt 2', 'prompt 2']
+
+
+def test_failed_refill_leaves_the_pool_short_until_the_next_take():
+    generator = FakeGenerator()
+    generator.fail = True
+    pool = PlanPool(generator, ['html'], depth=1)
+
+    async def scenario():
+        pool.start()
+        await settle(pool)
+        assert pool.stats()['last_error'] == "model unavailable"
+
+        generator.fail = False
+        assert await pool.take('html') is None
+        await settle(pool)
+
+    asyncio.run(scenario())
+    assert pool.stats()['depth'] == {'html': 1}
+    assert pool.stats()['last_error'] is None
+
+
+def test_stop_cancels_running_refills():
+    pool = PlanPool(FakeGenerator(latency=10), ['html'], depth=1)
+
+    async def scenario():
+        pool.start()
+        task = pool._refills['html']
+        await pool.stop()
+        return task
+
+    assert asyncio.run(scenario()).cancelled()
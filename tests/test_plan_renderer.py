@@ -0,0 +1,63 @@
+"""Tests for structured meal plan checks and rendering."""
+
+import json
+
+import pytest
+
+from plan_renderer import PlanRenderError, PlanRenderer, parse_plan
+
+PLAN = {
+    'days': [{
+        'name': 'Monday',
+        'meals': [{'meal': 'Lunch', 'title': 'Pad Thai', 'style': 'Thai', 'components': ['Noodles', 'Peanuts']}]
+    }],
+    'shopping': [{'section': 'Produce', 'items': ['Limes']}],
+    'pre_prep': ['Soak the noodles']
+}
+
+
+def with_change(path, value):
+    """A copy of PLAN with the value at a path of keys and indexes replaced."""
+    plan = json.loads(json.dumps(PLAN))
+    target = plan
+    for key in path[:-1]:
+        target = target[key]
+    target[path[-1]] = value
+    return json.dumps(plan)
+
+
+def test_valid_plan_renders_every_format():
+    renderer = PlanRenderer()
+    text = json.dumps(PLAN)
+
+    assert renderer.render(text, 'json') == text
+    assert '### Lunch: Pad Thai (Thai)' in renderer.render(text, 'md')
+    assert '<li>Limes</li>' in renderer.render(text, 'html')
+
+
+@pytest.mark.parametrize('path, value', [
+    (['days', 0], 'Monday'),
+    (['days', 0, 'meals'], 'Pad Thai'),
+    (['days', 0, 'meals', 0], ['Pad Thai']),
+    (['days', 0, 'meals', 0, 'title'], {'text': 'Pad Thai'}),
+    (['days', 0, 'meals', 0, 'components'], 'Noodles'),
+    (['days', 0, 'meals', 0, 'components', 0], None),
+    (['shopping', 0], 'Limes'),
+    (['shopping', 0, 'items'], None),
+    (['pre_prep', 0], 3),
+])
+def test_malformed_nested_plan_is_rejected(path, value):
+    text = with_change(path, value)
+
+    with pytest.raises(PlanRenderError):
+        parse_plan(text)
+    with pytest.raises(PlanRenderError):
+        PlanRenderer().render(text, 'md')
+
+
+def test_missing_required_field_is_rejected():
+    plan = json.loads(json.dumps(PLAN))
+    del plan['days'][0]['meals'][0]['style']
+
+    with pytest.raises(PlanRenderError, match=r"plan\.days\[0\]\.meals\[0\] is missing 'style'"):
+        parse_plan(json.dumps(plan))
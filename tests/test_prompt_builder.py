@@ -0,0 +1,117 @@
+"""Tests for prompt table encodings and token budgeting."""
+
+import pytest
+
+from prompt_builder import PromptBuilder, TableOptions, estimate_tokens
+
+FOOD = [
+    ['Name', 'Details', 'Style', 'Reference'],
+    ['Chicken breast', '2 lbs, fresh', 'Universal', ''],
+    ['Ground beef tacos', '1 lb  with\ttaco spices', 'Mexican', ''],
+    ['chicken breast', '2 lbs, fresh', 'universal', ''],
+]
+
+
+def build(food_sheets=None, **config):
+    return PromptBuilder(
+        config=config,
+        sheet_context={},
+        food_sheets=food_sheets if food_sheets is not None else [('Proteins', FOOD)]
+    ).build()
+
+
+def table(prompt: str) -> list:
+    """Lines of the first food table in a prompt."""
+    lines = prompt.split('\n')
+    start = lines.index('## Proteins') + 1
+    return lines[start:lines.index('', start)]
+
+
+def test_tokens_are_estimated_at_four_characters_each():
+    assert estimate_tokens('') == 0
+    assert estimate_tokens('abcd') == 1
+    assert estimate_tokens('abcde') == 2
+
+
+@pytest.mark.parametrize('config, message', [
+    ({'table_format': 'xml'}, "Unknown table_format 'xml'"),
+    ({'token_budget': 'lots'}, "Invalid token_budget 'lots'"),
+])
+def test_invalid_table_options_are_rejected(config, message):
+    with pytest.raises(ValueError, match=message):
+        TableOptions.from_config(config)
+
+
+def test_markdown_is_the_default():
+    assert table(build().text)[:2] == [
+        '| Name | Details | Style | Reference |',
+        '| --- | --- | --- | --- |',
+    ]
+
+
+def test_csv_quotes_cells_with_commas():
+    assert table(build(table_format='csv').text)[:2] == [
+        'Name,Details,Style,Reference',
+        'Chicken breast,"2 lbs, fresh",Universal,',
+    ]
+
+
+def test_tsv_collapses_whitespace_inside_cells():
+    assert table(build(table_format='TSV').text)[2] == 'Ground beef tacos\t1 lb with taco spices\tMexican\t'
+
+
+def test_columns_and_duplicate_rows_are_dropped():
+    lines = table(build(
+        table_format='csv',
+        drop_columns='details, STYLE',
+        drop_empty_columns='yes',
+        dedupe_rows='true'
+    ).text)
+
+    assert lines == ['Name', 'Chicken breast', 'Ground beef tacos']
+
+
+def test_report_shows_the_savings_over_markdown_tables():
+    report = build(table_format='csv', drop_empty_columns='true').token_report
+
+    assert report.table_format == 'csv'
+    assert report.saved_tokens > 0
+    assert report.total_tokens == sum(tokens for _, tokens in report.sections)
+    assert report.total_tokens + report.saved_tokens == build().token_report.total_tokens
+    assert "saved" in report.summary()
+    assert 'csv tables' in report.format()
+
+
+def test_token_budget_trims_the_largest_table_first():
+    big = [['Name']] + [[f'Dish number {n}'] for n in range(40)]
+    small = [['Name']] + [[f'Side {n}'] for n in range(5)]
+    untrimmed = build([('Proteins', big), ('Sides', small)], table_format='csv')
+    budget = untrimmed.token_report.total_tokens - 40
+
+    prompt = build([('Proteins', big), ('Sides', small)], table_format='csv', token_budget=str(budget))
+
+    assert estimate_tokens(prompt.text) <= budget
+    assert prompt.token_report.trimmed_rows > 0
+    assert 'Side 4' in prompt.text
+    assert 'Dish number 0' in prompt.text
+    assert 'Dish number 39' not in prompt.text
+    assert 'rows trimmed' in prompt.token_report.summary()
+    # The same data always trims to the same prompt
+    assert build([('Proteins', big), ('Sides', small)], table_format='csv', token_budget=str(budget)) == prompt
+
+
+def test_trimming_never_drops_instructions():
+    prompt = build(prompt_header='Plan a week of lunches.', token_budget='1')
+
+    assert 'Plan a week of lunches.' in prompt.text
+    assert table(prompt.text) == ['| Name | Details | Style | Reference |', '| --- | --- | --- | --- |']
+    assert prompt.token_report.trimmed_rows == 3
+
+
+def test_user_input_is_kept_out_of_the_static_prefix():
+    prompt = build(prompt_header='Plan lunches.', user_input='no fish')
+
+    assert prompt.text.startswith(prompt.prefix)
+    assert 'Plan lunches.' in prompt.prefix
+    assert 'no fish' not in prompt.prefix
+    assert 'no fish' in prompt.suffix
@@ -0,0 +1,171 @@
+"""Tests for the circuit breaker and upstream policy."""
+
+import asyncio
+import time
+
+import pytest
+
+from deadline import DeadlineExceededError, request_deadline
+from resilience import Upstream, UpstreamUnavailableError
+
+
+def classify(error):
+    """Connection errors are retryable, anything else is not."""
+    return isinstance(error, ConnectionError), None
+
+
+def failing():
+    raise ConnectionError("down")
+
+
+def half_open_upstream() -> Upstream:
+    """An upstream whose circuit has opened and is ready for a trial call."""
+    upstream = Upstream('test', classify, max_attempts=1, failure_threshold=1, reset_timeout=0.05)
+    with pytest.raises(ConnectionError):
+        upstream.call(failing)
+    assert upstream.breaker.state == 'open'
+    time.sleep(0.06)
+    assert upstream.breaker.state == 'half-open'
+    return upstream
+
+
+def test_cancelled_trial_frees_the_slot():
+    upstream = half_open_upstream()
+
+    async def scenario():
+        trial = asyncio.ensure_future(upstream.acall(asyncio.sleep, 10))
+        await asyncio.sleep(0.01)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        async def ok():
+            return 'ok'
+
+        return await upstream.acall(ok)
+
+    assert asyncio.run(scenario()) == 'ok'
+    assert upstream.breaker.state == 'closed'
+
+
+def test_trial_is_exclusive_while_in_flight():
+    upstream = half_open_upstream()
+
+    async def scenario():
+        trial = asyncio.ensure_future(upstream.acall(asyncio.sleep, 0.05, 'trial'))
+        await asyncio.sleep(0.01)
+        with pytest.raises(UpstreamUnavailableError):
+            await upstream.acall(asyncio.sleep, 0, 'second')
+        return await trial
+
+    assert asyncio.run(scenario()) == 'trial'
+    assert upstream.breaker.state == 'closed'
+
+
+def test_stream_trial_records_success():
+    upstream = half_open_upstream()
+    with upstream.admitted():
+        pass
+    assert upstream.breaker.state == 'closed'
+
+
+def test_stream_trial_records_retryable_failure():
+    upstream = half_open_upstream()
+    with pytest.raises(ConnectionError):
+        with upstream.admitted():
+            failing()
+    assert upstream.breaker.state == 'open'
+
+
+def test_stream_closed_early_frees_the_slot():
+    upstream = half_open_upstream()
+
+    def stream():
+        with upstream.admitted():
+            yield 'first'
+            yield 'second'
+
+    chunks = stream()
+    assert next(chunks) == 'first'
+    chunks.close()
+
+    assert upstream.breaker.state == 'half-open'
+    assert upstream.call(lambda: 'ok') == 'ok'
+    assert upstream.breaker.state == 'closed'
+
+
+def test_trial_that_runs_out_of_time_frees_the_slot():
+    upstream = half_open_upstream()
+
+    async def scenario():
+        with request_deadline(0.02):
+            with pytest.raises(DeadlineExceededError):
+                await upstream.acall(asyncio.sleep, 10)
+        return await upstream.acall(asyncio.sleep, 0, 'ok')
+
+    assert asyncio.run(scenario()) == 'ok'
+    assert upstream.breaker.state == 'closed'
+
+
+def test_sync_timeout_from_the_deadline_frees_the_slot():
+    upstream = half_open_upstream()
+
+    def timed_out():
+        time.sleep(0.03)
+        raise TimeoutError("timed out")
+
+    with request_deadline(0.02):
+        with pytest.raises(DeadlineExceededError):
+            upstream.call(timed_out)
+    assert upstream.breaker.state == 'half-open'
+    assert upstream.call(lambda: 'ok') == 'ok'
+
+
+def test_real_failure_after_the_deadline_still_counts():
+    upstream = Upstream('test', classify, max_attempts=3, failure_threshold=1, reset_timeout=10)
+
+    def slow_failure():
+        time.sleep(0.03)
+        raise ConnectionError("down")
+
+    with request_deadline(0.02):
+        with pytest.raises(DeadlineExceededError):
+            upstream.call(slow_failure)
+    assert upstream.breaker.state == 'open'
+
+
+def test_rate_limit_wait_is_bounded_by_the_deadline():
+    upstream = Upstream('test', classify, rate_per_minute=1)
+    assert upstream.call(lambda: 'first') == 'first'
+
+    start = time.monotonic()
+    with request_deadline(0.1):
+        with pytest.raises(DeadlineExceededError):
+            upstream.call(lambda: 'second')
+    assert time.monotonic() - start < 0.05
+    # The refused wait took no token from the bucket
+    assert upstream.limiter._tokens >= 0
+
+
+def test_throttling_is_retried_without_opening_the_circuit():
+    def throttled_classify(error):
+        return True, 0.05
+
+    upstream = Upstream('test', throttled_classify, rate_per_minute=6000, failure_threshold=1)
+    calls = []
+
+    def throttled_once():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise ConnectionError("429")
+        return 'ok'
+
+    assert upstream.call(throttled_once) == 'ok'
+    assert upstream.breaker.state == 'closed'
+    assert calls[1] - calls[0] >= 0.05
+
+    # A pause holds back the next caller too, not just the throttled one
+    start = time.monotonic()
+    upstream.limiter.pause(0.05)
+    upstream.call(lambda: 'ok')
+    assert time.monotonic() - start >= 0.04
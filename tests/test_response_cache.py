@@ -0,0 +1,163 @@
+"""Tests for the two-tier LLM response cache."""
+
+import threading
+
+import pytest
+
+from response_cache import ResponseCache
+from shared_cache import SharedCache
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SharedCache(tmp_path / 'shared.sqlite3')
+    yield store
+    store.close()
+
+
+class Clock:
+    """Stand-in for time.time() that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    # Both tiers read time.time()
+    monkeypatch.setattr('time.time', clock)
+    return clock
+
+
+def test_key_covers_everything_that_shapes_the_response():
+    base = ('prompt', 'gemini-test', 0.7, 1000, 'md')
+    keys = {ResponseCache.make_key(*base)}
+    for index, value in enumerate(('other prompt', 'gemini-other', 0.2, 2000, 'html')):
+        changed = list(base)
+        changed[index] = value
+        keys.add(ResponseCache.make_key(*changed))
+
+    assert len(keys) == 6
+    assert ResponseCache.make_key(*base) in keys
+
+
+def test_miss_then_hit():
+    cache = ResponseCache()
+
+    assert cache.get('key') is None
+    cache.put('key', 'plan')
+    assert cache.get('key') == 'plan'
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'memory_entries': 1}
+
+
+def test_lookups_miss_until_every_variant_is_stored():
+    cache = ResponseCache(variants=3)
+    for plan in ('plan 1', 'plan 2'):
+        assert cache.get('key') is None
+        cache.put('key', plan)
+    assert cache.get('key') is None
+    cache.put('key', 'plan 3')
+
+    served = {cache.get('key') for _ in range(200)}
+    assert served == {'plan 1', 'plan 2', 'plan 3'}
+
+
+def test_only_the_newest_variants_are_kept():
+    cache = ResponseCache(variants=2)
+    for plan in ('plan 1', 'plan 2', 'plan 3'):
+        cache.put('key', plan)
+
+    assert {cache.get('key') for _ in range(100)} == {'plan 2', 'plan 3'}
+
+
+def test_entries_expire_after_the_ttl(clock, store):
+    cache = ResponseCache(store=store, ttl=60)
+    cache.put('key', 'plan')
+
+    clock.now += 59
+    assert cache.get('key') == 'plan'
+    clock.now += 2
+    assert cache.get('key') is None
+
+
+def test_memory_tier_evicts_the_least_recently_used_key():
+    cache = ResponseCache(memory_entries=2)
+    cache.put('a', 'plan a')
+    cache.put('b', 'plan b')
+    cache.get('a')
+    cache.put('c', 'plan c')
+
+    assert list(cache._memory) == ['a', 'c']
+    assert cache.get('b') is None
+
+
+def test_keys_evicted_from_memory_are_served_from_the_shared_tier(store):
+    cache = ResponseCache(store=store, memory_entries=1)
+    cache.put('a', 'plan a')
+    cache.put('b', 'plan b')
+
+    assert 'a' not in cache._memory
+    assert cache.get('a') == 'plan a'
+    assert 'a' in cache._memory
+
+
+def test_shared_tier_is_seen_by_another_cache(tmp_path, store):
+    ResponseCache(store=store).put('key', 'plan')
+    other_store = SharedCache(tmp_path / 'shared.sqlite3')
+
+    assert ResponseCache(store=other_store).get('key') == 'plan'
+    other_store.close()
+
+
+def test_shared_tier_keeps_within_max_bytes(store):
+    cache = ResponseCache(store=store, max_bytes=1000, memory_entries=0)
+    for number in range(10):
+        cache.put(f'key {number}', 'x' * 200)
+
+    stats = store.stats()['namespaces'][ResponseCache.NAMESPACE]
+    assert stats['bytes'] <= 1000
+    assert cache.get('key 9') == 'x' * 200
+    assert cache.get('key 0') is None
+
+
+class SlowStore:
+    """Shared tier whose writes wait until released."""
+
+    def __init__(self):
+        self.writing = threading.Event()
+        self.release = threading.Event()
+
+    def get(self, namespace, key):
+        return None
+
+    def put(self, namespace, key, value, ttl, max_bytes=None):
+        self.writing.set()
+        self.release.wait(5)
+
+
+def test_shared_tier_writes_do_not_hold_up_memory_hits():
+    store = SlowStore()
+    cache = ResponseCache(store=store)
+    store.release.set()
+    cache.put('a', 'plan a')
+    store.release.clear()
+
+    writer = threading.Thread(target=cache.put, args=('b', 'plan b'))
+    writer.start()
+    assert store.writing.wait(5)
+    hits = []
+    reader = threading.Thread(target=lambda: hits.extend([cache.get('a'), cache.get('b')]))
+    reader.start()
+    reader.join(1)
+    # Read while the write to the shared tier was still waiting
+    finished = not reader.is_alive()
+    store.release.set()
+    writer.join()
+    reader.join()
+
+    assert finished
+    assert hits == ['plan a', 'plan b']
@@ -0,0 +1,156 @@
+"""Tests for the cross-process SQLite cache and what workers share through it."""
+
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from clients import ClientRegistry
+from config import Config
+from meal_plan_generator import MealPlanGenerator
+from prompt_builder import PromptBuilder, PromptCache
+from shared_cache import SharedCache
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Stand-in for time.time() that only moves when told to."""
+    clock = {'now': 1000.0}
+    monkeypatch.setattr('time.time', lambda: clock['now'])
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SharedCache(tmp_path / 'shared.sqlite3')
+    yield cache
+    cache.close()
+
+
+def test_values_are_kept_per_namespace(cache):
+    cache.put('prompts', 'key', b'prompt', ttl=60)
+    cache.put('responses', 'key', b'response', ttl=60)
+
+    assert cache.get('prompts', 'key') == b'prompt'
+    assert cache.get('responses', 'key') == b'response'
+    cache.delete('prompts', 'key')
+    assert cache.get('prompts', 'key') is None
+    assert cache.get('responses', 'key') == b'response'
+
+
+def test_values_expire_after_their_ttl(cache, clock):
+    cache.put('responses', 'key', b'response', ttl=60)
+
+    clock['now'] += 59
+    assert cache.get('responses', 'key') == b'response'
+    clock['now'] += 1
+    assert cache.get('responses', 'key') is None
+
+
+def test_namespaces_are_evicted_least_recently_used_first(tmp_path, clock):
+    cache = SharedCache(tmp_path / 'shared.sqlite3', touch_interval=5)
+    for number in range(3):
+        cache.put('responses', f'key {number}', b'x' * 100, ttl=3600, max_bytes=300)
+        clock['now'] += 10
+    cache.put('prompts', 'other', b'x' * 1000, ttl=3600)
+    # Reading key 0 makes key 1 the least recently used
+    assert cache.get('responses', 'key 0') is not None
+    cache.put('responses', 'key 3', b'x' * 100, ttl=3600, max_bytes=300)
+
+    assert cache.get('responses', 'key 1') is None
+    assert all(cache.get('responses', f'key {number}') for number in (0, 2, 3))
+    assert cache.get('prompts', 'other') is not None
+    assert cache.stats()['namespaces']['responses'] == {'entries': 3, 'bytes': 300}
+    cache.close()
+
+
+def test_recent_reads_do_not_write(tmp_path, clock):
+    cache = SharedCache(tmp_path / 'shared.sqlite3', touch_interval=60)
+    cache.put('responses', 'key', b'response', ttl=3600)
+    changes = cache._db.total_changes
+
+    clock['now'] += 30
+    cache.get('responses', 'key')
+    assert cache._db.total_changes == changes
+    clock['now'] += 31
+    cache.get('responses', 'key')
+    assert cache._db.total_changes == changes + 1
+    cache.close()
+
+
+def test_values_are_seen_by_another_process(cache):
+    code = (
+        f"import sys; sys.path.insert(0, {str(REPO_DIR)!r})\n"
+        "from shared_cache import SharedCache\n"
+        f"SharedCache({str(cache.path)!r}).put('responses', 'key', b'from another worker', ttl=60)\n"
+    )
+    subprocess.run([sys.executable, '-c', code], check=True, timeout=60)
+
+    assert cache.get('responses', 'key') == b'from another worker'
+
+
+def test_prompts_are_shared_between_caches(tmp_path, cache):
+    prompt = PromptBuilder({'prompt_header': 'Plan lunches.'}, {}, [('Mains', [['Name'], ['Pad Thai']])]).build()
+    key = PromptCache.make_key('sheet', ('top', 'output'), 'md', None)
+    PromptCache(cache).put(key, prompt)
+
+    other = PromptCache(SharedCache(tmp_path / 'shared.sqlite3'))
+    assert other.get(key) == prompt
+    assert other.get(PromptCache.make_key('sheet', ('top', 'output'), 'md', 'tacos')) is None
+    other.store.close()
+
+
+class FakeSheetsClient:
+    """Stand-in for SheetsClient, counting workbook downloads."""
+
+    downloads = 0
+
+    def get_revision(self):
+        return '1'
+
+    def read_workbook(self):
+        FakeSheetsClient.downloads += 1
+        return [('Mains', [['Name', 'Style', 'Details'], ['Pad Thai', 'Thai', 'Serves 4']])]
+
+
+class CountingLLM:
+    """LLM provider returning a numbered plan per call."""
+
+    name = 'stub:counting'
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate_meal_plan(self, prompt, prefix=None):
+        self.calls += 1
+        return f'# Plan {self.calls}'
+
+
+def test_workers_share_snapshots_prompts_and_plans(tmp_path, monkeypatch):
+    for path in REPO_DIR.glob('prompt-*.md'):
+        shutil.copy(path, tmp_path)
+    (tmp_path / '.env').write_text(
+        'GOOGLE_API_KEY=key\nSPREADSHEET_ID=sheet\nGEMINI_MODEL=gemini-test\nRESPONSE_CACHE=true\nPLAN_ARCHIVE=false\n'
+    )
+    monkeypatch.setattr(FakeSheetsClient, 'downloads', 0)
+    monkeypatch.setattr(ClientRegistry, 'sheets', lambda self, spreadsheet_id, api_key: FakeSheetsClient())
+    llm = CountingLLM()
+    monkeypatch.setattr(ClientRegistry, 'llm', lambda self, config=None, structured=False: llm)
+
+    # Two generators with their own memory, like two server workers
+    workers = [MealPlanGenerator(Config(str(tmp_path / '.env')), tmp_path) for _ in range(2)]
+    first = workers[0].generate()
+    second = workers[1].generate()
+
+    assert second.response == first.response == '# Plan 1'
+    assert second.cached
+    assert llm.calls == 1
+    assert FakeSheetsClient.downloads == 1
+    assert workers[1].prompt_cache.stats()['hits'] == 1
+    for worker in workers:
+        worker.shared_cache.close()
+        worker.clients.close()
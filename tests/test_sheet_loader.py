@@ -0,0 +1,60 @@
+"""Tests for the on-disk sheet snapshot cache."""
+
+import threading
+import time
+
+from sheet_loader import SheetData, SheetSnapshotCache
+
+
+class FakeSheetsClient:
+    """Stand-in for SheetsClient serving one fixed workbook."""
+
+    def __init__(self, revision: str = '1'):
+        self.revision = revision
+        self.revision_checks = 0
+        self.downloads = 0
+
+    def get_revision(self):
+        self.revision_checks += 1
+        return self.revision
+
+    def read_workbook(self):
+        self.downloads += 1
+        return [('config', [['key', 'value']]), ('Mains', [['Name'], ['Soup']])]
+
+
+def test_unchanged_revision_does_not_rewrite_the_snapshot(tmp_path):
+    client = FakeSheetsClient()
+    cache = SheetSnapshotCache(tmp_path, ttl=0.05)
+    first = cache.load('sheet', lambda: client)
+    snapshot_file = tmp_path / 'sheets-sheet.json'
+    written = snapshot_file.stat().st_mtime_ns
+
+    time.sleep(0.06)
+    assert cache.load('sheet', lambda: client) is first
+    assert client.revision_checks == 2
+    assert client.downloads == 1
+    assert snapshot_file.stat().st_mtime_ns == written
+
+    # The check restarted the TTL, also for a fresh cache on the same directory
+    assert SheetSnapshotCache(tmp_path, ttl=0.05).expired('sheet') is None
+    assert SheetSnapshotCache(tmp_path, ttl=0.05).load('sheet', lambda: client).food_sheets == first.food_sheets
+    assert client.revision_checks == 2
+
+
+def test_concurrent_writes_leave_one_complete_snapshot(tmp_path):
+    cache = SheetSnapshotCache(tmp_path)
+    sheet_data = SheetData(config={}, sheet_context={}, food_sheets=[('Mains', [['Soup']] * 1000)])
+
+    threads = [
+        threading.Thread(target=cache._write, args=('sheet', {'spreadsheet_id': 'sheet', 'revision': '1',
+                                                              'fetched_at': time.time()}, sheet_data))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [path.name for path in tmp_path.iterdir()] == ['sheets-sheet.json']
+    assert SheetSnapshotCache(tmp_path).load('sheet', FakeSheetsClient).food_sheets == sheet_data.food_sheets
@@ -0,0 +1,94 @@
+"""Tests for coalesced calls under per-caller deadlines."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from deadline import DeadlineExceededError, await_with_deadline, request_deadline, run_detached, time_left
+from meal_plan_generator import MealPlanGenerator
+from singleflight import AsyncSingleFlight, SingleFlight, SingleFlightTimeoutError
+
+
+async def slow_upstream(seconds: float) -> str:
+    """Stands in for an upstream call bounded by the current deadline."""
+    await await_with_deadline(asyncio.sleep(seconds), 'upstream')
+    return 'ok'
+
+
+def test_async_followers_outlive_a_short_leader_deadline():
+    flight = AsyncSingleFlight()
+
+    async def caller(budget: float) -> str:
+        with request_deadline(budget):
+            try:
+                return await await_with_deadline(
+                    flight.do('key', run_detached, max(time_left(), 30), slow_upstream, 0.2),
+                    'llm'
+                )
+            except DeadlineExceededError:
+                return 'DEADLINE'
+
+    async def scenario():
+        return await asyncio.gather(caller(0.05), caller(30), caller(30))
+
+    assert asyncio.run(scenario()) == ['DEADLINE', 'ok', 'ok']
+
+
+def test_sync_follower_stops_waiting_at_its_timeout():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def leader():
+        flight.do('key', lambda: started.set() or time.sleep(0.3))
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    started.wait()
+    begin = time.monotonic()
+    with pytest.raises(SingleFlightTimeoutError):
+        flight.do('key', lambda: None, timeout=0.05)
+    assert time.monotonic() - begin < 0.2
+    thread.join()
+
+
+def test_sync_follower_retries_after_the_leaders_deadline():
+    flight = SingleFlight()
+    started = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(time_left())
+        started.set()
+        time.sleep(0.1)
+        if time_left() == 0.0:
+            raise DeadlineExceededError("leader ran out of time")
+        return 'ok'
+
+    def leader():
+        with request_deadline(0.05), pytest.raises(DeadlineExceededError):
+            MealPlanGenerator._coalesce(flight, 'llm', 'key', work)
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    started.wait()
+    with request_deadline(30):
+        assert MealPlanGenerator._coalesce(flight, 'llm', 'key', work) == 'ok'
+    thread.join()
+    assert len(calls) == 2
+
+
+def test_sync_follower_times_out_as_deadline_error():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def leader():
+        flight.do('key', lambda: started.set() or time.sleep(0.3))
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    started.wait()
+    with request_deadline(0.05), pytest.raises(DeadlineExceededError):
+        MealPlanGenerator._coalesce(flight, 'llm', 'key', lambda: None)
+    thread.join()
@@ -0,0 +1,147 @@
+"""Tests for the hot-reloading config and prompt file snapshots."""
+
+import os
+import time
+from pathlib import Path
+
+from config import ConfigStore
+from prompt_builder import PromptTemplateStore
+from snapshot_store import SnapshotStore, file_signature
+
+ENV = 'GOOGLE_API_KEY=key\nSPREADSHEET_ID=sheet\nGEMINI_MODEL={model}\n'
+
+
+def rewrite(path: Path, text: str) -> None:
+    """Write a file and move its mtime on, so the change is seen even
+    within the filesystem's timestamp resolution."""
+    mtime = path.stat().st_mtime_ns if path.exists() else time.time_ns()
+    path.write_text(text)
+    os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+
+
+class CountingLoader:
+    """Loader returning a new numbered snapshot per call."""
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    def __call__(self) -> dict:
+        if self.fail:
+            raise ValueError("half-written file")
+        self.calls += 1
+        return {'version': self.calls}
+
+
+def test_unchanged_sources_are_not_reloaded(tmp_path):
+    source = tmp_path / 'source.txt'
+    source.write_text('one')
+    loader = CountingLoader()
+    store = SnapshotStore(loader, lambda: file_signature([source]))
+    snapshot = store.current
+
+    assert not store.check()
+    assert store.current is snapshot
+    assert loader.calls == 1
+
+
+def test_changed_sources_swap_in_a_new_snapshot(tmp_path):
+    source = tmp_path / 'source.txt'
+    source.write_text('one')
+    store = SnapshotStore(CountingLoader(), lambda: file_signature([source]))
+    in_flight = store.current
+
+    rewrite(source, 'two')
+    assert store.check()
+    assert store.current == {'version': 2}
+    # A request holding the old snapshot keeps a consistent view
+    assert in_flight == {'version': 1}
+
+
+def test_failed_reload_keeps_the_previous_snapshot(tmp_path):
+    source = tmp_path / 'source.txt'
+    source.write_text('one')
+    loader = CountingLoader()
+    store = SnapshotStore(loader, lambda: file_signature([source]))
+
+    loader.fail = True
+    rewrite(source, 'tw')
+    assert not store.check()
+    assert store.current == {'version': 1}
+    assert store.last_error == "half-written file"
+
+    loader.fail = False
+    assert store.check()
+    assert store.current == {'version': 2}
+    assert store.last_error is None
+
+
+def test_missing_and_new_files_change_the_signature(tmp_path):
+    source = tmp_path / 'source.txt'
+    missing = file_signature([source])
+    source.write_text('one')
+
+    assert missing == ((str(source), None, None),)
+    assert file_signature([source]) != missing
+
+
+def test_store_without_a_signature_never_reloads():
+    loader = CountingLoader()
+    store = SnapshotStore(loader)
+    store.start()
+
+    assert not store.check()
+    assert store._thread is None
+    assert loader.calls == 1
+
+
+def test_polling_thread_picks_up_changes(tmp_path):
+    source = tmp_path / 'source.txt'
+    source.write_text('one')
+    store = SnapshotStore(CountingLoader(), lambda: file_signature([source]), poll_interval=0.01)
+    store.start()
+    try:
+        rewrite(source, 'two')
+        deadline = time.monotonic() + 5
+        while store.current['version'] == 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        store.stop()
+
+    assert store.current == {'version': 2}
+    assert store._thread is None
+
+
+def test_config_store_reloads_the_env_file(tmp_path):
+    env_file = tmp_path / '.env'
+    env_file.write_text(ENV.format(model='gemini-one') + 'RELOAD_INTERVAL=0.5\n')
+    store = ConfigStore(str(env_file))
+    assert store.poll_interval == 0.5
+
+    rewrite(env_file, ENV.format(model='gemini-two'))
+    assert store.check()
+    assert store.current.gemini_model == 'gemini-two'
+
+
+def test_config_store_keeps_the_last_valid_config(tmp_path):
+    env_file = tmp_path / '.env'
+    env_file.write_text(ENV.format(model='gemini-one'))
+    store = ConfigStore(str(env_file))
+
+    rewrite(env_file, 'GOOGLE_API_KEY=key\n')
+    assert not store.check()
+    assert store.current.gemini_model == 'gemini-one'
+    assert 'SPREADSHEET_ID' in store.last_error
+
+
+def test_prompt_templates_follow_the_prompt_files(tmp_path):
+    (tmp_path / 'prompt-top.md').write_text('top')
+    (tmp_path / 'prompt-output-md.md').write_text('markdown')
+    store = PromptTemplateStore(tmp_path)
+    assert store.prompt_files('md') == ('top', 'markdown')
+    assert store.prompt_files('html') == ('top', None)
+
+    rewrite(tmp_path / 'prompt-output-html.md', 'html')
+    (tmp_path / 'prompt-top.md').unlink()
+    assert store.check()
+    assert store.prompt_files('html') == (None, 'html')
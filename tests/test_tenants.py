@@ -0,0 +1,47 @@
+"""Tests for the kitchen registry."""
+
+import json
+import shutil
+from pathlib import Path
+
+from config import Config
+from meal_plan_generator import MealPlanGenerator
+from tenants import TenantRegistry, TenantStore
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+
+class FakeSheetsClient:
+    """Stand-in for SheetsClient serving a workbook of about 10 KB."""
+
+    def get_revision(self):
+        return '1'
+
+    def read_workbook(self):
+        return [('config', [['key', 'value']]), ('Mains', [['Name']] + [[f'Dish {row}'] for row in range(1000)])]
+
+
+def test_kitchens_past_the_byte_cap_are_evicted_once_loaded(tmp_path):
+    for path in REPO_DIR.glob('prompt-*.md'):
+        shutil.copy(path, tmp_path)
+    (tmp_path / '.env').write_text(
+        f'GOOGLE_API_KEY=key\nSPREADSHEET_ID=sheet\nGEMINI_MODEL=gemini-test\nSHEET_CACHE_DIR={tmp_path}/cache\n'
+    )
+    names = [f'kitchen-{index}' for index in range(4)]
+    tenants_file = tmp_path / 'tenants.json'
+    tenants_file.write_text(json.dumps({name: {'spreadsheet_id': f'sheet-{name}'} for name in names}))
+
+    generator = MealPlanGenerator(Config(str(tmp_path / '.env')), tmp_path)
+    generator.sheet_cache.load('sheet', FakeSheetsClient)
+    snapshot_bytes = generator.sheet_cache.memory_bytes()
+    registry = TenantRegistry(generator, TenantStore(tenants_file), max_tenants=10, max_bytes=2.5 * snapshot_bytes)
+
+    for name in names:
+        registry.generator(name).sheet_cache.load(f'sheet-{name}', FakeSheetsClient)
+
+    stats = registry.stats()
+    assert stats['evictions'] == 2
+    assert stats['snapshot_bytes'] <= 2.5 * snapshot_bytes
+    assert list(registry._entries) == names[2:]
+    generator.shared_cache.close()
+    generator.clients.close()